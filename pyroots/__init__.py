@@ -1,27 +1,45 @@
 from .noise_filters import noise_removal, dirt_removal, grayscale_filter, color_filter, _in_range
 from .geometry_filters import _percentile_filter, diameter_filter, length_width_filter, morphology_filter, hollow_filter
 from .neighborhood_filter import neighborhood_filter
+from .object_executor import object_slices, map_objects
+from .binary_morphology import binary_majority, disk_dilation, disk_erosion, disk_closing
+from .packed_mask import PackedMask
+from .local_threshold import threshold_local
+from .vesselness import frangi
+from .smoothing import gaussian
+from .backends import set_backend, get_backend
 from .summarize import summarize_geometry, bin_by_diameter
-from .skeletonization import _axis_length, skeleton_with_distance
-from .image_manipulation import img_split, draw_mask, equalize_exposure, _arrays_mean, _arrays_var, calc_exposure_correction, _center_image, fill_gaps, band_selector
+from .skeletonization import _axis_length, skeleton_with_distance, skeleton_to_dense, skeleton_to_sparse
+from .skeleton_graph import skeleton_graph, graph_geometry
+from .component_stats import component_stats, update_component_stats, select_objects, shape_descriptors, _grouped_percentile
+from .color_tables import color_table, rgb_to_band
+from .calibration import SessionCalibration, scale_range_from_diameters
+from .image_manipulation import img_split, draw_mask, equalize_exposure, _arrays_mean, _arrays_var, calc_exposure_correction, _center_image, fill_gaps, ColorspaceCache, band_selector
 from .preprocessing import detect_motion_blur, calc_temperature_distance, correct_brightfield, register_bands, preprocessing_filters, preprocessing_actions
 from .utilities import multi_image_plot, random_blobs, tiff_splitter, band_viewer, _zoom, img_rescaler, file_subsampler
 from .thresholding_segmentation import thresholding_segmentation
-from .frangi_segmentation import frangi_segmentation
+from .frangi_segmentation import frangi_segmentation, frangi_scale_range
 from .tennant_measurement import tennant_on_segmented, draw_fishnet
 from .batch_processing import preprocessing_filter_loop, preprocessing_actions_loop, frangi_image_loop, pyroots_batch_loop, fishnet_loop, tennant_batch
+from .benchmarks import benchmark_axis_length, benchmark_percentile, benchmark_threshold_local, benchmark_backends, benchmark_disk_closing, benchmark_skeleton, benchmark_frangi, benchmark_frangi_pyramid, benchmark_smoothing
 
 
 
 __all__ = ['noise_removal', 'dirt_removal', 'grayscale_filter', 'color_filter', '_in_range',
 		   '_percentile_filter', 'diameter_filter', 'length_width_filter', 'morphology_filter', 'hollow_filter',
            'neighborhood_filter',
+           'object_slices', 'map_objects',
+           'binary_majority', 'disk_dilation', 'disk_erosion', 'disk_closing', 'PackedMask', 'threshold_local', 'frangi', 'gaussian', 'set_backend', 'get_backend',
 	   	   'summarize_geometry', 'bin_by_diameter',
-	   	   '_axis_length', 'skeleton_with_distance',
-	   	   'img_split', 'draw_mask', 'equalize_exposure', '_arrays_mean', '_arrays_var', 'calc_exposure_correction', '_center_image', 'fill_gaps', 'band_selector',
+	   	   '_axis_length', 'skeleton_with_distance', 'skeleton_to_dense', 'skeleton_to_sparse',
+	   	   'skeleton_graph', 'graph_geometry',
+	   	   'component_stats', 'update_component_stats', 'select_objects', 'shape_descriptors', '_grouped_percentile',
+	   	   'color_table', 'rgb_to_band', 'SessionCalibration', 'scale_range_from_diameters',
+	   	   'img_split', 'draw_mask', 'equalize_exposure', '_arrays_mean', '_arrays_var', 'calc_exposure_correction', '_center_image', 'fill_gaps', 'ColorspaceCache', 'band_selector',
 	   	   'detect_motion_blur', 'calc_temperature_distance', 'correct_brightfield', 'register_bands', 'preprocessing_filters', 'preprocessing_actions',
 	   	   'multi_image_plot', 'random_blobs', 'tiff_splitter', 'band_viewer', '_zoom', 'img_rescaler', 'file_subsampler',
 	   	   'thresholding_segmentation',
 	   	   'tennant_on_segmented', 'draw_fishnet',
 	   	   'preprocessing_filter_loop', 'preprocessing_actions_loop', 'frangi_image_loop', 'pyroots_batch_loop',
-	   	   'frangi_segmentation', 'fishnet_loop', 'tennant_batch']
+	   	   'frangi_segmentation', 'frangi_scale_range', 'fishnet_loop', 'tennant_batch',
+	   	   'benchmark_axis_length', 'benchmark_percentile', 'benchmark_threshold_local', 'benchmark_backends', 'benchmark_disk_closing', 'benchmark_skeleton', 'benchmark_frangi', 'benchmark_frangi_pyramid', 'benchmark_smoothing']
@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: pme
+
+Interchangeable implementations of the image kernels that dominate pyroots run
+times: Gaussian blurs, adaptive histogram equalization, binary opening and
+closing, median filters, small object removal and labelling. The 'skimage'
+backend calls ``skimage`` and ``scipy.ndimage`` as pyroots always has. The
+'opencv' backend runs the same operations through ``cv2`` on uint8 or float32
+data, which is several times faster. The 'packed' backend runs binary opening
+and closing on ``pyroots.PackedMask``, 64 pixels to a word, for masks too big to
+keep in cache; its other kernels are 'skimage'. Kernels or inputs that a
+backend can't handle the same way fall back to 'skimage'.
+
+Choose a backend for the session with ``pyroots.set_backend('opencv')``, or per
+call with ``backend=``. Check the results on your own images with
+``pyroots.benchmark_backends``. Differences, by kernel:
+
+- ``gaussian``: float32 rounding (about 1e-7). Sigmas of 32 or more go by FFT
+  in both backends (see ``pyroots.smoothing``), which OpenCV is slower than.
+- ``equalize_adapthist``: OpenCV works on 256 gray levels and pads tiles
+  differently, so values differ by a few percent of the range.
+- ``binary_opening``, ``binary_closing``, ``remove_small_objects``, ``label``:
+  identical, with both 'opencv' and 'packed'.
+- ``median``: identical. OpenCV is used for square footprints on uint8 images;
+  boolean images use ``pyroots.binary_majority``.
+
+Contents:
+- BACKENDS
+- set_backend
+- get_backend
+- _backend
+- _kernel
+- gaussian
+- equalize_adapthist
+- binary_opening
+- binary_closing
+- median
+- remove_small_objects
+- label
+"""
+
+import numpy as np
+import cv2
+from scipy import ndimage
+from skimage import filters, exposure, morphology, img_as_float, img_as_float32, img_as_ubyte
+from pyroots.binary_morphology import binary_majority
+from pyroots.packed_mask import PackedMask
+from pyroots import smoothing
+
+
+BACKENDS = ['skimage', 'opencv', 'packed']
+
+_BACKEND = {'name' : 'skimage'}  # for the session
+
+
+def set_backend(name):
+    """
+    Set the backend for the session.
+
+    Parameters
+    ----------
+    name : str
+        One of ``pyroots.backends.BACKENDS``.
+
+    Returns
+    -------
+    The previous backend, so it can be restored.
+    """
+    if name not in BACKENDS:
+        raise ValueError("Didn't recognize backend '{}'. Options are {}.".format(name, BACKENDS))
+    previous = _BACKEND['name']
+    _BACKEND['name'] = name
+    return(previous)
+
+
+def get_backend():
+    """
+    The backend for the session.
+    """
+    return(_BACKEND['name'])
+
+
+def _backend(backend):
+    """
+    The backend for a call: ``backend`` if given, otherwise the session's.
+    """
+    if backend is None:
+        return(_BACKEND['name'])
+    if backend not in BACKENDS:
+        raise ValueError("Didn't recognize backend '{}'. Options are {}.".format(backend, BACKENDS))
+    return(backend)
+
+
+def _kernel(footprint):
+    """
+    Footprint as a uint8 OpenCV kernel, or ``None`` if it has an even side, where
+    OpenCV and ``skimage`` put the center in different places.
+    """
+    footprint = np.asarray(footprint)
+    if footprint.ndim != 2 or footprint.shape[0] % 2 == 0 or footprint.shape[1] % 2 == 0:
+        return(None)
+    return(np.ascontiguousarray(footprint != 0, dtype=np.uint8))
+
+
+#########################################################################################################################
+#########################################################################################################################
+#######                                                                                                          ########
+#######                                              Grayscale                                                   ########
+#######                                                                                                          ########
+#########################################################################################################################
+#########################################################################################################################
+
+def gaussian(image, sigma, backend=None):
+    """
+    Gaussian blur of a 2D image, as ``skimage.filters.gaussian(image, sigma)``
+    (``mode='nearest'``, truncated at 4 standard deviations). Integer images are
+    scaled to [0, 1] first. Large sigmas go by FFT, ``pyroots.smoothing.gaussian``.
+
+    Parameters
+    ----------
+    image : ndarray
+        2D image.
+    sigma : float
+        Standard deviation, in pixels.
+    backend : str
+        ``'skimage'`` or ``'opencv'``. Default = ``None``, the session backend.
+
+    Returns
+    -------
+    A float ndarray: float64 from 'skimage', float32 from 'opencv'.
+    """
+    if _backend(backend) == 'opencv' and image.ndim == 2 and np.isscalar(sigma):
+        img = img_as_float32(image)
+        if sigma <= 0:
+            return(img.copy())
+        if sigma >= 32:
+            return(smoothing.gaussian(img, sigma))
+        radius = int(4.0 * sigma + 0.5)  # as scipy.ndimage
+        return(cv2.GaussianBlur(img, (2*radius + 1, 2*radius + 1), sigmaX=sigma, sigmaY=sigma,
+                                borderType=cv2.BORDER_REPLICATE))
+
+    return(smoothing.gaussian(image, sigma))
+
+
+def equalize_adapthist(image, kernel_size=None, clip_limit=0.01, backend=None):
+    """
+    Contrast limited adaptive histogram equalization (CLAHE) of a 2D image, as
+    ``skimage.exposure.equalize_adapthist``. The 'opencv' backend uses
+    ``cv2.createCLAHE`` on 256 gray levels, with tiles of about ``kernel_size``.
+
+    Parameters
+    ----------
+    image : ndarray
+        2D image.
+    kernel_size : int
+        Size of the contextual regions. Default = ``None``, 1/8 of each dimension.
+    clip_limit : float
+        Normalized clipping limit, as in ``skimage``.
+    backend : str
+        ``'skimage'`` or ``'opencv'``. Default = ``None``, the session backend.
+
+    Returns
+    -------
+    A float ndarray in [0, 1].
+    """
+    if _backend(backend) == 'opencv' and image.ndim == 2:
+        rows, cols = image.shape
+        if kernel_size is None:
+            kernel_size = (max(rows // 8, 1), max(cols // 8, 1))
+        elif np.isscalar(kernel_size):
+            kernel_size = (kernel_size, kernel_size)
+        tiles = (int(np.ceil(cols / kernel_size[1])), int(np.ceil(rows / kernel_size[0])))
+
+        # OpenCV's clip limit is relative to the mean bin count of 256 bins
+        clahe = cv2.createCLAHE(clipLimit=clip_limit * 256, tileGridSize=tiles)
+        img = img_as_ubyte(exposure.rescale_intensity(img_as_float(image), out_range=(0, 1)))
+        return(img_as_float(clahe.apply(img)))
+
+    return(exposure.equalize_adapthist(image, kernel_size=kernel_size, clip_limit=clip_limit))
+
+
+def median(image, footprint, backend=None):
+    """
+    Median filter of a 2D image, as ``skimage.filters.median`` (``mode='nearest'``).
+    Boolean images always use ``pyroots.binary_majority``. The 'opencv' backend
+    uses ``cv2.medianBlur`` for uint8 images and square footprints.
+
+    Parameters
+    ----------
+    image : ndarray
+        2D image.
+    footprint : ndarray
+        Neighborhood.
+    backend : str
+        ``'skimage'`` or ``'opencv'``. Default = ``None``, the session backend.
+
+    Returns
+    -------
+    An ndarray of the same dtype as ``image``.
+    """
+    footprint = np.asarray(footprint)
+    if image.dtype == bool:
+        return(binary_majority(image, footprint))
+
+    square = (footprint.ndim == 2 and footprint.shape[0] == footprint.shape[1]
+              and footprint.shape[0] % 2 == 1 and np.all(footprint != 0))
+    if _backend(backend) == 'opencv' and image.dtype == np.uint8 and image.ndim == 2 and square:
+        if footprint.shape[0] == 1:
+            return(image.copy())
+        # medianBlur pads by replicating edges, like mode='nearest'
+        return(cv2.medianBlur(image, footprint.shape[0]))
+
+    return(filters.median(image, footprint))
+
+
+#########################################################################################################################
+#########################################################################################################################
+#######                                                                                                          ########
+#######                                                Binary                                                    ########
+#######                                                                                                          ########
+#########################################################################################################################
+#########################################################################################################################
+
+def binary_opening(image, footprint, backend=None):
+    """
+    Binary opening, as ``skimage.morphology.binary_opening``. Pixels outside the
+    image are ignored.
+
+    Parameters
+    ----------
+    image : ndarray (bool)
+        2D binary image.
+    footprint : ndarray
+        Structuring element. The 'opencv' and 'packed' backends handle odd sizes;
+        others use ``skimage``.
+    backend : str
+        ``'skimage'``, ``'opencv'`` or ``'packed'``. Default = ``None``, the
+        session backend.
+
+    Returns
+    -------
+    A boolean ndarray.
+    """
+    kernel = _kernel(footprint)
+    if _backend(backend) == 'opencv' and image.ndim == 2 and kernel is not None:
+        out = cv2.erode(image.astype(np.uint8), kernel)
+        out = cv2.dilate(out, kernel[::-1, ::-1].copy())  # dilation reflects the footprint
+        return(out > 0)
+    if _backend(backend) == 'packed' and image.ndim == 2 and kernel is not None:
+        return(PackedMask(image).opening(footprint).to_array())
+
+    return(morphology.binary_opening(image, footprint))
+
+
+def binary_closing(image, footprint, backend=None):
+    """
+    Binary closing, as ``skimage.morphology.binary_closing``. Pixels outside the
+    image are ignored.
+
+    Parameters
+    ----------
+    image : ndarray (bool)
+        2D binary image.
+    footprint : ndarray
+        Structuring element. The 'opencv' and 'packed' backends handle odd sizes;
+        others use ``skimage``.
+    backend : str
+        ``'skimage'``, ``'opencv'`` or ``'packed'``. Default = ``None``, the
+        session backend.
+
+    Returns
+    -------
+    A boolean ndarray.
+    """
+    kernel = _kernel(footprint)
+    if _backend(backend) == 'opencv' and image.ndim == 2 and kernel is not None:
+        out = cv2.dilate(image.astype(np.uint8), kernel[::-1, ::-1].copy())
+        out = cv2.erode(out, kernel)
+        return(out > 0)
+    if _backend(backend) == 'packed' and image.ndim == 2 and kernel is not None:
+        return(PackedMask(image).closing(footprint).to_array())
+
+    return(morphology.binary_closing(image, footprint))
+
+
+def label(image, structure=None, backend=None):
+    """
+    Label connected objects in a 2D binary image, as ``scipy.ndimage.label``.
+    Both backends number objects in the order their first pixel appears, row by
+    row.
+
+    Parameters
+    ----------
+    image : ndarray
+        2D binary image.
+    structure : ndarray
+        3x3 connectivity. Default = ``None``, square connectivity (4 neighbors).
+        The 'opencv' backend handles 4 and 8 neighbors; others use
+        ``ndimage.label``.
+    backend : str
+        ``'skimage'`` or ``'opencv'``. Default = ``None``, the session backend.
+
+    Returns
+    -------
+    The labels (int32) and the number of objects.
+    """
+    connectivity = None
+    if structure is None:
+        connectivity = 4
+    else:
+        structure = np.asarray(structure) != 0
+        if structure.shape == (3, 3) and np.all(structure):
+            connectivity = 8
+        elif np.array_equal(structure, ndimage.generate_binary_structure(2, 1)):
+            connectivity = 4
+
+    if _backend(backend) == 'opencv' and image.ndim == 2 and connectivity is not None:
+        # Wu's scan numbers objects in raster order; OpenCV's default algorithms don't
+        count, labels = cv2.connectedComponentsWithAlgorithm(np.asarray(image != 0, dtype=np.uint8),
+                                                             connectivity, cv2.CV_32S, cv2.CCL_WU)
+        return(labels, count - 1)
+
+    return(ndimage.label(image, structure=structure))
+
+
+def remove_small_objects(image, min_size=64, connectivity=1, backend=None):
+    """
+    Remove objects smaller than ``min_size`` pixels from a binary image. Objects
+    of exactly ``min_size`` are kept, as in ``skimage.morphology.remove_small_objects``
+    before version 0.26.
+
+    Parameters
+    ----------
+    image : ndarray (bool)
+        2D binary image.
+    min_size : int
+        Smallest area to keep, in pixels.
+    connectivity : int
+        1 for square (4 neighbors), 2 for 8 neighbors.
+    backend : str
+        ``'skimage'`` or ``'opencv'``. ``'skimage'`` labels with ``scipy.ndimage``.
+        Default = ``None``, the session backend.
+
+    Returns
+    -------
+    A boolean ndarray.
+    """
+    image = np.asarray(image, dtype=bool)
+    if _backend(backend) == 'opencv' and image.ndim == 2:
+        count, labels, stats, centroids = cv2.connectedComponentsWithStats(
+            image.astype(np.uint8), connectivity=4 if connectivity == 1 else 8, ltype=cv2.CV_32S)
+        area = stats[:, cv2.CC_STAT_AREA]
+    else:
+        labels = ndimage.label(image, structure=ndimage.generate_binary_structure(2, connectivity))[0]
+        area = np.bincount(labels.ravel())
+
+    keep = area >= min_size
+    keep[0] = False  # background
+    return(keep[labels])
@@ -13,6 +13,8 @@ import numpy as np
 from numpy import array, uint8
 import pandas as pd
 from pyroots import *
+from pyroots.utilities import _sample_files
+from pyroots import smoothing
 from skimage import io, color, filters, morphology, img_as_ubyte, img_as_float
 from multiprocessing import Pool
 from warnings import warn
@@ -259,8 +261,14 @@ def preprocessing_actions_loop(dir_in,
             # make a brightfield correction image for the directory
             def _make_brightfield_image(directory, brightfield_name, brightfield_sigma):
                 correction = io.imread(os.path.join(directory, brightfield_name))
-                correction = cv2.GaussianBlur(correction, (0, 0), brightfield_sigma)
-                return(correction)
+                if brightfield_sigma < 32:  # OpenCV's spatial kernel is faster on uint8 here
+                    return(cv2.GaussianBlur(correction, (0, 0), brightfield_sigma))
+                blurred = smoothing.gaussian(correction.astype(np.float32), brightfield_sigma,
+                                             mode='mirror', multichannel=correction.ndim == 3,
+                                             preserve_range=True)
+                if correction.dtype.kind in 'biu':
+                    blurred = np.round(blurred)
+                return(blurred.astype(correction.dtype))
 
             try:
                 correction = _make_brightfield_image(path, **make_brightfield_params)
@@ -354,7 +362,9 @@ def frangi_image_loop(dir_in,
                       params=None,
                       mask=None,
                       save_images=False,
-                      threads=1):
+                      threads=1,
+                      calibrate=False,
+                      prune_scales=False):
     """
     Reference function to loop through images in a directory. As it is written, it returns
     a dataframe from `pyroots.frangi_segmentation` and also writes images showing the objects analyzed.
@@ -382,6 +392,15 @@ def frangi_image_loop(dir_in,
         Do you want to save images of the objects?
     threads : int
         For multiprocessing
+    calibrate : bool or `pyroots.SessionCalibration`
+        Calibrate the Frangi smoothing sigma on the first images of each subdirectory and reuse it
+        for the rest? `True` uses the defaults of `pyroots.SessionCalibration`. With `threads`, each
+        process calibrates separately.
+    prune_scales : bool or int
+        Replace `frangi_args['scale_range']` with the shortest range that covers the diameters of
+        objects in a random sample of images? `True` samples 5 images, or give the number. The
+        `scale_range` in `params` should span every scale that might be needed. See
+        `pyroots.frangi_scale_range`.
     extra_imports : list
         If raises error importing params, then write a list of lists as
             [[lib1, fun1, fun2, ...],
@@ -482,6 +501,34 @@ def frangi_image_loop(dir_in,
                     total_files += 1
     print("\nYou have {} images to analyze".format(total_files))
 
+    # Calibration shared by images in a subdirectory
+    if calibrate is True:
+        calibration = SessionCalibration()
+    elif calibrate is False:
+        calibration = None
+    else:
+        calibration = calibrate
+
+    # Shortest scale_range for the diameters in a sample of images
+    if prune_scales is not False and params is not None:
+        n_sample = 5 if prune_scales is True else prune_scales
+        print("\nCalibrating scale_range on {} images".format(min(n_sample, total_files)))
+        sample = []
+        for f in _sample_files(min(n_sample, total_files), dir_in, extension_in, exclude=dir_out):
+            img = io.imread(f)
+            sample.append(img * mask if mask is not None else img)
+        globals()['frangi_args'] = frangi_scale_range(sample, colors, frangi_args, threshold_args,
+                                                      verbose=True,
+                                                      color_args_1=color_args_1,
+                                                      color_args_2=color_args_2,
+                                                      color_args_3=color_args_3,
+                                                      morphology_args_1=morphology_args_1,
+                                                      morphology_args_2=morphology_args_2,
+                                                      hollow_args=hollow_args,
+                                                      fill_gaps_args=fill_gaps_args,
+                                                      diameter_args=diameter_args)
+        del sample
+
     #Begin looping
     out = []  # secondary saving method
     for path, folder, filename in os.walk(dir_in):
@@ -529,7 +576,10 @@ def frangi_image_loop(dir_in,
                                                                diameter_args,
                                                                diameter_bins,
                                                                image_name=os.path.join(subpath,
-                                                                                       filename))
+                                                                                       filename),
+                                                               sparse=True,
+                                                               calibration=calibration,
+                                                               session=path)
 
                             #save images?
                             if save_images is True:
@@ -809,7 +859,8 @@ def pyroots_batch_loop(dir_in,
                                     diameter_args,
                                     diameter_bins,
                                     image_name=image_name,
-                                    verbose=False
+                                    verbose=False,
+                                    sparse=True  # only objects and geometry are used
                                 )
 
                             elif method == 'thresholding':
@@ -826,7 +877,8 @@ def pyroots_batch_loop(dir_in,
                                     lw_filter_args,
                                     diam_filter_args,
                                     diameter_bins,
-                                    verbose=False
+                                    verbose=False,
+                                    sparse=True  # only objects and geometry are used
                                 )
 
                             elif method == 'custom':
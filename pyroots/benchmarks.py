@@ -0,0 +1,708 @@
+"""
+Created on Sat Oct 17 2026
+
+@author: pme
+
+Timing and accuracy checks of pyroots functions against the methods they
+replaced. Each benchmark returns a ``pandas.DataFrame`` so results can be
+compared across machines and images. By default they run on the bundled
+`sample_images`.
+
+Contents:
+- _sample_objects
+- _time_it
+- _axis_length_reference
+- benchmark_axis_length
+- _percentile_reference
+- benchmark_percentile
+- _sample_bands
+- benchmark_threshold_local
+- _backend_cases
+- benchmark_backends
+- benchmark_disk_closing
+- benchmark_skeleton
+- _frangi_reference
+- benchmark_frangi
+- benchmark_frangi_pyramid
+- benchmark_smoothing
+"""
+
+import os
+from time import perf_counter
+import numpy as np
+import pandas as pd
+from scipy import ndimage
+from skimage import io, morphology, filters
+from pyroots.skeletonization import _axis_length, _pixel_weights, skeleton_with_distance, SKELETON_BACKENDS
+from pyroots.component_stats import _grouped_percentile
+from pyroots.local_threshold import threshold_local
+from pyroots import backends as kernel_backends
+from pyroots.binary_morphology import disk_closing
+from pyroots.vesselness import frangi
+from pyroots.smoothing import gaussian
+
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "sample_images")
+
+
+def _sample_objects():
+    """
+    Load the binary object images in `sample_images/Pyroots Analyzed` as a
+    dictionary of {file name : boolean ndarray}.
+    """
+    dir_in = os.path.join(SAMPLE_DIR, "Pyroots Analyzed")
+    out = {}
+    for f in sorted(os.listdir(dir_in)):
+        if f.endswith(".tif"):
+            out[f] = io.imread(os.path.join(dir_in, f)) == 0  # objects are black
+    return(out)
+
+
+def _time_it(fn, repeats=3):
+    """
+    Call `fn` `repeats` times. Returns the output of the last call and the
+    fastest time, in seconds.
+    """
+    best = np.inf
+    for i in range(repeats):
+        start = perf_counter()
+        out = fn()
+        best = min(best, perf_counter() - start)
+    return(out, best)
+
+
+#########################################################################################################################
+#########################################################################################################################
+#######                                                                                                          ########
+#######                                              Axis Length                                                 ########
+#######                                                                                                          ########
+#########################################################################################################################
+#########################################################################################################################
+
+def _axis_length_reference(image, labels, pixel_weight):
+    """
+    The original (pixel loop) implementation of ``pyroots._axis_length`` for
+    labelled images. Kept for benchmarking only.
+    """
+    kernel = np.array([[10, 2, 10],
+                       [ 2, 1,  2],
+                       [10, 2, 10]])
+    kernel_out = ndimage.convolve(image.astype(np.uint8), kernel,
+                                  mode='constant', cval=0)
+    dims = kernel_out.shape
+    pixel_length = np.zeros(dims)
+    for i in range(dims[0]):
+        for j in range(dims[1]):
+            pixel_length[i,j] = pixel_weight[kernel_out[i,j]]
+    length_out = ndimage.sum(pixel_length,
+                             labels=labels,
+                             index=range(labels.max() + 1)[1:])
+    return(pixel_length, length_out)
+
+
+def benchmark_axis_length(images=None, repeats=3):
+    """
+    Compare the sparse ``pyroots._axis_length`` with the original pixel loop
+    on the medial axes of binary images.
+
+    Parameters
+    ----------
+    images : dict or None
+        {name : boolean ndarray} of objects. If `None`, uses the bundled sample
+        images.
+    repeats : int
+        Number of timing runs. The fastest is reported.
+
+    Returns
+    -------
+    A ``pandas.DataFrame`` with the time for each method and the largest
+    difference in object length between them.
+    """
+    if images is None:
+        images = _sample_objects()
+
+    pixel_weight = _pixel_weights(random=True)
+
+    out = []
+    for name, img in images.items():
+        labels = ndimage.label(img)[0]
+        skel = morphology.medial_axis(img)
+
+        new, new_time = _time_it(lambda: _axis_length(skel, labels), repeats)
+        old, old_time = _time_it(lambda: _axis_length_reference(skel, labels, pixel_weight), repeats)
+
+        out.append({"Image" : name,
+                    "Pixels" : img.size,
+                    "SkeletonPixels" : int(skel.sum()),
+                    "ReferenceTime" : old_time,
+                    "SparseTime" : new_time,
+                    "Speedup" : old_time / new_time,
+                    "MaxLengthDiff" : np.max(np.abs(new[1] - old[1]), initial=0)})
+
+    return(pd.DataFrame(out))
+
+
+#########################################################################################################################
+#########################################################################################################################
+#######                                                                                                          ########
+#######                                          Grouped Percentile                                              ########
+#######                                                                                                          ########
+#########################################################################################################################
+#########################################################################################################################
+
+def _percentile_reference(labels, values, percentile):
+    """
+    The original (masked array per object) percentile loop of
+    ``pyroots._percentile_filter``. Kept for benchmarking only.
+    """
+    out = []
+    for i in range(labels.max()):
+        temp = np.ma.masked_array(values, labels != i+1)  # 0 is background
+        temp = np.percentile(temp.compressed(), percentile)
+        out.append(temp)
+    return(np.array(out))
+
+
+def benchmark_percentile(n_objects=[10, 100, 1000, 10000, 100000], pixels=20,
+                         percentile=90, max_reference=1000, repeats=3, seed=0):
+    """
+    Compare ``pyroots._grouped_percentile`` with the original per-object loop in
+    ``pyroots._percentile_filter`` on random skeleton-like data.
+
+    Parameters
+    ----------
+    n_objects : list of int
+        Numbers of objects to test.
+    pixels : int
+        Mean number of skeleton pixels per object.
+    percentile : float
+        Percentile to compute.
+    max_reference : int
+        Largest number of objects to run the original loop on. It scales with
+        objects x pixels, so it isn't timed beyond this. Default = 1000.
+    repeats : int
+        Number of timing runs. The fastest is reported.
+    seed : int
+        For ``numpy.random.RandomState``.
+
+    Returns
+    -------
+    A ``pandas.DataFrame`` with the time for each method and the largest
+    difference between them. Reference columns are ``nan`` where skipped.
+    """
+    random = np.random.RandomState(seed)
+
+    out = []
+    for n in n_objects:
+        labels = random.randint(1, n+1, size=n*pixels)
+        labels[:n] = np.arange(1, n+1)  # every object has at least one pixel
+        values = random.gamma(2, 2, size=labels.size)
+
+        new, new_time = _time_it(lambda: _grouped_percentile(labels, values, percentile), repeats)
+        row = {"Objects" : n,
+               "Pixels" : labels.size,
+               "GroupedTime" : new_time,
+               "ReferenceTime" : np.nan,
+               "Speedup" : np.nan,
+               "MaxDiff" : np.nan}
+
+        if n <= max_reference:
+            old, old_time = _time_it(lambda: _percentile_reference(labels, values, percentile), repeats)
+            row["ReferenceTime"] = old_time
+            row["Speedup"] = old_time / new_time
+            row["MaxDiff"] = np.max(np.abs(new[1:] - old))
+
+        out.append(row)
+
+    return(pd.DataFrame(out))
+
+
+#########################################################################################################################
+#########################################################################################################################
+#######                                                                                                          ########
+#######                                            Local Threshold                                               ########
+#######                                                                                                          ########
+#########################################################################################################################
+#########################################################################################################################
+
+def _sample_bands(band=2, tile=1):
+    """
+    Load the RGB images in `sample_images` as a dictionary of
+    {file name : float band}, each tiled `tile` x `tile` times to the size of a
+    typical microscope image.
+    """
+    out = {}
+    for f in sorted(os.listdir(SAMPLE_DIR)):
+        if f.endswith(".jpg"):
+            img = io.imread(os.path.join(SAMPLE_DIR, f))[:, :, band] / 255
+            out[f] = np.tile(img, (tile, tile))
+    return(out)
+
+
+def benchmark_threshold_local(images=None, block_sizes=[51, 101, 151], methods=['gaussian', 'mean'],
+                              backends=['integral', 'downsample'], offset=0.02, tile=4, repeats=3):
+    """
+    Compare the backends of ``pyroots.threshold_local`` with
+    ``skimage.filters.threshold_local``, for speed and for how many pixels end
+    up on the other side of the threshold.
+
+    Parameters
+    ----------
+    images : dict or None
+        {name : grayscale ndarray}. If `None`, uses band 2 of the bundled sample
+        images, tiled `tile` x `tile`.
+    block_sizes : list of int
+        Odd block sizes to test.
+    methods : list of str
+        ``'gaussian'`` and/or ``'mean'``.
+    backends : list of str
+        Backends of ``pyroots.threshold_local`` to compare with ``'skimage'``.
+    offset : float
+        Passed to the threshold.
+    tile : int
+        Tiling of the sample images. Ignored if `images` is given.
+    repeats : int
+        Number of timing runs. The fastest is reported.
+
+    Returns
+    -------
+    A ``pandas.DataFrame`` with a row per image, block size, method and backend:
+    times, speedup, the largest difference in the threshold surface, and the
+    fraction of pixels classified differently.
+    """
+    if images is None:
+        images = _sample_bands(tile=tile)
+
+    out = []
+    for name, img in images.items():
+        for block_size in block_sizes:
+            for method in methods:
+                ref, ref_time = _time_it(lambda: threshold_local(img, block_size, method, offset), repeats)
+                for backend in backends:
+                    new, new_time = _time_it(lambda: threshold_local(img, block_size, method, offset,
+                                                                     backend=backend), repeats)
+                    out.append({"Image" : name,
+                                "Pixels" : img.size,
+                                "BlockSize" : block_size,
+                                "Method" : method,
+                                "Backend" : backend,
+                                "Time" : new_time,
+                                "ReferenceTime" : ref_time,
+                                "Speedup" : ref_time / new_time,
+                                "MaxDiff" : np.max(np.abs(new - ref)),
+                                "Flipped" : np.mean((img > new) != (img > ref))})
+
+    return(pd.DataFrame(out))
+
+
+#########################################################################################################################
+#########################################################################################################################
+#######                                                                                                          ########
+#######                                               Backends                                                   ########
+#######                                                                                                          ########
+#########################################################################################################################
+#########################################################################################################################
+
+def _backend_cases(band, objects):
+    """
+    Calls of each ``pyroots.backends`` kernel as {name : function of backend},
+    with the settings pyroots uses.
+    """
+    band_8 = (band * 255).astype(np.uint8)
+    disk = morphology.disk(2)
+    return({"gaussian sigma=2" : lambda b: kernel_backends.gaussian(band, 2, backend=b),
+            "gaussian sigma=8" : lambda b: kernel_backends.gaussian(band, 8, backend=b),
+            "equalize_adapthist" : lambda b: kernel_backends.equalize_adapthist(band, backend=b),
+            "median 5x5 uint8" : lambda b: kernel_backends.median(band_8, np.ones((5, 5)), backend=b),
+            "binary_opening disk(2)" : lambda b: kernel_backends.binary_opening(objects, disk, backend=b),
+            "binary_closing disk(2)" : lambda b: kernel_backends.binary_closing(objects, disk, backend=b),
+            "label 4" : lambda b: kernel_backends.label(objects, backend=b)[0],
+            "label 8" : lambda b: kernel_backends.label(objects, np.ones((3, 3)), backend=b)[0],
+            "remove_small_objects 50" : lambda b: kernel_backends.remove_small_objects(objects, 50, backend=b)})
+
+
+def benchmark_backends(images=None, objects=None, backend='opencv', tile=2, repeats=3):
+    """
+    Check each kernel in ``pyroots.backends`` against the 'skimage' backend, for
+    speed and for agreement. This is the equivalence test to run after changing a
+    backend or upgrading OpenCV or ``skimage``.
+
+    Parameters
+    ----------
+    images : dict or None
+        {name : grayscale float ndarray in [0, 1]}, for the grayscale kernels.
+        If `None`, uses band 2 of the bundled sample images, tiled `tile` x `tile`.
+    objects : dict or None
+        {name : boolean ndarray}, for the binary kernels. If `None`, uses the
+        bundled `Pyroots Analyzed` images, tiled `tile` x `tile`.
+    backend : str
+        Backend to compare with 'skimage': 'opencv' or 'packed'.
+    tile : int
+        Tiling of the sample images. Ignored for images that are given.
+    repeats : int
+        Number of timing runs. The fastest is reported.
+
+    Returns
+    -------
+    A ``pandas.DataFrame`` with a row per image and kernel: times, speedup, the
+    largest absolute difference, and whether the outputs are identical. Only
+    ``gaussian`` and ``equalize_adapthist`` should differ (see
+    ``pyroots.backends``).
+    """
+    if images is None:
+        images = _sample_bands(tile=tile)
+    if objects is None:
+        objects = {k : np.tile(v, (tile, tile)) for k, v in _sample_objects().items()}
+
+    out = []
+    for (name, band), obj in zip(images.items(), objects.values()):
+        for kernel, fn in _backend_cases(band, obj).items():
+            ref, ref_time = _time_it(lambda: fn('skimage'), repeats)
+            new, new_time = _time_it(lambda: fn(backend), repeats)
+            out.append({"Image" : name,
+                        "Pixels" : band.size,
+                        "Kernel" : kernel,
+                        "Backend" : backend,
+                        "Time" : new_time,
+                        "ReferenceTime" : ref_time,
+                        "Speedup" : ref_time / new_time,
+                        "MaxDiff" : np.max(np.abs(new.astype(np.float64) - ref.astype(np.float64))),
+                        "Equal" : np.array_equal(new, ref)})
+
+    return(pd.DataFrame(out))
+
+
+def benchmark_disk_closing(objects=None, radii=[2, 4, 8, 12, 18, 25], tile=4, repeats=3):
+    """
+    Time binary closing by disks of increasing radius with ``skimage``, OpenCV
+    (``pyroots.backends``) and distance transforms (``pyroots.disk_closing``),
+    and check that all three agree. Use it to choose ``distance_radius`` in
+    ``pyroots.fill_gaps`` and ``pyroots.hollow_filter``.
+
+    Parameters
+    ----------
+    objects : dict or None
+        {name : boolean ndarray}. If `None`, uses the bundled `Pyroots Analyzed`
+        images, tiled `tile` x `tile`.
+    radii : list of int
+        Radii of ``skimage.morphology.disk`` to test.
+    tile : int
+        Tiling of the sample images. Ignored if `objects` is given.
+    repeats : int
+        Number of timing runs. The fastest is reported.
+
+    Returns
+    -------
+    A ``pandas.DataFrame`` with a row per image and radius: the time of each
+    method, and whether OpenCV and distance transforms match ``skimage``.
+    """
+    if objects is None:
+        objects = {k : np.tile(v, (tile, tile)) for k, v in _sample_objects().items()}
+
+    out = []
+    for name, obj in objects.items():
+        for radius in radii:
+            disk = morphology.disk(radius)
+            ref, ref_time = _time_it(lambda: kernel_backends.binary_closing(obj, disk, backend='skimage'), repeats)
+            cv, cv_time = _time_it(lambda: kernel_backends.binary_closing(obj, disk, backend='opencv'), repeats)
+            dist, dist_time = _time_it(lambda: disk_closing(obj, disk), repeats)
+            out.append({"Image" : name,
+                        "Pixels" : obj.size,
+                        "Radius" : radius,
+                        "SkimageTime" : ref_time,
+                        "OpencvTime" : cv_time,
+                        "DistanceTime" : dist_time,
+                        "OpencvEqual" : np.array_equal(cv, ref),
+                        "DistanceEqual" : np.array_equal(dist, ref)})
+
+    return(pd.DataFrame(out))
+
+
+#########################################################################################################################
+#########################################################################################################################
+#######                                                                                                          ########
+#######                                               Skeletons                                                  ########
+#######                                                                                                          ########
+#########################################################################################################################
+#########################################################################################################################
+
+def benchmark_skeleton(objects=None, backends=SKELETON_BACKENDS, tile=2, repeats=3):
+    """
+    Compare the backends of ``pyroots.skeleton_with_distance`` with
+    'medial_axis', for speed and for the length and mean diameter they give
+    each object.
+
+    Parameters
+    ----------
+    objects : dict or None
+        {name : boolean ndarray}. If `None`, uses the bundled `Pyroots Analyzed`
+        images, tiled `tile` x `tile`.
+    backends : list of str
+        Backends to compare. See ``pyroots.skeletonization.SKELETON_BACKENDS``.
+    tile : int
+        Tiling of the sample images. Ignored if `objects` is given.
+    repeats : int
+        Number of timing runs. The fastest is reported.
+
+    Returns
+    -------
+    A ``pandas.DataFrame`` with a row per image and backend: time, speedup,
+    total length relative to 'medial_axis', and the median and largest relative
+    difference in length and diameter of an object. 'medial_axis' breaks ties
+    at random, so it differs a little from itself.
+    """
+    if objects is None:
+        objects = {k : np.tile(v, (tile, tile)) for k, v in _sample_objects().items()}
+
+    out = []
+    for name, obj in objects.items():
+        ref, ref_time = _time_it(lambda: skeleton_with_distance(obj, sparse=True), repeats)
+        ref = ref["geometry"].iloc[1:]
+        for backend in backends:
+            new, new_time = _time_it(lambda: skeleton_with_distance(obj, sparse=True, backend=backend), repeats)
+            new = new["geometry"].iloc[1:]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                length = np.abs(new["Length"].values / ref["Length"].values - 1)
+                diameter = np.abs(new["Diameter"].values / ref["Diameter"].values - 1)
+            out.append({"Image" : name,
+                        "Objects" : len(ref),
+                        "Backend" : backend,
+                        "Time" : new_time,
+                        "ReferenceTime" : ref_time,
+                        "Speedup" : ref_time / new_time,
+                        "TotalLength" : new["Length"].sum() / ref["Length"].sum(),
+                        "LengthDeviation" : np.nanmedian(length),
+                        "MaxLengthDeviation" : np.nanmax(length),
+                        "DiameterDeviation" : np.nanmedian(diameter),
+                        "MaxDiameterDeviation" : np.nanmax(diameter)})
+
+    return(pd.DataFrame(out))
+
+
+#########################################################################################################################
+#########################################################################################################################
+#######                                                                                                          ########
+#######                                                Frangi                                                    ########
+#######                                                                                                          ########
+#########################################################################################################################
+#########################################################################################################################
+
+def _frangi_reference(image, scale_range=(1, 10), scale_step=2, beta1=0.5, beta2=15, black_ridges=True):
+    """
+    The float64 Frangi filter of ``skimage.filters.frangi`` (with ``scale_range``),
+    written out: Hessians with ``mode='constant'``, eigenvalues from
+    ``np.linalg.eigvalsh``, and a stack of every scale.
+    """
+    image = np.asarray(image, dtype=np.float64)
+    sigmas = np.arange(scale_range[0], scale_range[1], scale_step)
+    beta1 = 2 * beta1**2
+    beta2 = 2 * beta2**2
+    filtered_array = np.zeros(sigmas.shape + image.shape)
+    lambdas_array = np.zeros(sigmas.shape + image.shape)
+    for i, sigma in enumerate(sigmas):
+        smooth = ndimage.gaussian_filter(image, sigma, mode='constant', cval=0)
+        gradients = np.gradient(smooth)
+        h_cc = np.gradient(gradients[1], axis=1) * sigma**2
+        h_cr = np.gradient(gradients[1], axis=0) * sigma**2
+        h_rr = np.gradient(gradients[0], axis=0) * sigma**2
+        matrices = np.stack([np.stack([h_cc, h_cr], -1), np.stack([h_cr, h_rr], -1)], -2)
+        eigs = np.linalg.eigvalsh(matrices)[..., ::-1]  # largest first
+        lambda1, lambda2 = eigs[..., 0], eigs[..., 1]
+        lambda1[lambda1 == 0] = 1e-10
+        rb = (lambda2 / lambda1)**2
+        s2 = lambda1**2 + lambda2**2
+        filtered_array[i] = np.exp(-rb / beta1) * (np.ones(image.shape) - np.exp(-s2 / beta2))
+        lambdas_array[i] = lambda1
+    if black_ridges:
+        filtered_array[lambdas_array < 0] = 0
+    else:
+        filtered_array[lambdas_array > 0] = 0
+    return(np.max(filtered_array, axis=0))
+
+
+def benchmark_frangi(images=None, frangi_args={'scale_range' : (2, 6), 'scale_step' : 1,
+                                               'beta1' : 0.99, 'beta2' : 0.03},
+                     threshold_args={'block_size' : 31, 'param' : 5.0, 'offset' : 0.21},
+                     tile=2, repeats=3):
+    """
+    Compare the 'float32' backend of ``pyroots.vesselness.frangi`` with the
+    float64 filter of ``skimage``, and report time and memory for each scale.
+
+    Parameters
+    ----------
+    images : dict or None
+        {name : grayscale ndarray}. If `None`, uses band 2 of the bundled sample
+        images, tiled `tile` x `tile`.
+    frangi_args : dict
+        Passed to the filter. Defaults to those in the "Blue Hyphae" parameters.
+    threshold_args : dict or None
+        Passed to ``pyroots.threshold_local`` to count pixels classified
+        differently, as in ``pyroots.frangi_segmentation``. `None` to skip.
+    tile : int
+        Tiling of the sample images. Ignored if `images` is given.
+    repeats : int
+        Number of timing runs. The fastest is reported.
+
+    Returns
+    -------
+    A ``pandas.DataFrame`` with a row per image and scale: the time and peak
+    temporary memory of the scale, then for the whole image the time of each
+    method, the speedup, the largest difference in vesselness, and the fraction
+    of pixels classified differently.
+    """
+    if images is None:
+        images = _sample_bands(tile=tile)
+
+    out = []
+    for name, img in images.items():
+        ref, ref_time = _time_it(lambda: _frangi_reference(img, **frangi_args), repeats)
+        new, new_time = _time_it(lambda: frangi(img, backend='float32', **frangi_args), repeats)
+        profile = []
+        frangi(img, backend='float32', profile=profile, **frangi_args)
+
+        flipped = np.nan
+        if threshold_args is not None:
+            ref = 1 - ref/np.max(ref)
+            new = 1 - new/np.max(new)
+            flipped = np.mean((ref < threshold_local(ref, **threshold_args)) !=
+                              (new < threshold_local(new, **threshold_args)))
+        for p in profile:
+            out.append({"Image" : name,
+                        "Pixels" : img.size,
+                        "Scale" : p["Scale"],
+                        "ScaleTime" : p["Time"],
+                        "ScaleBytes" : p["Bytes"],
+                        "Time" : new_time,
+                        "ReferenceTime" : ref_time,
+                        "Speedup" : ref_time / new_time,
+                        "MaxDiff" : np.max(np.abs(new - ref)),
+                        "Flipped" : flipped})
+
+    return(pd.DataFrame(out))
+
+
+def benchmark_frangi_pyramid(images=None, frangi_args={'scale_range' : (2, 22), 'scale_step' : 4,
+                                                       'beta1' : 0.99, 'beta2' : 0.03},
+                             pyramids=[2, 3, 4, 6], tolerance=0.02,
+                             threshold_args={'block_size' : 31, 'param' : 5.0, 'offset' : 0.21},
+                             megapixels=48, repeats=1):
+    """
+    Compare the `pyramid` option of ``pyroots.vesselness.frangi`` with the same
+    filter at full resolution, on images the size of a large scan.
+
+    Parameters
+    ----------
+    images : dict or None
+        {name : grayscale ndarray}. If `None`, uses band 2 of the bundled sample
+        images, tiled to about `megapixels`.
+    frangi_args : dict
+        Passed to the filter, with ``backend='float32'``. Defaults to scales
+        like those of roots.
+    pyramids : list of float
+        Values of `pyramid` to compare.
+    tolerance : float
+        Largest difference in vesselness to accept.
+    threshold_args : dict or None
+        Passed to ``pyroots.threshold_local`` to count pixels classified
+        differently, as in ``pyroots.frangi_segmentation``. `None` to skip.
+    megapixels : float
+        Size of the tiled sample images. Ignored if `images` is given.
+    repeats : int
+        Number of timing runs. The fastest is reported.
+
+    Returns
+    -------
+    A ``pandas.DataFrame`` with a row per image and value of `pyramid`: the time
+    of each method, the speedup, the largest difference in vesselness, whether
+    that's within `tolerance`, and the fraction of pixels classified
+    differently.
+    """
+    if images is None:
+        images = _sample_bands()
+        for name, img in images.items():
+            tile = max(1, int(round(np.sqrt(megapixels * 1e6 / img.size))))
+            images[name] = np.tile(img, (tile, tile)).astype(np.float32)
+
+    def classify(vesselness):
+        vesselness = 1 - vesselness/np.max(vesselness)
+        return(vesselness < threshold_local(vesselness, **threshold_args))
+
+    out = []
+    for name, img in images.items():
+        full, full_time = _time_it(lambda: frangi(img, backend='float32', **frangi_args), repeats)
+        if threshold_args is not None:
+            full_class = classify(full)
+        for pyramid in pyramids:
+            new, new_time = _time_it(lambda: frangi(img, backend='float32', pyramid=pyramid,
+                                                    **frangi_args), repeats)
+            diff = np.max(np.abs(new - full))
+            flipped = np.nan
+            if threshold_args is not None:
+                flipped = np.mean(classify(new) != full_class)
+            out.append({"Image" : name,
+                        "Pixels" : img.size,
+                        "Pyramid" : pyramid,
+                        "Time" : new_time,
+                        "FullTime" : full_time,
+                        "Speedup" : full_time / new_time,
+                        "MaxDiff" : diff,
+                        "WithinTolerance" : diff <= tolerance,
+                        "Flipped" : flipped})
+            del new
+
+    return(pd.DataFrame(out))
+
+
+#########################################################################################################################
+#########################################################################################################################
+#######                                                                                                          ########
+#######                                              Smoothing                                                   ########
+#######                                                                                                          ########
+#########################################################################################################################
+#########################################################################################################################
+
+def benchmark_smoothing(images=None, sigmas=[2, 5, 10, 15, 30, 100, 300],
+                        methods=['direct', 'fft', 'box', 'pyramid', 'auto'], tile=4, repeats=3):
+    """
+    Compare the methods of ``pyroots.smoothing.gaussian`` with
+    ``skimage.filters.gaussian``, for speed and accuracy, at the sigmas of
+    ``equalize_exposure`` (a tenth of the image) and of preprocessing (10-15).
+
+    Parameters
+    ----------
+    images : dict or None
+        {name : grayscale ndarray}. If `None`, uses band 2 of the bundled sample
+        images, tiled `tile` x `tile`.
+    sigmas : list of float
+        Standard deviations to compare.
+    methods : list of str
+        Methods of ``pyroots.smoothing.gaussian``.
+    tile : int
+        Tiling of the sample images. Ignored if `images` is given.
+    repeats : int
+        Number of timing runs. The fastest is reported.
+
+    Returns
+    -------
+    A ``pandas.DataFrame`` with a row per image, sigma and method: the time of
+    each, the speedup, and the largest difference from ``skimage``.
+    """
+    if images is None:
+        images = _sample_bands(tile=tile)
+
+    out = []
+    for name, img in images.items():
+        for sigma in sigmas:
+            ref, ref_time = _time_it(lambda: filters.gaussian(img, sigma=sigma), repeats)
+            for method in methods:
+                new, new_time = _time_it(lambda: gaussian(img, sigma, method=method), repeats)
+                out.append({"Image" : name,
+                            "Pixels" : img.size,
+                            "Sigma" : sigma,
+                            "Method" : method,
+                            "Time" : new_time,
+                            "ReferenceTime" : ref_time,
+                            "Speedup" : ref_time / new_time,
+                            "MaxDiff" : np.max(np.abs(new - ref))})
+
+    return(pd.DataFrame(out))
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: pme
+
+Morphology for binary images by counting pixels rather than sorting them. On a
+boolean image, a median filter is a majority vote: a pixel is ``True`` if more
+than half of its neighborhood is. Counts come from running sums along each row
+of the footprint, so the cost per pixel grows with the footprint's height, not
+its area, and repeated passes reuse the same buffers.
+
+Dilation and erosion by a large disk are thresholds of a Euclidean distance
+transform: a pixel is within a disk of radius r of an object if its distance to
+the object is at most r. The cost of the transform doesn't depend on r.
+
+Contents:
+- _footprint_spans
+- _replicate_edges
+- binary_majority
+- _disk_threshold
+- _distance
+- disk_dilation
+- disk_erosion
+- disk_closing
+"""
+
+import numpy as np
+import cv2
+
+
+def _footprint_spans(footprint):
+    """
+    Horizontal runs of ``True`` in a footprint, as (row offset, first column
+    offset, last column offset) from the footprint's center. Centers are at
+    ``shape // 2``, as in ``scipy.ndimage``.
+    """
+    footprint = np.asarray(footprint, dtype=bool)
+    center = np.array(footprint.shape) // 2
+    padded = np.pad(footprint, ((0, 0), (1, 1)), mode='constant')
+    first = padded[:, 1:-1] & ~padded[:, :-2]
+    last = padded[:, 1:-1] & ~padded[:, 2:]
+    rows, start = np.nonzero(first)
+    end = np.nonzero(last)[1]
+    return(list(zip(rows - center[0], start - center[1], end - center[1])))
+
+
+def _replicate_edges(padded, before, after):
+    """
+    Fill the border of ``padded`` in place by repeating the outermost row and
+    column of the interior, like ``np.pad(..., mode='edge')``.
+    """
+    rows, cols = padded.shape
+    if before[0] > 0:
+        padded[:before[0]] = padded[before[0]]
+    if after[0] > 0:
+        padded[rows - after[0]:] = padded[rows - after[0] - 1]
+    if before[1] > 0:
+        padded[:, :before[1]] = padded[:, before[1], np.newaxis]
+    if after[1] > 0:
+        padded[:, cols - after[1]:] = padded[:, cols - after[1] - 1, np.newaxis]
+
+
+def binary_majority(image, footprint, iterations=1):
+    """
+    Median filter for a binary image. Each pixel becomes ``True`` if the number
+    of ``True`` pixels under ``footprint`` is past the middle, which is exactly
+    what ``skimage.filters.median`` (``scipy.ndimage.median_filter``, with
+    ``mode='nearest'``) gives for boolean input, much faster.
+
+    Parameters
+    ----------
+    image : ndarray (bool)
+        Binary image.
+    footprint : ndarray
+        Neighborhood, for example ``pyroots.noise_filters._disk(2)``. Nonzero
+        elements count.
+    iterations : int
+        Number of passes. Buffers are allocated once and reused. Default = 1.
+
+    Returns
+    -------
+    A boolean ndarray of the same shape as ``image``.
+
+    See Also
+    --------
+    ``skimage.filters.median``, ``scipy.ndimage.median_filter``
+    """
+    image = np.asarray(image, dtype=bool)
+    footprint = np.asarray(footprint) != 0
+    spans = _footprint_spans(footprint)
+    n = int(footprint.sum())
+    if iterations < 1 or n == 0:
+        return(image.copy())
+    needed = n - n // 2  # rank n // 2 of the sorted neighborhood is True
+
+    before = np.array(footprint.shape) // 2
+    after = np.array(footprint.shape) - 1 - before
+    rows, cols = image.shape
+
+    # buffers for all passes
+    padded = np.empty((rows + before[0] + after[0], cols + before[1] + after[1]), dtype=np.uint8)
+    running = np.zeros((padded.shape[0], padded.shape[1] + 1), dtype=np.int32)
+    count = np.empty((rows, cols), dtype=np.int32)
+    temp = np.empty((rows, cols), dtype=np.int32)
+    inside = padded[before[0]:before[0] + rows, before[1]:before[1] + cols]
+
+    inside[...] = image
+    for i in range(iterations):
+        _replicate_edges(padded, before, after)
+        np.cumsum(padded, axis=1, out=running[:, 1:])
+
+        # add up each row of the footprint from the running sums
+        count[...] = 0
+        for dy, x0, x1 in spans:
+            r = before[0] + dy
+            c = before[1]
+            np.subtract(running[r:r + rows, c + x1 + 1:c + x1 + 1 + cols],
+                        running[r:r + rows, c + x0:c + x0 + cols], out=temp)
+            count += temp
+
+        np.greater_equal(count, needed, out=inside, casting='unsafe')
+
+    return(inside.astype(bool))
+
+
+#########################################################################################################################
+#########################################################################################################################
+#######                                                                                                          ########
+#######                                       Distance Transform Morphology                                      ########
+#######                                                                                                          ########
+#########################################################################################################################
+#########################################################################################################################
+
+def _disk_threshold(footprint):
+    """
+    The largest squared distance from the center of a disk footprint, or
+    ``None`` if ``footprint`` isn't exactly the pixels within some distance of
+    its center, as ``skimage.morphology.disk`` and ``pyroots.noise_filters._disk``
+    are.
+    """
+    footprint = np.asarray(footprint) != 0
+    rows, cols = footprint.shape
+    if rows != cols or rows % 2 == 0:
+        return(None)
+    coords = np.arange(rows) - rows // 2
+    squared = coords[:, np.newaxis]**2 + coords[np.newaxis, :]**2
+    threshold = squared[footprint].max()
+    if not np.array_equal(footprint, squared <= threshold):
+        return(None)
+    return(int(threshold))
+
+
+def _distance(image):
+    """
+    Euclidean distance from each pixel to the nearest ``False`` pixel of the 2D
+    boolean ``image``. Exact, as ``scipy.ndimage.distance_transform_edt``, in
+    float32.
+    """
+    return(cv2.distanceTransform(np.ascontiguousarray(image).view(np.uint8),
+                                 cv2.DIST_L2, cv2.DIST_MASK_PRECISE))
+
+
+def disk_dilation(image, footprint):
+    """
+    Binary dilation by a disk, as ``skimage.morphology.binary_dilation``, from a
+    distance transform. Same result, in about the same time for any radius.
+
+    Parameters
+    ----------
+    image : ndarray (bool)
+        2D binary image.
+    footprint : ndarray
+        Disk, such as ``skimage.morphology.disk(r)`` or
+        ``pyroots.noise_filters._disk(r)``.
+
+    Returns
+    -------
+    A boolean ndarray.
+    """
+    threshold = _disk_threshold(footprint)
+    if threshold is None:
+        raise ValueError("`footprint` must be a disk.")
+    image = np.asarray(image, dtype=bool)
+    if not image.any():
+        return(image.copy())
+    # squared distances are integers, so half-way between them is safe from rounding
+    return(_distance(~image) < np.sqrt(threshold + 0.5))
+
+
+def disk_erosion(image, footprint):
+    """
+    Binary erosion by a disk, as ``skimage.morphology.binary_erosion`` (pixels
+    outside the image don't erode it), from a distance transform.
+
+    Parameters
+    ----------
+    image : ndarray (bool)
+        2D binary image.
+    footprint : ndarray
+        Disk, such as ``skimage.morphology.disk(r)`` or
+        ``pyroots.noise_filters._disk(r)``.
+
+    Returns
+    -------
+    A boolean ndarray.
+    """
+    threshold = _disk_threshold(footprint)
+    if threshold is None:
+        raise ValueError("`footprint` must be a disk.")
+    image = np.asarray(image, dtype=bool)
+    if image.all():
+        return(image.copy())
+    return(_distance(image) > np.sqrt(threshold + 0.5))
+
+
+def disk_closing(image, footprint):
+    """
+    Binary closing by a disk, as ``skimage.morphology.binary_closing``, from two
+    distance transforms. Faster than ``skimage`` for a radius of about 4 pixels
+    and up, and than OpenCV (``pyroots.backends``) for about 25 and up.
+
+    Parameters
+    ----------
+    image : ndarray (bool)
+        2D binary image.
+    footprint : ndarray
+        Disk, such as ``skimage.morphology.disk(r)`` or
+        ``pyroots.noise_filters._disk(r)``.
+
+    Returns
+    -------
+    A boolean ndarray.
+
+    See Also
+    --------
+    ``pyroots.disk_dilation``, ``pyroots.disk_erosion``, ``pyroots.fill_gaps``,
+    ``pyroots.hollow_filter``
+    """
+    return(disk_erosion(disk_dilation(image, footprint), footprint))
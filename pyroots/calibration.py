@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: pme
+
+Calibration shared between images of one session. Images from the same
+microscope, lighting and magnification almost always settle on the same
+smoothing sigma in ``pyroots.frangi_segmentation``, so searching for it again
+on every image is wasted time. A ``SessionCalibration`` computes values on the
+first few images of each session, reuses them afterwards, and recomputes them
+on a random sample of later images to catch drift.
+
+The Frangi ``scale_range`` can be calibrated the same way, from the diameters
+of objects found in a sample of images: see ``scale_range_from_diameters`` and
+``pyroots.frangi_scale_range``.
+
+Contents:
+- SessionCalibration
+- _weighted_percentile
+- scale_range_from_diameters
+"""
+
+import threading
+from collections import Counter
+import numpy as np
+
+
+class SessionCalibration(object):
+    """
+    Values calibrated on the first images of a session and reused for the rest:
+    the Frangi smoothing sigma of each band and, optionally, the
+    ``threshold_local`` surface of each band. Pass the same object to
+    ``pyroots.frangi_segmentation`` for every image, with ``session`` naming the
+    directory or session the image came from.
+
+    Values are kept by session, image shape and band. A value is calibrated
+    once ``n_images`` images have been computed: the most common sigma, or the
+    mean surface. After that, a fraction ``check_fraction`` of images is still
+    computed in full. If the result differs from the calibrated value (any
+    change of sigma, or a mean absolute difference of surfaces over
+    ``surface_tolerance``), calibration starts over from that image.
+
+    Parameters
+    ----------
+    n_images : int
+        Images to compute in full before reusing values. Default = 3.
+    check_fraction : float
+        Fraction of later images to compute in full as a drift check.
+        Default = 0.1.
+    surfaces : bool
+        Also calibrate the ``threshold_local`` surfaces? Only sensible if the
+        background is much the same from image to image. Default = ``False``.
+    surface_tolerance : float
+        Mean absolute difference between a checked surface and the calibrated
+        one that counts as drift. Surfaces of the Frangi response range over
+        [0, 1]. Default = 0.01.
+    seed : int
+        Seed for choosing images to check. Default = ``None``.
+
+    Attributes
+    ----------
+    computed : int
+        Values computed in full (including checks).
+    reused : int
+        Values reused.
+    recalibrations : int
+        Times a check found drift and calibration started over.
+
+    Notes
+    -----
+    Safe to share between threads. Processes each get their own copy, so each
+    worker of a ``multiprocessing.Pool`` calibrates separately.
+
+    Examples
+    --------
+    >>> calibration = pyroots.SessionCalibration(n_images=3, check_fraction=0.1)
+    >>> for f in files:
+    ...     out = pyroots.frangi_segmentation(io.imread(f), colors, frangi_args, threshold_args,
+    ...                                      calibration=calibration, session=os.path.dirname(f))
+    """
+
+    def __init__(self, n_images=3, check_fraction=0.1, surfaces=False, surface_tolerance=0.01,
+                 seed=None):
+        self.n_images = n_images
+        self.check_fraction = check_fraction
+        self.surfaces = surfaces
+        self.surface_tolerance = surface_tolerance
+        self.computed = 0
+        self.reused = 0
+        self.recalibrations = 0
+        self._random = np.random.RandomState(seed)
+        self._lock = threading.Lock()
+        self._values = {}  # (kind, session, shape, band) : {"found" : [...], "value" : ...}
+
+    def _get(self, key):
+        """
+        Calibrated value for ``key``, or ``None`` if it should be computed: while
+        calibrating, and for drift checks.
+        """
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None or entry["value"] is None or self._random.rand() < self.check_fraction:
+                self.computed += 1
+                return(None)
+            self.reused += 1
+            return(entry["value"])
+
+    def _add(self, key, value, calibrate, drifted):
+        """
+        Record a computed value. While calibrating, it's kept until there are
+        ``n_images`` of them, then ``calibrate`` sets the value. Once calibrated,
+        a value for which ``drifted`` is true starts calibration over.
+        """
+        with self._lock:
+            entry = self._values.setdefault(key, {"found" : [], "value" : None})
+            if entry["value"] is not None:
+                if not drifted(value, entry["value"]):
+                    return
+                entry["found"] = []
+                entry["value"] = None
+                self.recalibrations += 1
+            entry["found"].append(value)
+            if len(entry["found"]) >= self.n_images:
+                entry["value"] = calibrate(entry["found"])
+                entry["found"] = []
+
+    def clear(self):
+        """
+        Forget all calibrated values.
+        """
+        with self._lock:
+            self._values = {}
+
+    ##### Frangi smoothing #####
+
+    def get_sigma(self, session, shape, band):
+        """
+        Calibrated smoothing sigma for a band, or ``None`` if it should be
+        searched for and given to ``add_sigma``.
+        """
+        return(self._get(("sigma", session, tuple(shape[:2]), band)))
+
+    def add_sigma(self, session, shape, band, sigma):
+        """
+        Record a sigma found by search.
+        """
+        self._add(("sigma", session, tuple(shape[:2]), band), sigma,
+                  calibrate=lambda found: Counter(found).most_common(1)[0][0],
+                  drifted=lambda new, old: new != old)
+
+    ##### Threshold surfaces #####
+
+    def get_surface(self, session, shape, band):
+        """
+        Calibrated ``threshold_local`` surface for a band, or ``None`` if it
+        should be computed and given to ``add_surface``. Always ``None`` unless
+        ``surfaces=True``.
+        """
+        if self.surfaces is not True:
+            return(None)
+        return(self._get(("surface", session, tuple(shape[:2]), band)))
+
+    def add_surface(self, session, shape, band, surface):
+        """
+        Record a computed ``threshold_local`` surface. Not copied.
+        """
+        if self.surfaces is not True:
+            return
+        self._add(("surface", session, tuple(shape[:2]), band), surface,
+                  calibrate=lambda found: np.mean(found, axis=0),
+                  drifted=lambda new, old: np.mean(np.abs(new - old)) > self.surface_tolerance)
+
+    def __repr__(self):
+        return("SessionCalibration(values={}, computed={}, reused={}, recalibrations={})".format(
+            sum(entry["value"] is not None for entry in self._values.values()),
+            self.computed, self.reused, self.recalibrations))
+
+
+def _weighted_percentile(values, weights, percentiles):
+    """
+    Percentiles of ``values``, each counted ``weights`` times, interpolated
+    between the midpoints of their weights.
+    """
+    order = np.argsort(values)
+    values, weights = values[order], weights[order]
+    position = (np.cumsum(weights) - weights / 2) / np.sum(weights)
+    return(np.interp(np.asarray(percentiles) / 100.0, position, values))
+
+
+def scale_range_from_diameters(diameters, weights=None, percentiles=(1, 99), scale_step=1):
+    """
+    The shortest Frangi ``scale_range`` that covers a range of object diameters.
+
+    A bar of width ``d`` has its strongest scale-normalized Hessian response at
+    ``sigma = d / 2``, so scales run from half the diameter at the lower
+    percentile to half the diameter at the upper one, in steps of
+    ``scale_step``. Scales start at a multiple of ``scale_step``, and at 1 or
+    more.
+
+    Parameters
+    ----------
+    diameters : array-like
+        Diameters of objects, in pixels, such as the "Diameter" of medial axis
+        pixels from ``pyroots.skeleton_with_distance``. Zeros are ignored.
+    weights : array-like or None
+        Weight of each diameter, such as the "Length" of medial axis pixels, so
+        that the distribution is by length. Default = ``None``, equal weights.
+    percentiles : tuple of float
+        Lower and upper percentiles of diameter to cover. Default = (1, 99).
+    scale_step : float
+        Step between scales. Default = 1.
+
+    Returns
+    -------
+    ``(scale_range, scale_step)``, for ``frangi_args``.
+
+    Examples
+    --------
+    >>> skel = pyroots.skeleton_with_distance(objects, sparse=True)['skeleton']
+    >>> scale_range_from_diameters(skel['Diameter'], skel['Length'], scale_step=1)
+    ((2, 6), 1)
+    """
+    diameters = np.asarray(diameters, dtype=np.float64).ravel()
+    if weights is None:
+        weights = np.ones_like(diameters)
+    weights = np.asarray(weights, dtype=np.float64).ravel()
+    keep = (diameters > 0) & (weights > 0)
+    if not np.any(keep):
+        raise ValueError("No diameters to calibrate from.")
+
+    low, high = _weighted_percentile(diameters[keep], weights[keep], percentiles) / 2
+    start = max(1.0, np.floor(low / scale_step) * scale_step)
+    n = max(0, int(np.ceil((high - start) / scale_step - 1e-9)))
+    stop = start + (n + 1) * scale_step  # excluded, as in np.arange
+    as_number = lambda x: int(x) if float(x).is_integer() else float(x)
+    return((as_number(start), as_number(stop)), as_number(scale_step))
@@ -0,0 +1,514 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: pme
+
+Label objects once and share the labels and basic statistics among the
+filters of a segmentation pipeline. Filters that remove whole objects don't
+need to relabel the image: ``update_component_stats`` drops the removed
+objects and renumbers the rest, giving the same labels as a fresh
+``ndimage.label``.
+
+Contents:
+- component_stats
+- update_component_stats
+- select_objects
+- shape_descriptors
+- _row_extremes
+- _convex_chain
+- _convex_area
+- _filled_area
+- _grouped_percentile
+- _grouped_median
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import ndimage
+from pyroots import backends
+
+
+def component_stats(image, structure=None):
+    """
+    Label the objects in a binary image and measure area, bounding box,
+    centroid, and raw moments of every object in a single pass over the
+    object pixels.
+
+    Parameters
+    ----------
+    image : array
+        Binary image of objects.
+    structure : array
+        Connectivity, passed to ``ndimage.label``. Default = ``None``, which
+        is square connectivity (manhattan distance = 1), like the filters.
+
+    Returns
+    -------
+    A dictionary containing:
+        * "labels" : ``ndimage.label`` of ``image``
+        * "count" : number of objects
+        * "area" : pixels in each object. Index 0 (background) is 0.
+        * "bbox" : (min_row, min_col, max_row, max_col) of each object, as in
+          ``skimage.measure.regionprops``. Max is exclusive.
+        * "centroid" : (row, col) of each object
+        * "moments" : raw moments of each object, in coordinates relative to
+          the top-left of its bounding box. Columns are m00, m10, m01, m20,
+          m11, m02, where m_pq is the sum of row^p * col^q.
+    All arrays have one row per label, including 0 (background).
+
+    See Also
+    --------
+    ``pyroots.update_component_stats``, ``scipy.ndimage.label``
+    """
+    labels, count = backends.label(image, structure=structure)
+    size = count + 1
+
+    # bounding boxes
+    bbox = np.zeros((size, 4), dtype=np.int64)
+    for i, sl in enumerate(ndimage.find_objects(labels, count)):
+        if sl is not None:
+            bbox[i+1] = [sl[0].start, sl[1].start, sl[0].stop, sl[1].stop]
+
+    # everything else from the object pixels
+    rows, cols = np.nonzero(labels)
+    lab = labels[rows, cols]
+    r = (rows - bbox[lab, 0]).astype(np.float64)
+    c = (cols - bbox[lab, 1]).astype(np.float64)
+
+    moments = np.zeros((size, 6))
+    moments[:, 0] = np.bincount(lab, minlength=size)
+    for k, weights in enumerate([r, c, r*r, r*c, c*c]):
+        moments[:, k+1] = np.bincount(lab, weights=weights, minlength=size)
+
+    area = moments[:, 0].astype(np.int64)
+    centroid = np.zeros((size, 2))
+    present = area > 0
+    centroid[present, 0] = bbox[present, 0] + moments[present, 1] / area[present]
+    centroid[present, 1] = bbox[present, 1] + moments[present, 2] / area[present]
+
+    out = {"labels" : labels,
+           "count" : count,
+           "area" : area,
+           "bbox" : bbox,
+           "centroid" : centroid,
+           "moments" : moments}
+
+    return(out)
+
+
+def update_component_stats(stats, image):
+    """
+    Update the output of ``pyroots.component_stats`` after a filter removes
+    objects. Objects without any pixels in ``image`` are dropped, and the
+    remaining objects are renumbered in their original order, so ``stats``
+    matches ``component_stats(image)`` without relabeling.
+
+    Only valid if ``image`` keeps or removes whole objects, which is true for
+    the pyroots object filters (e.g. ``morphology_filter``, ``color_filter``,
+    ``hollow_filter``, ``neighborhood_filter``). Anything that adds, moves, or
+    splits objects (e.g. ``noise_removal``, ``fill_gaps``) needs a new
+    ``component_stats``.
+
+    Parameters
+    ----------
+    stats : dict
+        Output of ``pyroots.component_stats``. Updated in place.
+    image : array
+        Binary image of the objects that remain. Pixels outside the labelled
+        objects are ignored.
+
+    Returns
+    -------
+    ``stats``, updated.
+    """
+    labels = stats["labels"]
+    keep = np.zeros(stats["count"] + 1, dtype=bool)
+    keep[labels[image > 0]] = True
+    keep[0] = False
+
+    if keep[1:].all():
+        return(stats)
+
+    # new label of each old label. Removed objects become background.
+    lookup = np.cumsum(keep) * keep
+    stats["labels"] = lookup.astype(labels.dtype)[labels]
+    keep[0] = True
+    for key in ["area", "bbox", "centroid", "moments"]:
+        stats[key] = stats[key][keep]
+    stats["count"] = int(keep.sum()) - 1
+
+    return(stats)
+
+
+def select_objects(labels, keep, out=None, count=None):
+    """
+    Binary image of the objects in ``keep``, from a lookup table indexed by
+    label and a single gather. Same result as ``np.in1d(labels, keep)``
+    reshaped to the image, without sorting the image.
+
+    Parameters
+    ----------
+    labels : array
+        Output of ``ndimage.label``.
+    keep : array
+        Either the labels to keep, or a boolean lookup table with one value per
+        label (length ``count + 1``).
+    out : array
+        Optional boolean array with the same shape as ``labels`` to write into.
+    count : int
+        Largest label. Default = ``None``, which is ``labels.max()``.
+
+    Returns
+    -------
+    A boolean array (``out``, if given).
+    """
+    if count is None:
+        count = np.max(labels, initial=0)
+    keep = np.asarray(keep)
+
+    if keep.dtype == bool and len(keep) == count + 1:
+        lookup = keep
+    else:
+        keep = keep.astype(np.int64).ravel()
+        keep = keep[(keep >= 0) * (keep <= count)]  # other values match nothing
+        lookup = np.zeros(count + 1, dtype=bool)
+        lookup[keep] = True
+
+    out = np.take(lookup, labels, out=out)
+    return(out)
+
+
+def shape_descriptors(stats, solidity=False):
+    """
+    Equivalent-ellipse descriptors of every object, computed from the raw
+    moments in ``stats`` for all labels at once. Uses the same definitions as
+    ``skimage.measure.regionprops``; values agree to floating point precision.
+
+    Parameters
+    ----------
+    stats : dict
+        Output of ``pyroots.component_stats``.
+    solidity : bool
+        Also compute filled area, convex hull area, and solidity? Slower.
+        See ``pyroots._convex_area``. Default = ``False``.
+
+    Returns
+    -------
+    A ``pandas.DataFrame`` indexed by label, including 0 (background, all 0),
+    with columns:
+        * "Area" : pixels
+        * "CentroidRow", "CentroidCol"
+        * "MajorAxisLength", "MinorAxisLength" : of the ellipse with the same
+          normalized second central moments as the object
+        * "Eccentricity" : of that ellipse. 0 is a circle, 1 is a line.
+    And if ``solidity=True``:
+        * "FilledArea" : pixels, with holes filled
+        * "ConvexArea" : pixels in the convex hull
+        * "ConvexHullArea" : exact area of the convex hull polygon
+        * "Solidity" : FilledArea / ConvexArea
+
+    See Also
+    --------
+    ``pyroots.component_stats``, ``skimage.measure.regionprops``
+    """
+    m00, m10, m01, m20, m11, m02 = stats["moments"].T
+    area = np.where(m00 > 0, m00, 1)  # avoid dividing by 0 for background
+
+    # normalized central moments = inertia tensor of each object
+    row = m10 / area
+    col = m01 / area
+    mu20 = (m20 - row * m10) / area
+    mu02 = (m02 - col * m01) / area
+    mu11 = (m11 - row * m01) / area
+
+    # eigenvalues of [[mu02, -mu11], [-mu11, mu20]], largest first
+    half_sum = (mu20 + mu02) / 2
+    root = np.sqrt(((mu20 - mu02) / 2)**2 + mu11**2)
+    l1 = np.clip(half_sum + root, 0, None)
+    l2 = np.clip(half_sum - root, 0, None)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        eccentricity = np.where(l1 > 0, np.sqrt(1 - l2 / l1), 0)
+
+    out = pd.DataFrame({"Area" : stats["area"],
+                        "CentroidRow" : stats["centroid"][:, 0],
+                        "CentroidCol" : stats["centroid"][:, 1],
+                        "MajorAxisLength" : 4 * np.sqrt(l1),
+                        "MinorAxisLength" : 4 * np.sqrt(l2),
+                        "Eccentricity" : eccentricity})
+    out.index.name = "Label"
+
+    if solidity is True:
+        convex_area, hull_area = _convex_area(stats)
+        filled_area = _filled_area(stats)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            solid = np.where(convex_area > 0, filled_area / convex_area, 0)
+        out["FilledArea"] = filled_area
+        out["ConvexArea"] = convex_area
+        out["ConvexHullArea"] = hull_area
+        out["Solidity"] = solid
+
+    return(out)
+
+
+def _row_extremes(labels):
+    """
+    Leftmost and rightmost column of every object in every row it occupies.
+    Returns arrays of label, row, left, and right, sorted by label then row.
+    Objects from ``ndimage.label`` (square connectivity) occupy a continuous
+    range of rows.
+    """
+    rows, cols = np.nonzero(labels)  # sorted by row, then column
+    lab = labels[rows, cols]
+
+    key = lab.astype(np.int64) * labels.shape[0] + rows
+    order = np.argsort(key, kind='stable')  # keeps columns sorted in each row
+    key = key[order]
+    cols = cols[order]
+
+    new = np.ones(len(key), dtype=bool)
+    new[1:] = key[1:] != key[:-1]
+    first = np.nonzero(new)[0]
+    last = np.append(first[1:], len(key)) - 1
+
+    out = (lab[order][first], rows[order][first], cols[first], cols[last])
+    return(out)
+
+
+def _convex_chain(lab, x, y, sign):
+    """
+    Convex hull chain of points sorted by (lab, x), for all labels at once.
+    ``sign=1`` gives the chain on the low-``y`` side, ``sign=-1`` the high-``y``
+    side. Like Andrew's monotone chain, but instead of a stack, every point that
+    doesn't make a convex turn with its neighbors is removed in parallel, until
+    none are left. Such a point can't be on the hull, so the result is the same.
+    The first and last point of each label are always kept.
+    """
+    while len(x) > 2:
+        inner = (lab[1:-1] == lab[:-2]) * (lab[1:-1] == lab[2:])
+        cross = ((x[1:-1] - x[:-2]) * (y[2:] - y[:-2]) -
+                 (y[1:-1] - y[:-2]) * (x[2:] - x[:-2]))
+        remove = inner * (sign * cross <= 0)
+        if not remove.any():
+            break
+        keep = np.ones(len(x), dtype=bool)
+        keep[1:-1] = ~remove
+        lab, x, y = lab[keep], x[keep], y[keep]
+    return(lab, x, y)
+
+
+def _convex_area(stats):
+    """
+    Convex hull area of every object in ``stats``, without drawing a hull
+    image per object.
+
+    As in ``skimage.morphology.convex_hull_image``, the hull is around the
+    midpoints of the edges of object pixels. Only the midpoints at the left and
+    right ends of each row can be hull vertices, so two convex chains are built
+    from them (see ``pyroots._convex_chain``). Coordinates are doubled so all
+    math is in integers.
+
+    Returns two arrays indexed by label:
+        * The number of pixel centers inside the hull, including its
+          boundary. This is ``regionprops`` "convex_area", which rasterizes the
+          same polygon. In tests they are identical.
+        * The area of the hull polygon. It is smaller than the pixel count by
+          roughly half the hull perimeter.
+    """
+    size = stats["count"] + 1
+    convex_area = np.zeros(size, dtype=np.int64)
+    hull_area = np.zeros(size)
+    if size == 1:
+        return(convex_area, hull_area)
+
+    lab, row, left, right = _row_extremes(stats["labels"])
+    lab = lab.astype(np.int64)
+    row = row.astype(np.int64)
+    first = np.ones(len(lab), dtype=bool)
+    first[1:] = lab[1:] != lab[:-1]
+    last = np.append(first[1:], True)
+
+    chains = []
+    for side, sign, extreme in [(left, 1, np.minimum), (right, -1, np.maximum)]:
+        side = side.astype(np.int64)
+        edge = 2*side - sign              # midpoint of the outer pixel edge
+        above = side.copy()               # midpoints between this row and the one above
+        above[~first] = extreme(side[~first], side[:-1][~first[1:]])
+        x = np.concatenate([2*row, 2*row - 1, 2*row[last] + 1])
+        y = np.concatenate([edge, 2*above, 2*side[last]])
+        l = np.concatenate([lab, lab, lab[last]])
+        order = np.lexsort((x, l))
+        chains.append(_convex_chain(l[order], x[order], y[order], sign))
+
+    #### Count pixel centers in each row between the chains ####
+    span = 2 * stats["labels"].shape[0] + 4
+    ends = []
+    for l, x, y in chains:
+        key = l * span + x + 1
+        i = np.searchsorted(key, lab * span + 2*row + 1, side='right') - 1
+        x0, x1, y0, y1 = x[i], x[i+1], y[i], y[i+1]
+        # edge position is num / den, in doubled coordinates
+        num = y0 * (x1 - x0) + (y1 - y0) * (2*row - x0)
+        den = 2 * (x1 - x0)
+        ends.append((num, den))
+    (num, den), (num_up, den_up) = ends
+    col_min = -((-num) // den)    # ceiling
+    col_max = num_up // den_up    # floor
+    convex_area += np.bincount(lab, weights=col_max - col_min + 1,
+                               minlength=size).astype(np.int64)
+
+    #### Polygon area, as the integral between the chains ####
+    for (l, x, y), sign in zip(chains, [-1, 1]):
+        same = l[1:] == l[:-1]
+        trapezoids = (x[1:] - x[:-1]) * (y[1:] + y[:-1])
+        hull_area += sign * np.bincount(l[1:][same], weights=trapezoids[same],
+                                        minlength=size)
+    hull_area /= 8  # half of each trapezoid, doubled coordinates
+
+    return(convex_area, hull_area)
+
+
+def _filled_area(stats):
+    """
+    Area of every object in ``stats`` with its holes filled, like
+    ``regionprops`` "filled_area", from one ``ndimage.binary_fill_holes`` of
+    the whole image. A filled region that contains a single object belongs to
+    that object. Where a region contains several (nested objects, or holes
+    closed by more than one object), each of those objects is filled on its
+    own. Objects that touch diagonally share a region, so they are filled on
+    their own too.
+    """
+    labels = stats["labels"]
+    size = stats["count"] + 1
+    filled_area = np.zeros(size, dtype=np.int64)
+    if size == 1:
+        return(filled_area)
+
+    square = np.ones((3, 3))  # background connectivity in regionprops
+    filled = ndimage.binary_fill_holes(labels > 0, square)
+    filled, n_filled = ndimage.label(filled, square)
+    filled_size = np.bincount(filled.ravel(), minlength=n_filled + 1)
+
+    # filled region of each object. Any pixel of the object will do.
+    region = np.zeros(size, dtype=np.int64)
+    region[labels.ravel()] = filled.ravel()
+    objects = np.bincount(region[1:], minlength=n_filled + 1)
+
+    simple = objects[region] == 1
+    simple[0] = False
+    filled_area[simple] = filled_size[region[simple]]
+
+    bbox = stats["bbox"]
+    for i in np.nonzero(~simple)[0][1:]:
+        a, b, c, d = bbox[i]
+        filled_area[i] = ndimage.binary_fill_holes(labels[a:c, b:d] == i, square).sum()
+
+    return(filled_area)
+
+
+def _grouped_percentile(labels, values, percentile, size=None):
+    """
+    Percentile of ``values`` within each label, in one sort rather than one
+    pass over the image per object. Interpolates linearly between data points,
+    like ``numpy.percentile``.
+
+    Parameters
+    ----------
+    labels : array
+        Non-negative integer label of each value, for example skeleton pixel
+        labels. Same shape as ``values``.
+    values : array
+        Values to summarize, for example skeleton pixel diameters.
+    percentile : float
+        In [0, 100].
+    size : int
+        Length of the output. Default = ``labels.max() + 1``.
+
+    Returns
+    -------
+    A float array indexed by label. Labels without values are ``nan``.
+
+    See Also
+    --------
+    ``numpy.percentile``, ``pyroots._percentile_filter``
+    """
+    labels = np.asarray(labels).ravel()
+    values = np.asarray(values).ravel()
+    if size is None:
+        size = np.max(labels, initial=0) + 1
+
+    # sort by label, then by value within each label
+    order = np.lexsort((values, labels))
+    values = values[order]
+
+    counts = np.bincount(labels, minlength=size)
+    starts = np.cumsum(counts) - counts
+    present = counts > 0
+    counts = counts[present]
+    starts = starts[present]
+
+    # position of the percentile in each sorted group, as in numpy.percentile
+    q = np.true_divide(percentile, 100)
+    position = (counts - 1) * q
+    below = np.floor(position)
+    gamma = position - below
+    below = np.clip(below.astype(np.int64), 0, counts - 1)
+    above = np.minimum(below + 1, counts - 1)
+
+    a = values[starts + below]
+    b = values[starts + above]
+    diff = b - a
+    interpolated = a + diff * gamma
+    upper = gamma >= 0.5
+    interpolated[upper] = (b - diff * (1 - gamma))[upper]
+
+    out = np.full(size, np.nan)
+    out[present] = interpolated
+    return(out)
+
+
+def _grouped_median(labels, values, size=None):
+    """
+    Median of ``values`` within each label, in one sort. Averages the two
+    middle values of even-sized groups exactly like ``numpy.median``, which
+    can differ from the 50th percentile of ``pyroots._grouped_percentile`` in
+    the last bit.
+
+    Parameters
+    ----------
+    labels : array
+        Non-negative integer label of each value. Same shape as ``values``.
+    values : array
+        Values to summarize.
+    size : int
+        Length of the output. Default = ``labels.max() + 1``.
+
+    Returns
+    -------
+    A float array indexed by label. Labels without values are ``nan``.
+
+    See Also
+    --------
+    ``numpy.median``, ``pyroots._grouped_percentile``
+    """
+    labels = np.asarray(labels).ravel()
+    values = np.asarray(values).ravel()
+    if size is None:
+        size = np.max(labels, initial=0) + 1
+
+    order = np.lexsort((values, labels))
+    values = values[order]
+
+    counts = np.bincount(labels, minlength=size)
+    starts = np.cumsum(counts) - counts
+    present = counts > 0
+    counts = counts[present]
+    starts = starts[present]
+
+    a = values[starts + (counts - 1) // 2]
+    b = values[starts + counts // 2]
+
+    out = np.full(size, np.nan)
+    out[present] = (a + b) / 2
+    return(out)
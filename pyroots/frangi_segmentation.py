@@ -5,6 +5,7 @@ Author: @pme1123
 Created: Jan 17th, 2017
 
 Frangi Segmentation - combines various functions into a single one for convenience
+Frangi Scale Range - calibrates `frangi_args['scale_range']` from a sample of images
 Frangi Image Loop - For series analysis across directories. 
 
 """
@@ -12,11 +13,55 @@ Frangi Image Loop - For series analysis across directories.
 import os
 import pandas as pd
 from pyroots import *
+from pyroots import backends, vesselness
+from pyroots.calibration import _weighted_percentile, scale_range_from_diameters
 from skimage import io, color, filters, morphology, img_as_ubyte, img_as_float
 import importlib
 import numpy as np
 from warnings import warn
 
+def _edge_sigma(band):
+    """
+    Smoothing sigma for a band: the first of 0, 0.25, 0.5, 1, 2, 4, 8, 16 at
+    which no more than 10% of pixels are edges (Scharr filter over Otsu's
+    threshold). Returns the sigma, the edges at that sigma, and the band
+    smoothed by it, for the Frangi filter.
+    """
+    edge_val = 1
+    sigma = 0.125
+    while edge_val > 0.1 and sigma < 10:
+        sigma = 2*sigma
+        edges, smooth = _edges(band, sigma)
+        edge_val = np.sum(edges) / np.sum(np.ones_like(edges))
+
+    if sigma == 0.25: # try without smoothing
+        temp = _edges(band, 0)[0]
+        edge_val = np.sum(temp) / np.sum(np.ones_like(temp))
+        if edge_val <= 0.1:
+            sigma = 0
+            edges, smooth = temp, band
+    return(sigma, edges, smooth)
+
+
+def _smooth(band, sigma):
+    """
+    Band smoothed by `sigma` (0 for none).
+    """
+    if sigma == 0:
+        return(band)
+    return(backends.gaussian(band, sigma=sigma))
+
+
+def _edges(band, sigma):
+    """
+    Edges of a band smoothed by `sigma` (0 for none): Scharr filter over Otsu's
+    threshold. Returns the edges and the smoothed band.
+    """
+    smooth = _smooth(band, sigma)
+    temp = filters.scharr(smooth)
+    return(temp > filters.threshold_otsu(temp), smooth)
+
+
 def frangi_segmentation(image, 
                         colors,
                         frangi_args, 
@@ -34,7 +79,12 @@ def frangi_segmentation(image,
                         diameter_args='skip', 
                         diameter_bins='skip', 
                         image_name='image', 
-                        verbose=False):
+                        verbose=False,
+                        sparse=False,
+                        color_tables=False,
+                        skeleton_backend='medial_axis',
+                        calibration=None,
+                        session=None):
     """
     Possible approach to object detection using frangi filters. Selects colorbands for
     analysis, runs frangi filter, thresholds to identify candidate objects, then removes
@@ -49,9 +99,13 @@ def frangi_segmentation(image,
     colors : dict or str
         Parameters for picking the colorspace. See `pyroots.band_selector`. 
     frangi_args : list of dict or dict
-        Parameters to pass to `skimage.filters.frangi`
+        Parameters to pass to `pyroots.vesselness.frangi`. Same as `skimage.filters.frangi`, plus an
+        optional `'backend'`: `'float32'` is much faster. With `'float32'`, an optional `'pyramid'`
+        computes large scales at lower resolution. With `verbose=True`, time and memory of each
+        scale are printed.
     threshold_args : list of dict or dict
-        Parameters to pass to `skimage.filters.threshold_adaptive`
+        Parameters to pass to `pyroots.threshold_local`. Same as `skimage.filters.threshold_local`,
+        plus an optional `'backend'` for faster approximations.
     contrast_kernel_size : int, str, or None
         Kernel size for `skimage.exposure.equalize_adapthist`. If `int`, then gives the size of the kernel used
         for adaptive contrast enhancement. If `None`, uses default (1/8 shortest image dimension). If `skip`,
@@ -78,6 +132,19 @@ def frangi_segmentation(image,
         To pass to `pyroots.bin_by_diameter`
     image_name : str
         Identifier of image for summarizing
+    sparse : bool
+        Keep the medial axis as a table of pixels rather than full-size "length" and
+        "diameter" images? Saves memory. See `pyroots.skeleton_with_distance`.
+    color_tables : bool
+        Convert 8-bit images to other colorspaces with lookup tables? Faster, with
+        small quantization errors. See `pyroots.color_tables`.
+    skeleton_backend : str
+        How to find the medial axis and diameters. See `pyroots.skeleton_with_distance`.
+    calibration : `pyroots.SessionCalibration` or `None`
+        Reuse the smoothing sigma (and optionally threshold surfaces) calibrated on earlier
+        images of the same session, rather than searching for it on every image.
+    session : str
+        Name of the session or directory the image is from, for `calibration`.
     
     Returns
     -------
@@ -86,11 +153,19 @@ def frangi_segmentation(image,
         2. `"objects"` binary image
         3. `"length"` medial axis image
         4. `"diameter"` medial axis image
+    If `sparse=True`, 3 and 4 are replaced by `"skeleton"`, a `pandas.DataFrame` of
+    medial axis pixels. See `pyroots.skeleton_to_dense`.
  
     """
 
+    # Colorspace conversions, shared by the band selector and color filters
+    if len(image.shape) == 3:
+        cache = ColorspaceCache(image, tables=color_tables)
+    else:
+        cache = None
+
     # Pull band from colorspace
-    working_image = band_selector(image, colors)  # expects dictionary (lazy coding)
+    working_image = band_selector(image, colors, cache=cache)  # expects dictionary (lazy coding)
     nbands = len(working_image)
     if verbose is True:
         print("Color bands selected")
@@ -123,7 +198,7 @@ def frangi_segmentation(image,
     # Contrast enhancement
     try:
         for i in range(nbands):
-            temp = exposure.equalize_adapthist(working_image[i], 
+            temp = backends.equalize_adapthist(working_image[i],
                                                kernel_size = contrast_kernel_size)
             working_image[i] = img_as_float(temp)
         if verbose:
@@ -141,25 +216,22 @@ def frangi_segmentation(image,
     # Identify smoothing sigma for edges and frangi thresholding
     # simultaneously detect edges (computationally cheaper than multiple frangi enhancements)
     edges = [np.ones_like(working_image[0]) == 1] * nbands    # all True
-    sigma_val = [0.125] * nbands  # step is 0, 0.25, 0.5, 1, 2, 4, 8, 16
+    sigma_val = [0] * nbands  # step is 0, 0.25, 0.5, 1, 2, 4, 8, 16
+    smoothed = [None] * nbands  # at sigma_val, reused by the frangi filter
     for i in range(nbands):
-        edge_val = 1
-        while edge_val > 0.1 and sigma_val[i] < 10:
-            sigma_val[i] = 2*sigma_val[i]
-            temp = filters.gaussian(working_image[i], sigma=sigma_val[i])
-            temp = filters.scharr(temp)
-            temp = temp > filters.threshold_otsu(temp)
-            edge_val = np.sum(temp) / np.sum(np.ones_like(temp))
-
-            edges_temp = temp.copy()
-
-        if sigma_val[i] == 0.25: # try without smoothing
-            temp = filters.scharr(working_image[i])
-            temp = temp > filters.threshold_otsu(temp)
-            edge_val = np.sum(temp) / np.sum(np.ones_like(temp))
-            if edge_val <= 0.1:
-                sigma_val[i] = 0
-                edges_temp = temp.copy()
+        sigma = None
+        if calibration is not None:
+            sigma = calibration.get_sigma(session, image.shape, i)
+        if sigma is None:
+            sigma_val[i], edges_temp, smoothed[i] = _edge_sigma(working_image[i])
+            if calibration is not None:
+                calibration.add_sigma(session, image.shape, i, sigma_val[i])
+        elif separate_objects:
+            sigma_val[i] = sigma
+            edges_temp, smoothed[i] = _edges(working_image[i], sigma)
+        else:
+            sigma_val[i] = sigma
+            smoothed[i] = _smooth(working_image[i], sigma)
             
         if separate_objects:
             edges[i] = morphology.skeletonize(edges_temp)
@@ -171,10 +243,22 @@ def frangi_segmentation(image,
     
     # Frangi vessel enhancement
     for i in range(nbands):
-        temp = filters.gaussian(working_image[i], sigma=sigma_val[i])
-        temp = filters.frangi(temp, **frangi_args[i])
+        profile = [] if verbose else None
+        temp = vesselness.frangi(smoothed[i], profile=profile, **frangi_args[i])
+        smoothed[i] = None
+        if profile:
+            for p in profile:
+                print("Frangi scale {} (1/{}): {:.3f} s, {:.1f} MB".format(p["Scale"], p["Factor"], p["Time"],
+                                                                      p["Bytes"] / 2**20))
         temp = 1 - temp/np.max(temp)
-        temp = temp < filters.threshold_local(temp, **threshold_args[i])
+        surface = None
+        if calibration is not None:
+            surface = calibration.get_surface(session, image.shape, i)
+        if surface is None:
+            surface = threshold_local(temp, **threshold_args[i])
+            if calibration is not None:
+                calibration.add_surface(session, image.shape, i, surface)
+        temp = temp < surface
         working_image[i] = temp.copy()
     
     frangi = working_image.copy()
@@ -187,10 +271,11 @@ def frangi_segmentation(image,
     for i in range(1, nbands):
         combined = combined * working_image[i] * ~edges[i]
     working_image = combined.copy()
+    stats = component_stats(working_image)  # labels shared by the color filters
     
     # Filter candidate objects by color
     try:
-        color1 = color_filter(image, working_image, **color_args_1)  #colorspace, target_band, low, high, percent)
+        color1 = color_filter(image, working_image, stats=stats, cache=cache, **color_args_1)  #colorspace, target_band, low, high, percent)
         if verbose:
             print("Color filter 1 complete")
     except:
@@ -199,7 +284,7 @@ def frangi_segmentation(image,
         color1 = np.ones(working_image.shape)  # no filtering      
 
     try:
-        color2 = color_filter(image, working_image, **color_args_2)  # nesting equates to an "and" statement.
+        color2 = color_filter(image, working_image, stats=stats, cache=cache, **color_args_2)  # nesting equates to an "and" statement.
         if verbose:
             print("Color filter 2 complete")   
     except:
@@ -208,7 +293,7 @@ def frangi_segmentation(image,
         color2 = np.ones(working_image.shape)  # no filtering
     
     try:
-        color3 = color_filter(image, working_image, **color_args_3)  # nesting equates to an "and" statement.
+        color3 = color_filter(image, working_image, stats=stats, cache=cache, **color_args_3)  # nesting equates to an "and" statement.
         if verbose:
             print("Color filter 3 complete")
     except:
@@ -232,11 +317,12 @@ def frangi_segmentation(image,
             rm_edges = rm_edges * temp[i]
         
         # filter by color per criteria above
-        try:    color1 = color_filter(image, rm_edges, **color_args_1)
+        stats = component_stats(rm_edges)
+        try:    color1 = color_filter(image, rm_edges, stats=stats, cache=cache, **color_args_1)
         except: color1 = np.ones(rm_edges.shape)
-        try:    color2 = color_filter(image, rm_edges, **color_args_2)
+        try:    color2 = color_filter(image, rm_edges, stats=stats, cache=cache, **color_args_2)
         except: color2 = np.ones(rm_edges.shape)
-        try:    color3 = color_filter(image, rm_edges, **color_args_3)
+        try:    color3 = color_filter(image, rm_edges, stats=stats, cache=cache, **color_args_3)
         except: color3 = np.ones(rm_edges.shape)
         
         # Combine color filters
@@ -247,11 +333,14 @@ def frangi_segmentation(image,
     
     working_image = expanded ^ working_image  # bitwise or
     
+    # Labels and object stats from here on are shared by the filters, and
+    # updated as they remove objects.
+    stats = component_stats(working_image)
+    
     try:    # remove little objects (for computational efficiency)
-        working_image = morphology.remove_small_objects(
-            working_image, 
-            min_size=morphology_args_1['min_size']
-        )
+        keep = stats['area'] >= morphology_args_1['min_size']
+        working_image = keep[stats['labels']]
+        update_component_stats(stats, working_image)
     except:
         pass
     if verbose:
@@ -259,7 +348,8 @@ def frangi_segmentation(image,
 
     # Filter candidate objects by morphology
     try:
-        working_image = morphology_filter(working_image, **morphology_args_1)
+        working_image = morphology_filter(working_image, stats=stats, **morphology_args_1)
+        update_component_stats(stats, working_image)
         if verbose:
             print("Morphology filter 1 complete")
     except:
@@ -269,20 +359,24 @@ def frangi_segmentation(image,
     
     # Filter objects by neighborhood colors
     try:
-        working_image = neighborhood_filter(image, working_image, **neighborhood_args)
+        working_image = neighborhood_filter(image, working_image, stats=stats, cache=cache, **neighborhood_args)
+        update_component_stats(stats, working_image)
         if verbose:
             print("Neighborhood filter complete")
     except:
         if neighborhood_args is not 'skip':
             warn("Skipping neighborhood filter")
         pass
+    del cache  # colorspace conversions aren't needed after this
     
     # Filter candidate objects by hollowness
     if hollow_args is not 'skip':  
         temp = morphology.remove_small_holes(working_image, min_size=10)
         try:
             if np.sum(temp) > 0:
-                working_image = hollow_filter(temp, **hollow_args)
+                temp_stats = component_stats(temp)  # filling holes can join objects
+                working_image = hollow_filter(temp, stats=temp_stats, **hollow_args)
+                stats = update_component_stats(temp_stats, working_image)
             if verbose:
                 print("Hollow filter complete")
         except:
@@ -292,6 +386,7 @@ def frangi_segmentation(image,
     # Close small gaps and holes in accepted objects
     try:
         working_image = fill_gaps(working_image, **fill_gaps_args)
+        stats = component_stats(working_image)
         if verbose:
             print("Gap filling complete")
     except:
@@ -301,7 +396,8 @@ def frangi_segmentation(image,
     
     # Filter candidate objects by morphology
     try:
-        working_image = morphology_filter(working_image, **morphology_args_2)
+        working_image = morphology_filter(working_image, stats=stats, **morphology_args_2)
+        update_component_stats(stats, working_image)
         if verbose:
             print("Morphology filter 2 complete")
     except:
@@ -310,13 +406,13 @@ def frangi_segmentation(image,
         pass
         
     # Skeletonize. Now working with a dictionary of objects.
-    skel = skeleton_with_distance(working_image)
+    skel = skeleton_with_distance(working_image, sparse=sparse, stats=stats, backend=skeleton_backend)
     if verbose:
         print("Skeletonization complete")
     
     # Diameter filter
     try:
-        diam = diameter_filter(skel, **diameter_args)
+        diam = diameter_filter(skel, stats=stats, **diameter_args)
         if verbose:
             print("Diameter filter complete")
     except:
@@ -329,6 +425,13 @@ def frangi_segmentation(image,
     if diameter_bins is None or diameter_bins is 'skip':
         summary_df = summarize_geometry(diam['geometry'], image_name)
 
+    elif sparse:
+        diam_out, summary_df = bin_by_diameter(diam['skeleton']['Length'].values,
+                                               diam['skeleton']['Diameter'].values,
+                                               diameter_bins,
+                                               image_name)
+        diam['skeleton'] = diam['skeleton'].assign(Diameter=diam_out)
+
     else:
         diam_out, summary_df = bin_by_diameter(diam['length'],
                                                diam['diameter'],
@@ -336,12 +439,93 @@ def frangi_segmentation(image,
                                                image_name)
         diam['diameter'] = diam_out
     
-    out = {'geometry' : summary_df,
-           'objects'  : diam['objects'],
-           'length'   : diam['length'],
-           'diameter' : diam['diameter']}
+    if sparse:
+        out = {'geometry' : summary_df,
+               'objects'  : diam['objects'],
+               'skeleton' : diam['skeleton']}
+    else:
+        out = {'geometry' : summary_df,
+               'objects'  : diam['objects'],
+               'length'   : diam['length'],
+               'diameter' : diam['diameter']}
 
     if verbose is True:
         print("Done")
 
     return(out)
+
+
+def frangi_scale_range(images,
+                       colors,
+                       frangi_args,
+                       threshold_args,
+                       percentiles=(1, 99),
+                       scale_step=None,
+                       verbose=False,
+                       **kwargs):
+    """
+    Calibrate `frangi_args['scale_range']` from the diameters of objects in a few images. Each
+    scale of the Frangi filter costs as much as the next, so a range picked wide to be safe is
+    slow. Runs `pyroots.frangi_segmentation` on each image with the given `frangi_args`, which
+    should span every scale that might be needed, and finds the shortest range of scales that
+    covers the diameters of the objects found, by length. See
+    `pyroots.scale_range_from_diameters`. The range is only as good as the segmentation, so
+    check the objects of a few images with these parameters first.
+    
+    Parameters
+    ----------
+    images : list of ndarray or str
+        Images, or paths to them. A handful sampled from the batch, as by
+        `pyroots.file_subsampler`, is enough.
+    colors, frangi_args, threshold_args
+        As for `pyroots.frangi_segmentation`.
+    percentiles : tuple of float
+        Lower and upper percentiles of diameter to cover. Default = (1, 99).
+    scale_step : float or None
+        Step between scales. If `None` (default), keeps the `scale_step` of `frangi_args`.
+    verbose : bool
+        Print the diameters and the new range?
+    kwargs
+        Other arguments of `pyroots.frangi_segmentation`, such as the filters of a parameters
+        file. `sparse` and `diameter_bins` are set here.
+    
+    Returns
+    -------
+    A copy of `frangi_args` with `scale_range` and `scale_step` replaced, as a list of dict if
+    given as one.
+    
+    Examples
+    --------
+    >>> files = [os.path.join(dir_in, f) for f in random.sample(os.listdir(dir_in), 5)]
+    >>> frangi_args = pyroots.frangi_scale_range(files, colors, frangi_args, threshold_args,
+    ...                                          morphology_args_1=morphology_args_1)
+    """
+    kwargs['sparse'] = True
+    kwargs['diameter_bins'] = 'skip'
+    skeletons = []
+    for image in images:
+        if isinstance(image, str):
+            image = io.imread(image)
+        skeletons.append(frangi_segmentation(image, colors, frangi_args, threshold_args,
+                                             **kwargs)['skeleton'])
+    skel = pd.concat(skeletons)
+    diameters, lengths = skel['Diameter'].values, skel['Length'].values
+    
+    out = []
+    for args in (frangi_args if isinstance(frangi_args, list) else [frangi_args]):
+        step = scale_step if scale_step is not None else args.get('scale_step', 2)
+        scale_range, step = scale_range_from_diameters(diameters, lengths,
+                                                       percentiles=percentiles,
+                                                       scale_step=step)
+        out.append(dict(args, scale_range=scale_range, scale_step=step))
+    
+    if verbose:
+        keep = (diameters > 0) & (lengths > 0)
+        low, high = _weighted_percentile(diameters[keep], lengths[keep], percentiles)
+        print("Diameters, percentiles {} to {}: {:.1f} to {:.1f} pixels".format(percentiles[0],
+                                                                               percentiles[1],
+                                                                               low, high))
+        for args in out:
+            print("scale_range = {}, scale_step = {}".format(args['scale_range'], args['scale_step']))
+    
+    return(out if isinstance(frangi_args, list) else out[0])
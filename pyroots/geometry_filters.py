@@ -10,14 +10,20 @@ Various functions for removing candidate objects based on their geometry.
 - diameter_filter: Based on diameter along the medial axis
 - length_width_filter: Based on length and diameter along the medial axis.
 - morphology_filter: Based on properties of convex hulls and equivalent ellilpses
+- _hollow_test: Supports hollow filter
 - hollow_filter: Based on medial axis lengths of original and filled objects
 """
 
 from scipy import ndimage
 import pandas as pd
 import numpy as np
-from skimage import morphology, measure
-from pyroots.skeletonization import _axis_length
+from skimage import morphology
+import cv2
+from pyroots.skeletonization import _axis_length, _skeletonize
+from pyroots.skeleton_graph import _skeleton_labels
+from pyroots.component_stats import component_stats, select_objects, shape_descriptors, _grouped_percentile
+from pyroots.object_executor import map_objects
+from pyroots.binary_morphology import disk_dilation, disk_erosion, disk_closing
 
 #########################################################################################################################
 #########################################################################################################################
@@ -37,9 +43,10 @@ def _percentile_filter(labels, diameter_image, percentile, value, test_type):
     labels : array
         the output of ``ndimage.label``, which labels image objects in binary
         images. For skeletons, use maximum distance rather than manhattan.
+        Can also be the labels of skeleton pixels only, as in a sparse skeleton.
     diameter_image : array
         skeleton image with pixel values as diameter and background as 0, for 
-        example.
+        example. Same shape as ``labels``.
     percentile : float
         the percentile of pixel values at which to make the decision to keep
     value : float
@@ -54,37 +61,36 @@ def _percentile_filter(labels, diameter_image, percentile, value, test_type):
     
     See Also
     --------
-    ``numpy.percentile``, ``pyroots.diameter_filter``
+    ``pyroots._grouped_percentile``, ``pyroots.diameter_filter``
     
     """
     
-    # calculate percentile diameter for each object
-    out = []
-    for i in range(labels.max()):
-        temp = np.ma.masked_array(diameter_image, labels != i+1)  # 0 is background
-        temp = np.percentile(temp.compressed(), percentile)
-        out.append(temp)
+    # calculate percentile diameter for each object, in one pass
+    size = np.max(labels, initial=0) + 1
+    in_object = labels > 0  # 0 is background
+    out = _grouped_percentile(labels[in_object], diameter_image[in_object],
+                              percentile, size)
     
     #select objects that meet diameter criteria at percentile
-      # i=0 is background, therefore i+1
-    if test_type == "ceiling":
-        out = [i+1 for i, x in enumerate(out) if x < value]   
-    elif test_type == "floor":
-        out = [i+1 for i, x in enumerate(out) if x > value]        
-    else:
-        print("Test_type should be 'ceiling' or 'floor'!")
+    with np.errstate(invalid='ignore'):
+        if test_type == "ceiling":
+            keep = out < value
+        elif test_type == "floor":
+            keep = out > value
+        else:
+            print("Test_type should be 'ceiling' or 'floor'!")
+            keep = np.zeros(size, dtype=bool)
+    keep[0] = False  # background
     
     #translate this to the labels image
-    out = np.in1d(labels, out)  # is each pixel value represented in the 
-    # list of objects to keep?
-    out = np.reshape(out, labels.shape)  # reshape to image
+    out = select_objects(labels, keep, count=size - 1)
     
     return(out)
 
 
 def diameter_filter(skeleton_dictionary,
             max_diameter=1000, min_diameter=-1, 
-            max_percentile=100, min_percentile=None, pixel_level = False):
+            max_percentile=100, min_percentile=None, pixel_level = False, stats=None):
     """
     Remove objects based on width thresholds. For example, hyphae usually are 
     < 5um diameter, so objects that are mostly >5um are not hyphae, and 
@@ -102,6 +108,8 @@ def diameter_filter(skeleton_dictionary,
             * "diameter", an ndarray of medial axis, with each pixel representing diameter
             * "geometry", a pandas ``DataFrame`` of total length and average diameter for
             each object.
+        If the dictionary is sparse (``skeleton_with_distance(sparse=True)``), "length" 
+        and "diameter" are replaced by "skeleton", and the output is sparse too.
     max_percentile : float
         Of all of the skeleton pixels for a single object, if the ceiling is smaller 
         than the percentile, the entire object is deleted. Feeds into 
@@ -119,6 +127,9 @@ def diameter_filter(skeleton_dictionary,
     pixel_level : bool
         If true, will remove individual pixels with values > ''max_diameter'' and 
         < ''min_diameter''. 
+    stats : dict
+        Output of ``pyroots.component_stats`` for the objects in ``skeleton_dictionary``.
+        Reuses its labels instead of labelling the objects again. Default = ``None``.
     
     Returns
     -------
@@ -134,17 +145,34 @@ def diameter_filter(skeleton_dictionary,
     ``pyroots._percentile_filter``, ``scipy.ndimage.label``, ``pandas``
     
     """    
-    diameter_in = skeleton_dictionary["diameter"]
-    length_in = skeleton_dictionary["length"]
     objects_in = skeleton_dictionary["objects"]
+    sparse = "skeleton" in skeleton_dictionary
+
+    if sparse:
+        # make sure skeletons for diameter and length are updated with objects
+        skeleton = skeleton_dictionary["skeleton"]
+        rows = skeleton["Row"].values
+        cols = skeleton["Col"].values
+        skeleton = skeleton[(objects_in[rows, cols] > 0) * (skeleton["Diameter"].values > 0)]
+        rows = skeleton["Row"].values
+        cols = skeleton["Col"].values
+        diameter = skeleton["Diameter"].values
+        length = skeleton["Length"].values
+
+        #Label objects for indexing. Square connectivity for skeletons.
+        labels = _skeleton_labels(rows, cols, objects_in.shape)
+
+    else:
+        diameter_in = skeleton_dictionary["diameter"]
+        length_in = skeleton_dictionary["length"]
 
-    # make sure skeletons for diameter and length are updated with objects
-    diameter = diameter_in * (objects_in > 0)
-    length = length_in * (objects_in > 0)
+        # make sure skeletons for diameter and length are updated with objects
+        diameter = diameter_in * (objects_in > 0)
+        length = length_in * (objects_in > 0)
     
-    #Label objects for indexing
-    labels, labels_ls= ndimage.label(diameter > 0,  # convert float to boolean
-                                     structure = np.ones((3,3))) #square for skeletons
+        #Label objects for indexing
+        labels, labels_ls= ndimage.label(diameter > 0,  # convert float to boolean
+                                         structure = np.ones((3,3))) #square for skeletons
       
     ####  Percentile filters  ####              
     max_perc_filter = _percentile_filter(labels, diameter, 
@@ -169,18 +197,32 @@ def diameter_filter(skeleton_dictionary,
         diam_filter = perc_filter
     
     #### Update the skeletons ####
-    new_diam_skeleton = diameter * diam_filter
-    new_len_skeleton = length * diam_filter
-    new_labels = labels * diam_filter
+    if sparse:
+        new_skeleton = skeleton[diam_filter]
+        new_diam_skeleton = diameter[diam_filter]
+        new_len_skeleton = length[diam_filter]
+        new_labels = labels[diam_filter]
+    else:
+        new_diam_skeleton = diameter * diam_filter
+        new_len_skeleton = length * diam_filter
+        new_labels = labels * diam_filter
     
     #### Update geometry dataframe ####
     # Re-calculate geometry of each object
-    objects_diameter = ndimage.mean(new_diam_skeleton, 
-                                    new_labels, 
-                                    index=range(new_labels.max()+1)) 
-    objects_length = ndimage.sum(new_len_skeleton,
-                                 new_labels,
-                                 index=range(new_labels.max()+1))
+    if sparse:
+        nlabels = np.max(new_labels, initial=0) + 1
+        npixels = np.bincount(new_labels, minlength=nlabels)
+        with np.errstate(invalid='ignore'):
+            objects_diameter = np.bincount(new_labels, new_diam_skeleton, minlength=nlabels) / npixels
+        objects_length = np.bincount(new_labels, new_len_skeleton, minlength=nlabels)
+        objects_diameter[0] = 0  # no background pixels in the table
+    else:
+        objects_diameter = ndimage.mean(new_diam_skeleton, 
+                                        new_labels, 
+                                        index=range(new_labels.max()+1)) 
+        objects_length = ndimage.sum(new_len_skeleton,
+                                     new_labels,
+                                     index=range(new_labels.max()+1))
     
     # Create a new geometry dataframe
     geom_out = pd.DataFrame({'Length' : objects_length,
@@ -188,14 +230,26 @@ def diameter_filter(skeleton_dictionary,
     geom_out = geom_out[geom_out['Diameter'].notnull()]  # subset only present objects
     
     #### update the objects ####
-    labels, labels_ls = ndimage.label(objects_in) # make labels or original objects
-    new_objects = np.in1d(labels, np.unique(new_labels)) # only keep labels that were kept
-    new_objects = np.reshape(new_objects, new_labels.shape) * labels > 0 # maintain as binary
+    # only keep objects that still have part of their skeleton
+    if stats is None:
+        labels, labels_ls = ndimage.label(objects_in) # make labels or original objects
+    else:
+        labels, labels_ls = stats["labels"], stats["count"]
+    if sparse:
+        keep = labels[new_skeleton["Row"].values, new_skeleton["Col"].values]
+    else:
+        keep = labels[new_labels > 0]
+    new_objects = select_objects(labels, keep, count=labels_ls)
     
-    out = {"objects"  : new_objects,
-           "length"   : new_len_skeleton,
-           "diameter" : new_diam_skeleton,
-           "geometry" : geom_out}
+    if sparse:
+        out = {"objects"  : new_objects,
+               "skeleton" : new_skeleton,
+               "geometry" : geom_out}
+    else:
+        out = {"objects"  : new_objects,
+               "length"   : new_len_skeleton,
+               "diameter" : new_diam_skeleton,
+               "geometry" : geom_out}
     
     return(out)
     
@@ -208,7 +262,7 @@ def diameter_filter(skeleton_dictionary,
 #########################################################################################################################
 
     
-def length_width_filter(skeleton_dictionary, threshold=5):
+def length_width_filter(skeleton_dictionary, threshold=5, stats=None):
     """
     Remove objects based on length:(average) width ratios from skeletonized images.
     
@@ -222,8 +276,13 @@ def length_width_filter(skeleton_dictionary, threshold=5):
             * "diameter", an ndarray of medial axis, with each pixel representing diameter
             * "geometry", a pandas ``DataFrame`` of total length and average diameter for
             each object.
+        If the dictionary is sparse (``skeleton_with_distance(sparse=True)``), "length" 
+        and "diameter" are replaced by "skeleton", and the output is sparse too.
     threshold : float
         Minimum length:width ratio to keep an object. Default = 5.
+    stats : dict
+        Output of ``pyroots.component_stats`` for the objects in ``skeleton_dictionary``.
+        Reuses its labels instead of labelling the objects again. Default = ``None``.
     
     Returns
     -------
@@ -232,8 +291,6 @@ def length_width_filter(skeleton_dictionary, threshold=5):
     
     """    
     
-    diameter_in = skeleton_dictionary["diameter"]
-    length_in = skeleton_dictionary["length"]
     objects_in = skeleton_dictionary["objects"]
     geometry_in = skeleton_dictionary["geometry"]
     
@@ -241,7 +298,10 @@ def length_width_filter(skeleton_dictionary, threshold=5):
     geometry = [geometry_in['Diameter'].values, geometry_in['Length'].values]
     
     
-    labels, labels_ls = ndimage.label(skeleton_dictionary["objects"])
+    if stats is None:
+        labels, labels_ls = ndimage.label(skeleton_dictionary["objects"])
+    else:
+        labels, labels_ls = stats["labels"], stats["count"]
     
     if labels_ls + 1 != len(geometry_in.index):
         raise("Incompatible Geometry Array and Image: Image has " + str(labels_ls + 1) + " objects. Geometry DataFrame has " + str(len(geometry_in.index)) + " objects.")
@@ -260,13 +320,21 @@ def length_width_filter(skeleton_dictionary, threshold=5):
     # the object number is true for thresh_test
     new_objects = np.array(thresh_test)[labels]  
     
-    new_diam_skeleton = diameter_in * new_objects
-    new_length_skeleton = length_in * new_objects
+    if "skeleton" in skeleton_dictionary:  # sparse
+        skeleton = skeleton_dictionary["skeleton"]
+        keep = new_objects[skeleton["Row"].values, skeleton["Col"].values]
+        out = {"objects"  : new_objects,
+               "skeleton" : skeleton[keep],
+               "geometry" : geom_out}
     
-    out = {"objects"  : new_objects,
-           "length"   : new_length_skeleton,
-           "diameter" : new_diam_skeleton,
-           "geometry" : geom_out}
+    else:
+        new_diam_skeleton = skeleton_dictionary["diameter"] * new_objects
+        new_length_skeleton = skeleton_dictionary["length"] * new_objects
+    
+        out = {"objects"  : new_objects,
+               "length"   : new_length_skeleton,
+               "diameter" : new_diam_skeleton,
+               "geometry" : geom_out}
     
     return(out)
 
@@ -281,12 +349,12 @@ def length_width_filter(skeleton_dictionary, threshold=5):
 
 def morphology_filter(image, loose_eccentricity=0, loose_solidity=1, 
                       strict_eccentricity=0, strict_solidity=1, 
-                      min_length=None, min_size=None):
+                      min_length=None, min_size=None, stats=None):
     """
     Removes objects based on properties of convex hulls and equivalent
-    ellipses, plus size. Defaults are for no filtering. This algorithm is
-    moderately fast, but time increases with number of objects due to the
-    need for loops. 
+    ellipses, plus size. Defaults are for no filtering. All properties are
+    computed for all objects at once (see ``pyroots.shape_descriptors``), 
+    so there are no loops over objects. 
     
     Parameters
     ----------
@@ -300,6 +368,9 @@ def morphology_filter(image, loose_eccentricity=0, loose_solidity=1,
         in pixels, of ellipse with equivalent moments to convex hull
     min_size : int
         in pixels, of area of candidate object.
+    stats : dict
+        Output of ``pyroots.component_stats(image)``. Reuses its labels and areas
+        instead of labelling ``image`` again. Default = ``None``.
     
     Returns
     -------
@@ -307,44 +378,41 @@ def morphology_filter(image, loose_eccentricity=0, loose_solidity=1,
     
     See Also
     --------
-    `skimage.measure.regionprops`, `ndimage.label`
+    `skimage.measure.regionprops`, `pyroots.component_stats`, `pyroots.shape_descriptors`
     """
+    # Each test is a property of a single object, so all of them are made on
+    # one set of labels and combined as a lookup of objects to keep.
+    if stats is None:
+        stats = component_stats(image)
+    labels = stats["labels"]
+    features = shape_descriptors(stats, solidity=True)  # one row per label
+    
+    keep = np.ones(stats["count"] + 1, dtype=bool)
+    keep[0] = False  # background
+    
     #### easy stuff first ####
     
     # min size
-    if min_size is None:
-        working_image = image.copy()
-    else:
-        working_image = morphology.remove_small_objects(image, min_size=min_size)
+    if min_size is not None:
+        keep *= features["Area"].values >= min_size
     
     # min length of major axis
-    labels = ndimage.label(working_image)[0]
-    props = measure.regionprops(labels)
-    
     if min_length is not None:
-        length = [0] + [i.major_axis_length for i in props]
-        length = np.array(length)[labels]  # make an image based on labels
-        working_image = length > min_length
+        keep *= features["MajorAxisLength"].values > min_length
     
     
     #### eccentricity and solidity  ####
     
-    labels = ndimage.label(working_image)[0]
-    props = measure.regionprops(labels)
-    # calculate eccentricity
-    eccentricity = [0] + [i.eccentricity for i in props]
-    eccentricity = np.array(eccentricity)[labels]  # make an image based on labels
-
-    # calculate solidity
-    solidity = [0] + [i.filled_area / i.convex_area for i in props]
-    solidity = np.array(solidity)[labels]  # make an image based on labels
+    eccentricity = features["Eccentricity"].values * keep
+    solidity = features["Solidity"].values * keep
     
     # loose and strict filters
     loose = ((solidity < loose_solidity) * (solidity > 0)) * (eccentricity > loose_eccentricity)  # AND
     strict = ((solidity < strict_solidity) * (solidity > 0)) + (eccentricity > strict_eccentricity)  # OR 
     
     # Combine and exit. Must pass all. 
-    out = strict * loose * working_image  # AND
+    keep *= strict * loose  # AND
+    out = keep[labels]
     return(out)
 
 #########################################################################################################################
@@ -355,7 +423,30 @@ def morphology_filter(image, loose_eccentricity=0, loose_solidity=1,
 #########################################################################################################################
 #########################################################################################################################
     
-def hollow_filter(image, ratio=1.5, fill_kernel=15, **kwargs):
+def _hollow_test(temp_object, kernel, ratio, distance=False, skeleton_backend='zhang'):
+    """
+    Does a single object pass ``pyroots.hollow_filter``? Compares medial axis
+    length before and after closing the object with ``kernel``, by distance
+    transforms if ``distance`` is ``True``.
+    """
+    # compute original medial axis length
+    open_medial = _skeletonize(temp_object, skeleton_backend)
+    open_length = _axis_length(open_medial)[1]  # length float only
+    
+    #close object and compute new axis length
+    if distance is True:
+        closed_medial = disk_closing(temp_object, kernel)
+    else:
+        closed_medial = morphology.binary_closing(temp_object, selem=kernel)
+    closed_medial = _skeletonize(closed_medial, skeleton_backend)
+    closed_length = _axis_length(closed_medial)[1]
+    
+    # Does the ratio pass the threshold?
+    return(open_length/closed_length < ratio)
+
+
+def hollow_filter(image, ratio=1.5, fill_kernel=15, stats=None, whole_image=True,
+                  threads=1, processes=False, distance_radius=8, skeleton_backend='zhang', **kwargs):
     """
     For each object, what is the ratio of A to B where:
         A = medial axis length before filling (~= "perimeter" of hollow objects)
@@ -363,8 +454,11 @@ def hollow_filter(image, ratio=1.5, fill_kernel=15, **kwargs):
     Filters objects based on ratio, which is a ceiling for true objects. Assumes
     true objects are not hollow. 
     
-    This is a relatively slow algorithm, and should be performed last (time
-    proportional to number of objects due to loops). 
+    By default, the image is closed and skeletonized once, and lengths are 
+    summed by object. Objects that are within ``2*fill_kernel`` of another
+    object would merge when closed, so they are cropped and processed one at a
+    time, which is slow (time proportional to number of objects). Use ``threads``
+    to process them in parallel. 
         
     Parameters
     ----------
@@ -374,6 +468,25 @@ def hollow_filter(image, ratio=1.5, fill_kernel=15, **kwargs):
         Maximum of A:B (see above)
     fill_kernel : int
         Radius of disk, in pixels, used to fill objects.
+    stats : dict
+        Output of ``pyroots.component_stats(image)``. Reuses its labels and
+        bounding boxes instead of labelling ``image`` again. Default = ``None``.
+    whole_image : bool
+        Process objects that don't merge when closed all at once? If ``False``,
+        crops and processes every object one at a time. Default = ``True``.
+    threads : int
+        Number of workers for objects processed one at a time. See
+        ``pyroots.map_objects``. Default = 1.
+    processes : bool
+        Use processes rather than threads? Default = ``False``.
+    distance_radius : int
+        If ``fill_kernel`` is at least this, dilate and erode with distance
+        transforms (``pyroots.disk_closing``), which take the same time for any
+        radius and give the same result. ``None`` to never use them.
+        Default = 8.
+    skeleton_backend : str
+        How to skeletonize objects. Default = ``'zhang'``, ``morphology.skeletonize``.
+        See ``pyroots.skeletonization.SKELETON_BACKENDS``.
     **kwargs : dict
         passed on to `pyroots.noise_removal`
     
@@ -384,44 +497,80 @@ def hollow_filter(image, ratio=1.5, fill_kernel=15, **kwargs):
     See Also
     --------
     `skimage.morphology.binary_closing`, `pyroots.skeleton_with_distance`, 
-    `pyroots.noise_removal`
+    `pyroots.noise_removal`, `pyroots.map_objects`
     """
     
     img = image.copy()
     
     # Labels, object slices
-    labels, labels_ls = ndimage.label(img)
-    props = measure.regionprops(labels)  # for slicing the image around objects
+    if stats is None:
+        stats = component_stats(img)
+    labels, labels_ls = stats["labels"], stats["count"]
+    bbox = stats["bbox"]  # for slicing the image around objects
     
     # kernel
     kernel = morphology.disk(fill_kernel)
+    distance = distance_radius is not None and fill_kernel >= distance_radius
     # Smooth the image. Medial axis is highly sensitive to bumps. 
 #     skel = pr.noise_removal(img, **kwargs)
 #     skel = morphology.skeletonize(skel)  # pull 'length' medial axis of all original objects
     
-    test = [0] * (labels_ls + 1)
-    for i in range(labels_ls + 1):    
-        # Bounds of slice to only the object of interest
-        a, b, c, d = props[i-1].bbox
-        a = max(a - fill_kernel, 0)  # include a buffer. Stay within bounds of image.
-        b = max(b - fill_kernel, 0)
-        c = min(c + fill_kernel, img.shape[1])
-        d = min(d + fill_kernel, img.shape[0])
-
-        temp_object = labels[a:c, b:d] == i
+    test = np.zeros(labels_ls + 1, dtype=bool)  # 0 is background
+    crop = np.ones(labels_ls + 1, dtype=bool)  # objects to process one at a time
+    crop[0] = False
+    
+    if whole_image is True and labels_ls > 0:
+        #### Close the whole image ####
+        # Objects are independent if their dilations don't touch, even at
+        # corners. Then closing and skeletonizing all of them at once gives the
+        # same result as one at a time.
+        # opencv is much faster than skimage for large kernels, with the same
+        # result (the image edge doesn't dilate, and doesn't erode).
+        kernel_8 = kernel.astype(np.uint8)
+        if distance:
+            dilated = disk_dilation(labels > 0, kernel)
+        else:
+            dilated = cv2.dilate((labels > 0).view(np.uint8), kernel_8) > 0
+        region, region_ls = ndimage.label(dilated, structure=np.ones((3,3)))
         
-        # compute original medial axis length
-        open_medial = morphology.skeletonize(temp_object)
-        open_length = _axis_length(open_medial)[1]  # length float only
+        object_region = np.zeros(labels_ls + 1, dtype=np.int64)
+        object_region[labels.ravel()] = region.ravel()
+        n_objects = np.bincount(object_region[1:], minlength=region_ls + 1)
+        alone = n_objects[object_region] == 1
+        alone[0] = False
+        crop[alone] = False
         
-        #close object and compute new axis length
-        closed_medial = morphology.binary_closing(temp_object, selem=kernel)
-        closed_medial = morphology.skeletonize(closed_medial)
-        closed_length = _axis_length(closed_medial)[1]
+        # label closed objects by the object in their region
+        region_label = np.zeros(region_ls + 1, dtype=labels.dtype)
+        region_label[object_region[alone]] = np.nonzero(alone)[0]
+        if distance:
+            closed = disk_erosion(dilated, kernel)
+        else:
+            closed = cv2.erode(dilated.view(np.uint8), kernel_8) > 0
+        closed_labels = region_label[region] * closed
+        
+        #### Medial axis lengths, by object ####
+        open_medial = _skeletonize(labels > 0, skeleton_backend)
+        open_length = _axis_length(open_medial, labels)[1]
+        closed_medial = _skeletonize(closed, skeleton_backend)
+        closed_length = _axis_length(closed_medial, closed_labels)[1]
+        closed_length = np.append(closed_length, np.zeros(labels_ls + 1 - len(closed_length)))
         
-        # Does the ratio pass the threshold?
-        test[i] = open_length/closed_length < ratio
+        with np.errstate(invalid='ignore', divide='ignore'):
+            test[1:] = open_length / closed_length[:labels_ls] < ratio
+        test[crop] = False
+    
+    #### One object at a time ####
+    # Closing looks up to 2*fill_kernel from the object. A smaller buffer lets
+    # the edge of the slice leak into the result.
+    if crop.any():
+        test_crop = map_objects(_hollow_test, labels, objects=np.nonzero(crop)[0],
+                                pad=2*fill_kernel + 1, bbox=bbox, 
+                                threads=threads, processes=processes,
+                                kernel=kernel, ratio=ratio, distance=distance,
+                                skeleton_backend=skeleton_backend)
+        test[crop] = test_crop[crop]
     
     # update image
-    out = np.array(test)[labels] * labels > 0
+    out = test[labels]
     return(out)
@@ -12,14 +12,24 @@ Contents:
 - _arrays_var
 - _center_image
 - fill_gaps
+- ColorspaceCache
+- _colorspace_name
+- _convert_colorspace
+- _colorspace_band
+- _colorspace_pixels
 - band_selector
 """
 
 import numpy as np
+from collections import OrderedDict
 from skimage import draw, morphology, filters, exposure, img_as_float, img_as_ubyte, color
 from multiprocessing import Pool
 from multiprocessing.dummy import Pool as ThreadPool
 import cv2
+from pyroots.color_tables import rgb_to_band
+from pyroots.binary_morphology import binary_majority, disk_closing
+from pyroots.local_threshold import threshold_local
+from pyroots import backends
 
 
 
@@ -32,7 +42,8 @@ import cv2
 #########################################################################################################################
 
 
-def equalize_exposure(image, iterations=1, kernel_size=None, min_object_size=500, dark_objects=True, stretch=False):
+def equalize_exposure(image, iterations=1, kernel_size=None, min_object_size=500, dark_objects=True, stretch=False,
+                      threshold_backend='skimage'):
     """
     Filter a grayscale image with uneven brightness across it, such as you might see in a microscope image.
     Removes large objects using adaptive thresholding based on `min_object_size`, then calculates the mean
@@ -61,6 +72,9 @@ def equalize_exposure(image, iterations=1, kernel_size=None, min_object_size=500
     stretch : bool
         Stretch values to cover entire colorspace? Enhances colors. Largely aesthetic. Not recommended
         for batch analyses.
+    threshold_backend : str
+        Backend for the local threshold that finds large objects. See `pyroots.threshold_local`.
+        Default = 'skimage'.
 
     Returns
     -------
@@ -95,8 +109,8 @@ def equalize_exposure(image, iterations=1, kernel_size=None, min_object_size=500
         block_size = kernel_size
 
     #objects = ~filters.threshold_adaptive(img, block_size, offset = 0.01*img.max())  # deprecated function
-    objects = img > filters.threshold_local(img, block_size, offset = 0.01*img.max())
-    objects = morphology.remove_small_objects(objects, min_size = min_object_size)
+    objects = img > threshold_local(img, block_size, offset = 0.01*img.max(), backend=threshold_backend)
+    objects = backends.remove_small_objects(objects, min_size = min_object_size)
 
     # Correct Exposure x times
     i = 0
@@ -106,7 +120,7 @@ def equalize_exposure(image, iterations=1, kernel_size=None, min_object_size=500
 
         # global means
         local_means = filters.rank.mean(img, selem=kernel, mask=~objects)
-        local_means = filters.gaussian(local_means, kernel_size)
+        local_means = backends.gaussian(local_means, kernel_size)
 
         # Correct Image
         img += (img_mean - local_means)
@@ -443,7 +457,7 @@ def _disk(radius):
         # round improves behavior with irrational radii
     return(disk_out)
 
-def fill_gaps(image, closing_radius=0, min_hole_size=0, median_radius=0.6):
+def fill_gaps(image, closing_radius=0, min_hole_size=0, median_radius=0.6, distance_radius=8):
     """
     This function closes small gaps between and within objects and smooths edges. It is a
     'finishing' step before skeletonization, and improves the quality of the skeleton by removing
@@ -451,7 +465,8 @@ def fill_gaps(image, closing_radius=0, min_hole_size=0, median_radius=0.6):
     the microscope as a single, long, clear object with sharp, parallel edges. These spurrious objects would
     otherwise pass earlier filters but are, in fact, spurrious. The function itself is a wrapper for
     `skimage.morphology.binary_closing`, `skimage.morphology.remove_small_holes`, and `skimage.filters.median`
-    on a binary image.
+    on a binary image. The median is done by `pyroots.binary_majority`, and closings with a large radius
+    by `pyroots.disk_closing`.
 
     Parameters
     ----------
@@ -464,6 +479,10 @@ def fill_gaps(image, closing_radius=0, min_hole_size=0, median_radius=0.6):
     median_radius : ndarray
         Binary structure to use for a median filter. Defaults at 0.6, giving square connectivity of 1
         (manhattan = 1). 0 to skip.
+    distance_radius : float
+        Closings with `closing_radius` at least this use distance transforms (`pyroots.disk_closing`),
+        which take the same time for any radius and give the same result. `None` to never use them.
+        Defaults to 8.
 
     Returns
     -------
@@ -473,13 +492,220 @@ def fill_gaps(image, closing_radius=0, min_hole_size=0, median_radius=0.6):
     closing_structure = _disk(closing_radius)
     median_structure = _disk(median_radius)
 
-    out = morphology.binary_closing(image, closing_structure)
+    if distance_radius is not None and closing_radius >= distance_radius:
+        out = disk_closing(image, closing_structure)
+    else:
+        out = backends.binary_closing(image, closing_structure)
     out = morphology.remove_small_holes(out, min_size=min_hole_size)
-    out = filters.median(out, selem=median_structure)
+    if out.dtype == bool:  # median of a binary image is a majority vote
+        out = binary_majority(out, median_structure)
+    else:
+        out = backends.median(out, median_structure)
 
     return(out)
     
 
+#########################################################################################################################
+#########################################################################################################################
+#######                                                                                                          ########
+#######                                             Colorspace Cache                                             ########
+#######                                                                                                          ########
+#########################################################################################################################
+#########################################################################################################################
+class ColorspaceCache(object):
+    """
+    Colorspace conversions of a single RGB image, each computed at most once. Pass
+    the same cache to `pyroots.band_selector`, `pyroots.color_filter` and
+    `pyroots.neighborhood_filter` so that, for example, five filters working in HSV
+    convert the image to HSV once.
+
+    Parameters
+    ----------
+    image : ndarray
+        RGB image. Not copied; don't change it while the cache is in use.
+    max_bytes : int
+        Memory cap for stored conversions. When adding a conversion would exceed it,
+        the least recently used conversions are dropped. A conversion bigger than
+        the cap is returned but not stored. Default = 2**29 (512 MB), or about five
+        conversions of a 12 megapixel image.
+    tables : bool
+        Convert single bands of 8-bit images with lookup tables? Much faster, with
+        small quantization errors. See `pyroots.color_tables`. Default = `False`.
+    table_dir : str
+        Where lookup tables are saved. Default = `None`, for
+        `pyroots.color_tables.TABLE_DIR`.
+
+    Attributes
+    ----------
+    image : ndarray
+        The RGB image.
+    nbytes : int
+        Memory used by stored conversions.
+    conversions : int
+        Number of conversions computed, for diagnostics.
+
+    Notes
+    -----
+    Arrays from `convert` and `band` are shared between callers. Copy them before
+    changing them in place.
+
+    Examples
+    --------
+    >>> cache = pyroots.ColorspaceCache(image)
+    >>> hue = cache.band('hsv', 0)
+    >>> objects = pyroots.color_filter(image, objects, 'hsv', 0, 0.5, 0.7, 50, cache=cache)
+    """
+
+    def __init__(self, image, max_bytes=2**29, tables=False, table_dir=None):
+        self.image = image
+        self.max_bytes = max_bytes
+        self.tables = tables
+        self.table_dir = table_dir
+        self.nbytes = 0
+        self.conversions = 0
+        self._store = OrderedDict()
+
+    def _remember(self, key, convert):
+        """
+        Stored result for `key`, or call `convert` and store it.
+        """
+        if key in self._store:
+            self._store.move_to_end(key)  # most recently used
+            return(self._store[key])
+
+        out = convert()
+        self.conversions += 1
+        if out.nbytes <= self.max_bytes:
+            while self.nbytes + out.nbytes > self.max_bytes:
+                self.nbytes -= self._store.popitem(last=False)[1].nbytes
+            self._store[key] = out
+            self.nbytes += out.nbytes
+        return(out)
+
+    def convert(self, colorspace):
+        """
+        `image` in `colorspace`, one of `skimage.color.rgb2*` (ex. `'hsv'`, `'lab'`,
+        `'gray'`), or `'rgb'` for the image itself.
+        """
+        colorspace = _colorspace_name(colorspace)
+        if colorspace == 'rgb':
+            return(self.image)
+        return(self._remember(colorspace,
+                              lambda: getattr(color, 'rgb2' + colorspace)(self.image)))
+
+    def band(self, colorspace, band):
+        """
+        Band `band` of `image` in `colorspace`. See `convert`. With `tables=True` and
+        an 8-bit image, converts just this band with `pyroots.rgb_to_band`.
+        """
+        colorspace = _colorspace_name(colorspace)
+        if self.tables is True and colorspace != 'rgb' and self.image.dtype == np.uint8:
+            if colorspace == 'gray':
+                band = 0
+            return(self._remember((colorspace, band),
+                                  lambda: rgb_to_band(self.image, colorspace, band, self.table_dir)))
+
+        out = self.convert(colorspace)
+        if len(out.shape) == 3:
+            out = out[:, :, band]
+        return(out)
+
+    def _stored(self, colorspace, band):
+        """
+        Band `band` of `colorspace` if it's already stored, or `None`. Doesn't
+        convert anything.
+        """
+        colorspace = _colorspace_name(colorspace)
+        if colorspace == 'rgb':
+            return(self.image[:, :, band])
+        for key in [(colorspace, 0 if colorspace == 'gray' else band), colorspace]:
+            if key in self._store:
+                self._store.move_to_end(key)
+                out = self._store[key]
+                if len(out.shape) == 3:
+                    out = out[:, :, band]
+                return(out)
+        return(None)
+
+    def clear(self):
+        """
+        Drop all stored conversions.
+        """
+        self._store.clear()
+        self.nbytes = 0
+
+
+def _colorspace_name(colorspace):
+    """
+    Lowercase, with 'grey' spelled 'gray' as in `skimage.color.rgb2gray`.
+    """
+    colorspace = colorspace.lower()
+    if colorspace == 'grey':
+        colorspace = 'gray'
+    return(colorspace)
+
+
+def _convert_colorspace(image, colorspace, cache=None):
+    """
+    Convert an RGB image to `colorspace` with `skimage.color.rgb2*`, or take the
+    conversion from a `pyroots.ColorspaceCache` of the same image. `'rgb'` returns
+    `image`.
+    """
+    if cache is not None:
+        if cache.image.shape != image.shape:
+            raise ValueError("`cache` is for a different image.")
+        return(cache.convert(colorspace))
+
+    colorspace = _colorspace_name(colorspace)
+    if colorspace == 'rgb':
+        return(image)
+    return(getattr(color, 'rgb2' + colorspace)(image))
+
+
+def _colorspace_band(image, colorspace, band, cache=None):
+    """
+    One band of an RGB image in `colorspace`. One-band colorspaces like 'gray'
+    ignore `band`. See `_convert_colorspace`.
+    """
+    if cache is not None:
+        if cache.image.shape != image.shape:
+            raise ValueError("`cache` is for a different image.")
+        return(cache.band(colorspace, band))
+
+    out = _convert_colorspace(image, colorspace)
+    if len(out.shape) == 3:
+        out = img_split(out)[band]
+    return(out)
+
+
+def _colorspace_pixels(image, colorspace, band, index, cache=None):
+    """
+    One band of an RGB image in `colorspace`, at flat pixel `index` only. Converts
+    just those pixels, unless `cache` already holds the band. For filters that only
+    look at object pixels. See `_colorspace_band`.
+    """
+    tables = False
+    if cache is not None:
+        if cache.image.shape != image.shape:
+            raise ValueError("`cache` is for a different image.")
+        stored = cache._stored(colorspace, band)
+        if stored is not None:
+            return(stored.reshape(-1)[index])
+        tables = cache.tables
+        table_dir = cache.table_dir
+
+    # pixels as an (n, 1, 3) image
+    pixels = image.reshape(-1, image.shape[2])[index][:, np.newaxis]
+    colorspace = _colorspace_name(colorspace)
+    if colorspace == 'rgb':
+        out = pixels[:, :, band]
+    elif tables is True and image.dtype == np.uint8:
+        out = rgb_to_band(pixels, colorspace, band, table_dir)
+    else:
+        out = _colorspace_band(pixels, colorspace, band)
+    return(out.ravel())
+
+
 #########################################################################################################################
 #########################################################################################################################
 #######                                                                                                          ########
@@ -487,7 +713,7 @@ def fill_gaps(image, closing_radius=0, min_hole_size=0, median_radius=0.6):
 #######                                                                                                          ########
 #########################################################################################################################
 #########################################################################################################################
-def band_selector(image, colors):
+def band_selector(image, colors, cache=None):
     """
     Convert `image` to the desired colorspace, and select bands. Also accepts grayscale images, which receive no conversion.
     
@@ -500,6 +726,8 @@ def band_selector(image, colors):
             'colorspace': string describing the colorspace to work in (rgb, lab, hsv, etc). See `skimage.color.rgb2*()` functions.
             'band': list of integers indexing the band(s) in `'colorspace'` to use. [0:2], usually. If `'colorspace'` is 'gray' or 'grey', then this is ignored.
             'dark_on_light': list of boolean stating whether objects of interest are dark objects on a light background in band of colorspace.
+    cache : pyroots.ColorspaceCache
+        Conversions of `image` to reuse. Default = `None`, which converts `image` again.
     """
     # convert band to list for downstream compatibilty, if necessary
     if len(colors) == 3:  #then it's an RGB image
@@ -532,23 +760,21 @@ def band_selector(image, colors):
                 equal the number of bands in `colors['band']`!"""
             )
 
-        # convert colorspace if necessary
+        # convert colorspace if necessary, and pull bands
         try:
-            working_image = getattr(color, "rgb2" + colors['colorspace'].lower())(image)
+            working_image = [_colorspace_band(image, colors['colorspace'], i, cache)
+                             for i in colors['band']]
         except:
-            working_image = image.copy()
-            if colors['colorspace'].lower() != 'rgb':
-                raise ValueError(
-                    """Didn't recognize specified colorspace. 
-                    See skimage.color.rgb2* for options."""
-                )
-        
-        # pull bands
-        if len(working_image.shape) == 3:  # excludes rgb2gray
-            working_image = [img_split(working_image)[i] for i in colors['band']]
-        else:
-            working_image = [working_image]
-            nbands = 1
+            raise ValueError(
+                """Didn't recognize specified colorspace. 
+                See skimage.color.rgb2* for options."""
+            )
+        if _colorspace_name(colors['colorspace']) == 'gray':  # one band
+            working_image = working_image[:1]
+
+        # don't return views of `image` or the cached conversion
+        if cache is not None or _colorspace_name(colors['colorspace']) == 'rgb':
+            working_image = [i.copy() for i in working_image]
     
     else:  # it's a black and white image
         nbands = 1
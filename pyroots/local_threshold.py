@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: pme
+
+Faster versions of ``skimage.filters.threshold_local`` for the large blocks
+(101-151 pixels) used by the segmentation pipelines. At those sizes the
+threshold surface is smooth, so it can be computed from running sums or at a
+lower resolution without changing many pixel decisions. Select a backend with
+the ``backend`` key of ``threshold_args``. Compare them on your own images with
+``pyroots.benchmark_threshold_local``.
+
+Contents:
+- _box_sizes
+- _integral_surface
+- _downsampled_surface
+- threshold_local
+"""
+
+import numpy as np
+import cv2
+from scipy import ndimage
+from skimage import filters
+
+
+def _box_sizes(sigma, n=3):
+    """
+    Widths of ``n`` box filters that, applied in turn, approximate a Gaussian of
+    standard deviation ``sigma``. After Kovesi (2010), "Fast almost-Gaussian
+    filtering".
+    """
+    ideal = np.sqrt(12 * sigma**2 / n + 1)
+    low = int(np.floor(ideal))
+    if low % 2 == 0:
+        low -= 1
+    low = max(low, 1)
+    high = low + 2
+    m = int(round((12 * sigma**2 - n * low**2 - 4 * n * low - 3 * n) / (-4 * low - 4)))
+    return([low if i < m else high for i in range(n)])
+
+
+def _integral_surface(image, block_size, method, sigma, mode, cval):
+    """
+    Threshold surface from running sums along each axis
+    (``scipy.ndimage.uniform_filter1d``), whose cost doesn't depend on the
+    window size. Exact for ``method='mean'``; three box filters per axis for
+    ``method='gaussian'``.
+    """
+    out = image
+    for axis in range(image.ndim):
+        if method == 'mean':
+            sizes = [block_size[axis]]
+        else:
+            sizes = _box_sizes(sigma[axis])
+        for size in sizes:
+            out = ndimage.uniform_filter1d(out, size, axis=axis, mode=mode, cval=cval)
+    return(out)
+
+
+def _downsampled_surface(image, block_size, method, sigma, mode, cval, factor=None):
+    """
+    Threshold surface computed on an image ``factor`` times smaller, by block
+    averages, and bilinearly interpolated back to full size. The smoothing at
+    low resolution is reduced to allow for the blur of averaging and
+    interpolating, about ``factor**2 / 4`` in variance.
+    """
+    if factor is None:
+        factor = max(1, int(min(sigma) / 3))
+    if factor == 1:
+        if method == 'mean':
+            return(ndimage.uniform_filter(image, block_size, mode=mode, cval=cval))
+        return(ndimage.gaussian_filter(image, sigma, mode=mode, cval=cval))
+
+    rows, cols = image.shape
+    extra = (-rows % factor, -cols % factor)
+    padded = np.pad(image, ((0, extra[0]), (0, extra[1])), mode='edge')
+    small = padded.reshape(padded.shape[0] // factor, factor,
+                           padded.shape[1] // factor, factor).mean(axis=(1, 3))
+
+    if method == 'mean':
+        # a box of the same area, at low resolution
+        size = [max(1, int(round(b / factor)) // 2 * 2 + 1) for b in block_size]
+        small = ndimage.uniform_filter(small, size, mode=mode, cval=cval)
+    else:
+        low_sigma = [np.sqrt(max(s**2 - factor**2 / 4, (factor / 2)**2)) / factor for s in sigma]
+        small = ndimage.gaussian_filter(small, low_sigma, mode=mode, cval=cval)
+
+    # half-pixel-centered bilinear interpolation, then crop the padding
+    out = cv2.resize(small, (padded.shape[1], padded.shape[0]), interpolation=cv2.INTER_LINEAR)
+    return(out[:rows, :cols])
+
+
+def threshold_local(image, block_size, method='gaussian', offset=0, mode='reflect',
+                    param=None, cval=0, backend='skimage', factor=None):
+    """
+    Local threshold surface, as ``skimage.filters.threshold_local``, with a choice
+    of faster approximations for large ``block_size``.
+
+    Parameters
+    ----------
+    image : ndarray
+        2D grayscale image or band.
+    block_size : int or tuple of int
+        Odd size of the neighborhood, in pixels.
+    method : str
+        ``'gaussian'`` or ``'mean'``. The ``'skimage'`` backend also accepts
+        ``'median'`` and ``'generic'``.
+    offset : float
+        Subtracted from the local average.
+    mode : str
+        Border handling, as in ``scipy.ndimage``. Default = ``'reflect'``.
+    param : float
+        Standard deviation for ``method='gaussian'``. Default = ``None``, which
+        uses ``(block_size - 1) / 6``.
+    cval : float
+        Value outside the image with ``mode='constant'``.
+    backend : str
+        - ``'skimage'`` (default): ``skimage.filters.threshold_local``.
+        - ``'integral'``: box filters from running sums, so the cost doesn't grow
+          with ``block_size``. Exact for ``'mean'``, three box filters for
+          ``'gaussian'``.
+        - ``'downsample'``: computes the surface at ``1/factor`` resolution and
+          interpolates it back up. Least accurate within a block of the edges.
+    factor : int
+        Downsampling factor for ``backend='downsample'``. Default = ``None``, which
+        uses a third of the Gaussian standard deviation.
+
+    Returns
+    -------
+    A float ndarray, the threshold for each pixel. Pixels brighter than it are
+    foreground.
+
+    See Also
+    --------
+    ``skimage.filters.threshold_local``, ``pyroots.benchmark_threshold_local``
+    """
+    if backend == 'skimage':
+        return(filters.threshold_local(image, block_size, method=method, offset=offset,
+                                       mode=mode, param=param, cval=cval))
+
+    if method not in ('gaussian', 'mean'):
+        raise ValueError("The '{}' backend supports methods 'gaussian' and 'mean'.".format(backend))
+    if np.isscalar(block_size):
+        block_size = (block_size,) * image.ndim
+    if any(b % 2 == 0 for b in block_size):
+        raise ValueError("block_size must be odd! Given block_size {}.".format(block_size))
+
+    if param is None:
+        sigma = [(b - 1) / 6.0 for b in block_size]
+    elif np.isscalar(param):
+        sigma = [param] * image.ndim
+    else:
+        sigma = list(param)
+
+    image = np.asarray(image, dtype=np.float64)
+    if backend == 'integral':
+        surface = _integral_surface(image, block_size, method, sigma, mode, cval)
+    elif backend == 'downsample':
+        surface = _downsampled_surface(image, block_size, method, sigma, mode, cval, factor)
+    else:
+        raise ValueError("Didn't recognize backend '{}'.".format(backend))
+
+    return(surface - offset)
@@ -6,15 +6,168 @@ Created: August 6th, 2017
 
 
 Contents:
+_neighborhood_test - Supports neighborhood_filter, for a single object
+_label_runs - Horizontal runs of each label
+_directional_bands - Neighborhoods of every object in each direction, at once
+_near_label - Supports neighborhood_filter, for gaps shared by several objects
+_band_components - 4-connected components within each object's neighborhood
 neighborhod_filter - Filters candidate objects based on pixels near them
 """
 
-from scipy import ndimage
+from scipy import ndimage, sparse
+from scipy.sparse import csgraph
 import numpy as np
-from skimage import img_as_float, measure, morphology, color
-from pyroots.image_manipulation import img_split
+import cv2
+from skimage import img_as_float, measure, morphology
+from pyroots.image_manipulation import _colorspace_band
+from pyroots.object_executor import map_objects
+from pyroots.component_stats import component_stats, _grouped_median
 
-def neighborhood_filter(image, objects, max_diff=0.1, gap=4, neighborhood_depth=4, colorspace='rgb', band=2, return_band=False):
+def _neighborhood_test(obj_slice, img_slice, max_diff, gap, its, kernel_ls):
+    """
+    Does a single object pass ``pyroots.neighborhood_filter``? ``obj_slice`` is
+    the object and ``img_slice`` the image, cropped with enough room for the
+    gap and neighborhood.
+    """
+    ########################
+    ### Local expansion ####
+    ########################
+    expanded = ~morphology.binary_dilation(obj_slice, morphology.disk(gap))
+
+    nb_ls = []
+    median = []
+    area = []
+    for k in range(4):
+        t = obj_slice.copy()
+        for i in range(its):
+            t = ndimage.convolve(t, kernel_ls[k])
+        nb_ls.append(t * expanded)
+        
+    ###############################
+    #### Select largest object ####
+    ###############################
+        nb_labels, nb_labels_ls = ndimage.label(nb_ls[k])
+        nb_areas = [0] + [i['area'] for i in measure.regionprops(nb_labels)]  # regionprops skips index 0, annoyingly
+        if len(nb_areas) == 1:
+            nb_areas = nb_areas + [0]
+        max_area = np.max(nb_areas)
+        nb_areas = nb_areas == max_area  # sometimes (rarely) more than one subregion will have the same (max) area.
+        nb_ls[k] = nb_areas[nb_labels]
+        area.append(max_area)
+        
+    ##############################################
+    #### Find median values of largest object ####
+    ##############################################
+        masked = np.ma.masked_array(img_slice, ~nb_ls[k]).compressed()
+        median.append(np.median(masked))
+
+    ###############################################
+    #### Calc difference (left-right, up-down) ####
+    ###############################################
+    area = area == np.max(area)
+    if area[0] or area[1]:
+        diff = np.abs(median[0] - median[1])
+    else:
+        diff = np.abs(median[2] - median[3])
+    
+    ###################################
+    #### Test if exceeds threshold ####
+    ##################################
+    return(diff < max_diff)
+
+
+def _label_runs(labels):
+    """
+    Horizontal runs of each label in ``labels``, as four arrays: row, first
+    column, last column, and label.
+    """
+    padded = np.pad(labels, ((0, 0), (1, 1)), mode='constant')
+    inside = padded[:, 1:-1]
+    first = (inside > 0) & (inside != padded[:, :-2])
+    last = (inside > 0) & (inside != padded[:, 2:])
+    rows, start = np.nonzero(first)
+    end = np.nonzero(last)[1]  # same raster order as the starts
+    return(rows, start, end, inside[rows, start])
+
+
+def _directional_bands(labels, reach):
+    """
+    Pixels within ``reach`` pixels to the left, right, above and below each
+    object, in the same row or column, including the object itself. This is
+    what ``reach/2`` passes of the directional kernels in ``_neighborhood_test``
+    give for a single object. Objects can share pixels, so each band is a
+    sorted array of unique ``label * labels.size + flat index`` keys.
+    """
+    rows, cols = labels.shape
+    size = rows * cols
+    horizontal = _label_runs(labels)
+    vertical = _label_runs(labels.T)
+
+    out = []
+    for k in range(4):
+        line, start, end, lab = horizontal if k < 2 else vertical
+        length = cols if k < 2 else rows
+        if k % 2 == 0:  # left, up
+            start = np.maximum(start - reach, 0)
+        else:  # right, down
+            end = np.minimum(end + reach, length - 1)
+
+        # expand each run to its pixels
+        n = end - start + 1
+        run = np.repeat(np.arange(len(n)), n)
+        pos = start[run] + np.arange(run.size) - np.repeat(np.cumsum(n) - n, n)
+        if k < 2:
+            pixel = line[run] * cols + pos
+        else:
+            pixel = pos * cols + line[run]
+        out.append(np.unique(lab[run].astype(np.int64) * size + pixel))
+    return(out)
+
+
+def _near_label(labels, pixel, lab, offsets):
+    """
+    Is there a pixel labelled ``lab`` at any of ``offsets`` (row, col) from each
+    flat ``pixel`` index? For pixels with more than one object nearby.
+    """
+    rows, cols = labels.shape
+    r, c = np.divmod(pixel, cols)
+    out = np.zeros(pixel.size, dtype=bool)
+    for dr, dc in offsets:
+        rr = r + dr
+        cc = c + dc
+        inside = (rr >= 0) & (rr < rows) & (cc >= 0) & (cc < cols)
+        found = np.zeros(pixel.size, dtype=bool)
+        found[inside] = labels[rr[inside], cc[inside]] == lab[inside]
+        out |= found
+    return(out)
+
+
+def _band_components(keys, shape):
+    """
+    Size of the 4-connected component each key from ``_directional_bands``
+    belongs to. Only pixels of the same object are connected.
+    """
+    size = shape[0] * shape[1]
+    cols = shape[1]
+    pixel = keys % size
+    last = keys.size - 1
+
+    # right neighbor is the next key, unless at the end of the row
+    right = np.nonzero((keys[1:] - keys[:-1] == 1) & (pixel[:-1] % cols != cols - 1))[0]
+    # down neighbor, unless on the last row
+    pos = np.searchsorted(keys, keys + cols)
+    down = (keys[np.minimum(pos, last)] == keys + cols) & (pixel + cols < size)
+
+    first = np.concatenate([right, np.nonzero(down)[0]])
+    second = np.concatenate([right + 1, pos[down]])
+    graph = sparse.coo_matrix((np.ones(first.size, dtype=np.int8), (first, second)),
+                              shape=(keys.size, keys.size))
+    component = csgraph.connected_components(graph, directed=False)[1]
+    return(np.bincount(component)[component])
+
+
+def neighborhood_filter(image, objects, max_diff=0.1, gap=4, neighborhood_depth=4, colorspace='rgb', band=2, return_band=False, stats=None,
+                        whole_image=True, threads=1, processes=False, cache=None):
     """
     Calculate difference between values on either side of a long, skinny object.
     
@@ -50,6 +203,21 @@ def neighborhood_filter(image, objects, max_diff=0.1, gap=4, neighborhood_depth=
         Band index for colorspace. Ex. in RGB R=0, G=1, B=2. Ignored if `image` is 1-band. 
     return_band : bool
         Return the colorspace band as well? For diagnostics. 
+    stats : dict
+        Output of ``pyroots.component_stats(objects)``. Reuses its labels and bounding
+        boxes instead of labelling `objects` again. Default = ``None``.
+    whole_image : bool
+        Find the neighborhoods and their medians for all objects at once, rather
+        than one object at a time. Same decisions. Objects within the neighborhood
+        depth of the image edge, or with an empty neighborhood, are still done one
+        at a time. Default = ``True``.
+    threads : int
+        Number of workers to process objects in parallel, for those done one at a time.
+        See `pyroots.map_objects`. Default = 1.
+    processes : bool
+        Use processes rather than threads? Default = ``False``.
+    cache : pyroots.ColorspaceCache
+        Conversions of `image` to reuse. Default = ``None``, which converts `image` again.
         
     Returns
     -------
@@ -57,19 +225,13 @@ def neighborhood_filter(image, objects, max_diff=0.1, gap=4, neighborhood_depth=
         
     
     """
-    if colorspace.lower() is 'grey':
-        colorspace = 'gray'
     if len(image.shape) == 3:
-        if colorspace.lower() != 'rgb':
-            image = getattr(color, 'rgb2' + colorspace)(image)
-        if len(image.shape) == 3:
-            image = img_split(image)[band]
+        image = _colorspace_band(image, colorspace, band, cache)
     
     image = img_as_float(image)
     its = int((neighborhood_depth+2)/2)
     gap = int(gap)
     total_dilation = 2*its
-    dims = image.shape
 
     # neighborhood expansion kernels
     kernel_ls = [np.array([[0, 0, 0, 0, 0], [1, 1, 1, 0, 0], [0, 0, 0, 0, 0]]),      # left
@@ -78,74 +240,86 @@ def neighborhood_filter(image, objects, max_diff=0.1, gap=4, neighborhood_depth=
                  np.array([[0, 0, 0], [0, 0, 0], [0, 1, 0], [0, 1, 0], [0, 1, 0]])   # down
                 ]
 
-    labels, labels_ls = ndimage.label(objects)
-    props = measure.regionprops(labels)
-
-    decision_ls = [False]
-    for i in range(1, labels_ls+1):
-        ###############
-        #### Slice ####
-        ###############
-        # Bounds of slice to only the object of interest
-        # include a gap. Stay within bounds of image.
-        a, b, c, d = props[i-1].bbox
-        a = max(a - total_dilation, 0)  
-        b = max(b - total_dilation, 0)
-        c = min(c + total_dilation, dims[1])
-        d = min(d + total_dilation, dims[0])
-        
-        # slice
-        obj_slice = labels[a:c, b:d] == i
-        img_slice = image[a:c, b:d]
-        
-        ########################
-        ### Local expansion ####
-        ########################
-        expanded = ~morphology.binary_dilation(obj_slice, morphology.disk(gap))
-
-        nb_ls = []
-        median = []
-        area = []
-        for k in range(4):
-            t = obj_slice.copy()
-            for i in range(its):
-                t = ndimage.convolve(t, kernel_ls[k])
-            nb_ls.append(t * expanded)
-            
-        ###############################
-        #### Select largest object ####
-        ###############################
-            nb_labels, nb_labels_ls = ndimage.label(nb_ls[k])
-            nb_areas = [0] + [i['area'] for i in measure.regionprops(nb_labels)]  # regionprops skips index 0, annoyingly
-            if len(nb_areas) == 1:
-                nb_areas = nb_areas + [0]
-            max_area = np.max(nb_areas)
-            nb_areas = nb_areas == max_area  # sometimes (rarely) more than one subregion will have the same (max) area.
-            nb_ls[k] = nb_areas[nb_labels]
-            area.append(max_area)
-            
-        ##############################################
-        #### Find median values of largest object ####
-        ##############################################
-            masked = np.ma.masked_array(img_slice, ~nb_ls[k]).compressed()
-            median.append(np.median(masked))
-
-        ###############################################
-        #### Calc difference (left-right, up-down) ####
-        ###############################################
-        area = area == np.max(area)
-        if area[0] or area[1]:
-            diff = np.abs(median[0] - median[1])
+    if stats is None:
+        stats = component_stats(objects)
+    labels, bbox = stats["labels"], stats["bbox"]
+
+    if whole_image is True and stats["count"] > 0:
+        rows, cols = labels.shape
+        size = labels.size
+
+        # Objects within reach of the edge: the crops are clipped, and the kernels
+        # reflect off the crop edge. Do these one at a time.
+        alone = np.ones(stats["count"] + 1, dtype=bool)
+        alone[0] = False
+        alone &= (bbox[:, 0] >= total_dilation) & (bbox[:, 1] >= total_dilation)
+        alone &= (bbox[:, 2] + total_dilation <= rows) & (bbox[:, 3] + total_dilation <= cols)
+
+        # Smallest and largest label within `gap` of each pixel. Where only one
+        # label is near, the gap around each object is exact. Otherwise look.
+        footprint = morphology.disk(gap).astype(np.uint8)
+        high = cv2.dilate(labels.astype(np.float64), footprint).ravel()
+        low = labels.astype(np.float64)
+        low[labels == 0] = np.inf
+        low = cv2.erode(low, footprint).ravel()
+        offsets = np.transpose(np.nonzero(footprint)) - gap
+
+        values = image.ravel()
+        area = np.zeros((4, stats["count"] + 1), dtype=np.int64)
+        median = np.zeros((4, stats["count"] + 1))
+        for k, keys in enumerate(_directional_bands(labels, total_dilation)):
+            # remove the gap
+            lab = keys // size
+            pixel = keys % size
+            near = high[pixel] > 0
+            in_gap = near & ((low[pixel] == lab) | (high[pixel] == lab))
+            unsure = np.nonzero(near & (low[pixel] < lab) & (lab < high[pixel]))[0]
+            in_gap[unsure] = _near_label(labels, pixel[unsure], lab[unsure], offsets)
+            keys = keys[~in_gap]
+            if keys.size == 0:
+                continue
+
+            # largest component(s) of each neighborhood
+            lab = keys // size
+            pixel = keys % size
+            component = _band_components(keys, labels.shape)
+            present, first = np.unique(lab, return_index=True)
+            area[k, present] = np.maximum.reduceat(component, first)
+            largest = component == area[k, lab]
+
+            median[k] = _grouped_median(lab[largest], values[pixel[largest]],
+                                        size=stats["count"] + 1)
+
+        # Empty neighborhoods use the whole crop. If all are empty, the difference
+        # is 0. Otherwise, do these one at a time.
+        empty = area == 0
+        all_empty = np.all(empty, axis=0)
+        alone &= all_empty | ~np.any(empty, axis=0)
+
+        area = area == np.max(area, axis=0)
+        diff = np.where(area[0] | area[1],
+                        np.abs(median[0] - median[1]),
+                        np.abs(median[2] - median[3]))
+        diff[all_empty] = 0
+        decisions = alone & (diff < max_diff)
+        objects_left = np.nonzero(~alone)[0][1:]
+    else:
+        decisions = np.zeros(stats["count"] + 1, dtype=bool)
+        objects_left = None
+
+    # Slice each object, including the gap and neighborhood
+    if objects_left is None or len(objects_left) > 0:
+        one_at_a_time = map_objects(_neighborhood_test, labels, images=[image],
+                                    objects=objects_left, pad=total_dilation, bbox=bbox,
+                                    threads=threads, processes=processes,
+                                    max_diff=max_diff, gap=gap, its=its, kernel_ls=kernel_ls)
+        if objects_left is None:
+            decisions = one_at_a_time
         else:
-            diff = np.abs(median[2] - median[3])
-        
-        ###################################
-        #### Test if exceeds threshold ####
-        ##################################
-        diff = diff < max_diff
-        decision_ls.append(diff)
-        
-    out = np.array(decision_ls)[labels]
+            decisions[objects_left] = one_at_a_time[objects_left]
+    decisions[0] = False  # background
+    
+    out = decisions[labels]
     
     if return_band:
         out = [out, image]
@@ -14,7 +14,10 @@ Various methods for filtering and cleaning up candidate objects.
 from scipy import ndimage
 from skimage import morphology, filters, color, img_as_float
 import numpy as np
-from pyroots.image_manipulation import img_split
+from pyroots.image_manipulation import img_split, _colorspace_pixels
+from pyroots.component_stats import select_objects
+from pyroots.binary_morphology import binary_majority
+from pyroots import backends
 
 
 #########################################################################################################################
@@ -58,7 +61,42 @@ def _in_range(image, low, high):
     return(out)
 
 
-def grayscale_filter(image, objects, low, high, percent, invert=False):
+def _object_pixels(objects, stats=None):
+    """
+    Labels of `objects`, flat indices of object pixels and their labels, and
+    object areas. Supports `grayscale_filter` and `color_filter`, which only look
+    at object pixels.
+    """
+    if stats is None:
+        labels = ndimage.label(objects)[0]
+        index = np.flatnonzero(labels)
+        pixel_labels = labels.reshape(-1)[index]
+        area = np.bincount(pixel_labels, minlength=labels.max()+1)
+    else:
+        labels = stats["labels"]
+        index = np.flatnonzero(labels)
+        pixel_labels = labels.reshape(-1)[index]
+        area = stats["area"]
+    return(labels, index, pixel_labels, area)
+
+
+def _range_test(values, pixel_labels, area, low, high, percent):
+    """
+    Does each object have at least `percent` of its pixel `values` in (low:high)?
+    Returns a boolean lookup table of labels. Supports `grayscale_filter` and
+    `color_filter`.
+    """
+    in_range_area = np.bincount(pixel_labels, weights=_in_range(values, low, high),
+                                minlength=len(area))
+
+    test = np.zeros(len(area), dtype=bool)
+    present = area > 0
+    test[present] = in_range_area[present]/area[present] >= percent/100
+    test[0] = False  # background
+    return(test)
+
+
+def grayscale_filter(image, objects, low, high, percent, invert=False, stats=None):
     """
     Determines whether each object in `objects` has values within the range given
     in `image`. Handles polar spaces by automatically 'rotating' and restacking the
@@ -78,38 +116,35 @@ def grayscale_filter(image, objects, low, high, percent, invert=False):
         percent of pixels that must be within (low:high). [0, 100].
     invert : bool
         Are you selecting objects that you don't want to keep?
+    stats : dict
+        Output of ``pyroots.component_stats(objects)``. Reuses its labels and
+        areas instead of labelling ``objects`` again. Default = ``None``.
 
     Returns
     -------
     An updated objects image.
     """
-    labels = ndimage.label(objects)[0]
-
-    # Calculate area of objects
-    binary_area = ndimage.sum(objects, labels=labels, index=range(labels.max()+1))
+    labels, index, pixel_labels, binary_area = _object_pixels(objects, stats)
 
-    # Calculate number of pixels in range for each object
-    in_range = _in_range(image, low, high)      # flag image pixel values
-    in_range_area = ndimage.sum(in_range, labels=labels, index=range(labels.max()+1))
-       # Calculate area of in-range pixels for each object
-
-    # Do percentage of pixels in range meet threshold?
-    test = in_range_area/binary_area >= percent/100
-    test[0] = False  # background
+    # Calculate number of pixels in range for each object, from object pixels only
+    values = np.asarray(image).reshape(-1)[index]
+    test = _range_test(values, pixel_labels, binary_area, low, high, percent)
 
     # update objects
-    out_objects = np.array(test)[labels]
+    out_objects = test[labels]
 
     if invert is True:
         out_objects = ~out_objects
 
     return(out_objects)
 
-def color_filter(image, objects, colorspace, target_band, low, high, percent, invert=False):
+def color_filter(image, objects, colorspace, target_band, low, high, percent, invert=False, stats=None, cache=None):
     """
     Wrapper for `pyroots.grayscale_filter`. Adds functionality to (optionally) convert an rgb image to
     a selected colorspace, and choose a single band from that colorspace. Tests whether `percent` of pixels
     in each object in `objects` fall into (low:high) of `colorspace`[target_band] in `image`.
+    Only object pixels are converted, so the time taken scales with the area of the objects
+    rather than the image.
 
     Parameters
     ----------
@@ -129,22 +164,29 @@ def color_filter(image, objects, colorspace, target_band, low, high, percent, in
         Percent of pixels that must be within (low:high). [0, 100].
     invert : bool
         Are you selecting objects that you don't want to keep?
+    stats : dict
+        Output of ``pyroots.component_stats(objects)``. Passed to
+        ``pyroots.grayscale_filter``. Default = ``None``.
+    cache : pyroots.ColorspaceCache
+        Conversions of `image` to reuse, if it already holds `colorspace`. Also sets
+        whether to use lookup tables. Default = ``None``, which converts object pixels.
 
     Returns
     -------
     An updated boolean ndarray of candidate objects. objects.
 
     """
-    # convert rgb image if necessary, select band.
-    if colorspace.lower() !='rgb':
-        colorband = getattr(color, "rgb2" + colorspace.lower())(image)
-    else:
-        colorband = image.copy()
+    labels, index, pixel_labels, binary_area = _object_pixels(objects, stats)
 
-    colorband = img_split(colorband)[target_band]
+    # convert object pixels if necessary, select band.
+    values = _colorspace_pixels(image, colorspace, target_band, index, cache)
 
     # Filter color
-    out = grayscale_filter(colorband, objects, low, high, percent, invert)
+    test = _range_test(values, pixel_labels, binary_area, low, high, percent)
+    out = test[labels]
+
+    if invert is True:
+        out = ~out
 
     return(out)
 
@@ -197,7 +239,9 @@ def noise_removal(img, radius_1=1, radius_2=2, median_iterations=3):
     See Also
     --------
     In ``scipy.ndimage``, see ``skimage.morphology.binary_opening``,
-    ``skimage.morphology.binary_closing``, and ``skimage.filters.median``
+    ``skimage.morphology.binary_closing``, and ``skimage.filters.median``.
+    Boolean images use ``pyroots.binary_majority``, which gives the same result
+    as the median filter.
 
     """
 
@@ -211,13 +255,16 @@ def noise_removal(img, radius_1=1, radius_2=2, median_iterations=3):
     else:
         ELEMENT_2 = structure_2
 
-    out = morphology.binary_opening(img, selem=ELEMENT_1)
-    out = morphology.binary_closing(out, selem=ELEMENT_1)
+    out = backends.binary_opening(img, ELEMENT_1)
+    out = backends.binary_closing(out, ELEMENT_1)
 
-    i = 0
-    while i < median_iterations:
-        out = filters.median(out, selem=ELEMENT_2)
-        i += 1
+    if out.dtype == bool:  # median of a binary image is a majority vote
+        out = binary_majority(out, ELEMENT_2, iterations=median_iterations)
+    else:
+        i = 0
+        while i < median_iterations:
+            out = backends.median(out, ELEMENT_2)
+            i += 1
 
     return(out)
 
@@ -230,7 +277,7 @@ def noise_removal(img, radius_1=1, radius_2=2, median_iterations=3):
 #########################################################################################################################
 #########################################################################################################################
 
-def dirt_removal(img, method="gaussian", param=5):
+def dirt_removal(img, method="gaussian", param=5, stats=None):
     """
     Removes objects based on size. Uses either a statistical (gaussian)
     cutoff based on the attributes of all objects in the image, or a threshold
@@ -249,14 +296,21 @@ def dirt_removal(img, method="gaussian", param=5):
         of standard deviations larger than the median area as the cutoff, above
         which objects are considered 'real'. For ``method="threshold"``, ``param``
         identifies the minimum size in pixels. Default = 5
+    stats : dict
+        Output of ``pyroots.component_stats(img)``. Reuses its labels and areas
+        instead of labelling ``img`` again. Default = ``None``.
 
     Returns
     --------
     A binary image
     """
 
-    labels, labels_ls = ndimage.label(img)
-    area = ndimage.sum(img, labels=labels, index=range(labels_ls))
+    if stats is None:
+        labels, labels_ls = ndimage.label(img)
+        area = ndimage.sum(img, labels=labels, index=range(labels_ls))
+    else:
+        labels, labels_ls = stats["labels"], stats["count"]
+        area = stats["area"][:labels_ls]
 
     if method is "gaussian": #ID 'real' objects
         area_filt = area > np.median(area) + param*np.std(area)
@@ -265,9 +319,8 @@ def dirt_removal(img, method="gaussian", param=5):
     else:
         print("method should be 'gaussian' or 'threshold'!")
 
-    keep_ID = [i for i, x in enumerate(area_filt) if x == True] #Select labels of 'real' objects
-    filt = np.in1d(labels, keep_ID) #reshape to image size
-    filt = np.reshape(filt, img.shape)
+    keep_ID = np.nonzero(area_filt)[0] #Select labels of 'real' objects
+    filt = select_objects(labels, keep_ID, count=labels_ls)
     return(filt)
 
 
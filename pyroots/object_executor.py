@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: pme
+
+Run a function on a padded crop around each object in a labelled image, in
+parallel, and collect the results as a lookup table indexed by label. Used by
+filters that have to look at objects one at a time, like ``hollow_filter`` and
+``neighborhood_filter``.
+
+Contents:
+- object_slices
+- _run_batch
+- map_objects
+"""
+
+import numpy as np
+from scipy import ndimage
+from multiprocessing import Pool
+from multiprocessing.dummy import Pool as ThreadPool
+
+
+def object_slices(labels, pad=0, bbox=None):
+    """
+    Slices of a padded bounding box around every object in ``labels``, clipped
+    to the image.
+
+    Parameters
+    ----------
+    labels : array
+        Output of ``ndimage.label``.
+    pad : int
+        Pixels to add on each side of the bounding box.
+    bbox : array
+        (min_row, min_col, max_row, max_col) of each label, as in the output of
+        ``pyroots.component_stats``. If ``None``, uses ``ndimage.find_objects``.
+
+    Returns
+    -------
+    A list with a (row slice, column slice) tuple for each label, including 0
+    (background, ``None``). Labels that aren't in the image are also ``None``.
+    """
+    rows, cols = labels.shape[:2]
+    if bbox is None:
+        slices = [None] + ndimage.find_objects(labels)
+        bbox = [(i[0].start, i[1].start, i[0].stop, i[1].stop) if i is not None else None
+                for i in slices]
+    else:
+        bbox = [None] + [tuple(i) for i in bbox[1:]]
+
+    out = []
+    for i in bbox:
+        if i is None or i[2] <= i[0]:  # missing, or empty
+            out.append(None)
+        else:
+            a, b, c, d = i
+            out.append((slice(max(a - pad, 0), min(c + pad, rows)),
+                        slice(max(b - pad, 0), min(d + pad, cols))))
+    return(out)
+
+
+def _run_batch(task):
+    """
+    Call a function on each object crop in a batch. Supports
+    ``pyroots.map_objects``. Module level so process pools can pickle it.
+    """
+    fn, batch, kwargs = task
+    out = []
+    for label, label_crop, image_crops in batch:
+        out.append(fn(label_crop == label, *image_crops, **kwargs))
+    return(out)
+
+
+def map_objects(fn, labels, images=(), objects=None, pad=0, bbox=None,
+                threads=1, processes=False, batch_pixels=2**18,
+                dtype=bool, **kwargs):
+    """
+    Call ``fn`` on a crop around each object, optionally in parallel, and return
+    the results as a lookup table of labels. For example, ``out[labels]`` makes
+    an image from boolean decisions.
+
+    Parameters
+    ----------
+    fn : function
+        Called as ``fn(object_crop, *image_crops, **kwargs)``, where
+        ``object_crop`` is a boolean crop of a single object and ``image_crops``
+        are the same crop of each array in ``images``. Returns a single value.
+        With ``processes=True``, it must be defined at the top level of a module.
+    labels : array
+        Output of ``ndimage.label``.
+    images : list or tuple of arrays
+        Other images to crop and pass to ``fn``, such as the image the objects
+        were found in. Same shape as ``labels`` in the first two dimensions.
+    objects : list of int
+        Labels to process. Default = ``None``, which is all of them.
+    pad : int
+        Pixels to add around the bounding box of each object.
+    bbox : array
+        Bounding boxes from ``pyroots.component_stats``. Saves a pass over the
+        image. Default = ``None``.
+    threads : int
+        Number of workers. Default = 1, which runs in this thread without a pool.
+    processes : bool
+        Use a pool of processes instead of threads? Worth it when ``fn`` holds
+        the GIL (e.g. most ``skimage.morphology`` functions), at the cost of
+        copying crops to the workers. Default = ``False``.
+    batch_pixels : int
+        Small objects are sent to workers in batches of about this many crop
+        pixels, so each task isn't dominated by overhead. Default = 2**18.
+    dtype : numpy dtype
+        Of the output. Labels that aren't processed are 0 (``False``).
+    **kwargs : dict
+        Passed on to ``fn``.
+
+    Returns
+    -------
+    An array of ``fn`` outputs, indexed by label. Length is ``labels.max() + 1``.
+
+    See Also
+    --------
+    ``scipy.ndimage.find_objects``, ``multiprocessing.dummy.Pool``,
+    ``multiprocessing.Pool``
+    """
+    slices = object_slices(labels, pad, bbox)
+    out = np.zeros(len(slices), dtype=dtype)
+
+    if objects is None:
+        objects = range(1, len(slices))
+    objects = [i for i in objects if slices[i] is not None]
+    if len(objects) == 0:
+        return(out)
+
+    # Batches of similar size. Big objects get a batch of their own.
+    sizes = [(slices[i][0].stop - slices[i][0].start) * (slices[i][1].stop - slices[i][1].start)
+             for i in objects]
+    if threads > 1:
+        # at least a few tasks per worker, to balance the load
+        batch_pixels = min(batch_pixels, sum(sizes) // (4*threads) + 1)
+
+    batches = [[]]
+    batch_labels = [[]]
+    total = 0
+    for i, size in zip(objects, sizes):
+        if total > 0 and total + size > batch_pixels:
+            batches.append([])
+            batch_labels.append([])
+            total = 0
+        sl = slices[i]
+        batches[-1].append((i, labels[sl], [img[sl] for img in images]))
+        batch_labels[-1].append(i)
+        total += size
+
+    tasks = [(fn, batch, kwargs) for batch in batches]
+    if threads > 1:
+        if processes is True:
+            pool = Pool(threads)
+        else:
+            pool = ThreadPool(threads)
+        results = pool.map(_run_batch, tasks, chunksize=1)
+        pool.close()
+        pool.join()
+    else:
+        results = [_run_batch(task) for task in tasks]
+
+    # scatter back to the lookup table
+    for ids, result in zip(batch_labels, results):
+        out[ids] = result
+
+    return(out)
@@ -11,6 +11,7 @@ Contents:
 import numpy as np
 from skimage import filters, img_as_ubyte, exposure, color, morphology
 from pyroots import img_split, _center_image, draw_mask
+from pyroots import smoothing
 import cv2
 from warnings import warn
 import colour
@@ -334,7 +335,7 @@ def preprocessing_filters(image,
         pass
 
     try:
-        contrast = ~exposure.is_low_contrast(filters.gaussian(image, sigma=10, multichannel=True), **low_contrast_params)
+        contrast = ~exposure.is_low_contrast(smoothing.gaussian(image, 10, multichannel=True), **low_contrast_params)
     except:
         contrast = True
         if low_contrast_params is not None:
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: pme
+
+Compact graph of the medial axis. Skeleton pixels are grouped into nodes
+(endpoints, junctions and isolated pixels) and branches (runs of pixels
+with exactly two neighbors between nodes). Each table has one row per node
+or branch, so downstream filters and summaries can work on a few thousand
+records instead of the full image.
+
+Contents:
+- _skeleton_edges
+- _skeleton_labels
+- skeleton_graph
+- graph_geometry
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import ndimage
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+
+def _skeleton_edges(rows, cols, shape):
+    """
+    Pairs of 8-connected skeleton pixels, each pair listed once.
+
+    Parameters
+    ----------
+    rows, cols : array
+        Coordinates of skeleton pixels, for example from ``np.nonzero``.
+    shape : tuple
+        Shape of the image.
+
+    Returns
+    -------
+    Two integer arrays, indexing ``rows`` and ``cols``, of the first and
+    second pixel in each pair.
+    """
+    width = shape[1] + 2  # padded, so neighbors never wrap to the next row
+    index = (np.asarray(rows, dtype=np.int64) + 1) * width + np.asarray(cols) + 1
+    order = np.argsort(index, kind='mergesort')
+    index = index[order]
+
+    first = []
+    second = []
+    if len(index) > 1:
+        # right neighbor is the next pixel in the sorted index
+        right = np.nonzero(index[1:] - index[:-1] == 1)[0]
+        first.append(right)
+        second.append(right + 1)
+
+        # down-left, down, down-right
+        last = len(index) - 1
+        pos = np.searchsorted(index, index + width - 1)
+        for offset in (-1, 0, 1):
+            found = index[np.minimum(pos, last)] == (index + width + offset)
+            first.append(np.nonzero(found)[0])
+            second.append(pos[found])
+            pos += found
+
+    if len(first) == 0:
+        return(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    first = order[np.concatenate(first)]
+    second = order[np.concatenate(second)]
+    return(first, second)
+
+
+def _skeleton_labels(rows, cols, shape):
+    """
+    Label 8-connected skeleton pixels from their coordinates. Same numbering
+    as ``ndimage.label`` with a 3x3 square structure if ``rows`` and ``cols``
+    are in raster order (as from ``np.nonzero``).
+
+    Returns
+    -------
+    An array of labels, starting at 1, in the same order as ``rows``.
+    """
+    npix = len(rows)
+    first, second = _skeleton_edges(rows, cols, shape)
+    graph = coo_matrix((np.ones(len(first)), (first, second)), shape=(npix, npix))
+    out = connected_components(graph, directed=False)[1] + 1
+    return(out)
+
+
+def skeleton_graph(skeleton_dictionary, labels=None):
+    """
+    Build a graph of nodes and branches from a medial axis, for example the
+    output of ``pyroots.skeleton_with_distance``.
+
+    Nodes are skeleton pixels that do not have exactly two neighbors:
+    endpoints (one neighbor), isolated pixels (none) and junctions (three or
+    more). Touching junction pixels are merged into a single node. Branches are
+    runs of two-neighbor pixels between nodes, plus direct links between
+    neighboring nodes (branches with no pixels of their own). Closed loops with
+    no nodes are branches with no nodes (``-1``).
+
+    The length of a node is split evenly among the branches that touch it, so
+    the sum of branch lengths plus the length of nodes that touch no branches
+    equals the total skeleton length.
+
+    Parameters
+    ----------
+    skeleton_dictionary : dict
+        Standard dictionary of objects returned from ``pyroots.skeleton_with_distance``.
+        Uses:
+            * "objects", a binary image of objects
+            * "length", an ndarray of medial axis, with each pixel representing length
+            * "diameter", an ndarray of medial axis, with each pixel representing diameter
+            or, if sparse,
+            * "skeleton", a ``pandas.DataFrame`` of medial axis pixels.
+    labels : array
+        Labels of ``skeleton_dictionary["objects"]``, if already available.
+        Default = ``None``, which calls ``ndimage.label``.
+
+    Returns
+    -------
+    A dictionary containing:
+    1. "nodes" : a ``pandas.DataFrame`` with one row per node. Columns are
+       Node, Object, Row, Col (mean of the node's pixels), Pixels, Degree
+       (number of branch ends), Type ("endpoint", "junction", or "isolated"),
+       Length, and Diameter (mean).
+    2. "branches" : a ``pandas.DataFrame`` with one row per branch. Columns
+       are Branch, Object, Node1, Node2, Start, Stop, Pixels, Length,
+       Diameter (mean), MinDiameter, and MaxDiameter. Start and Stop index the
+       branch's pixels in "pixels".
+    3. "pixels" : a ``pandas.DataFrame`` of the branch pixels, sorted by
+       branch, with columns Row, Col, Length and Diameter.
+    4. "shape" : the shape of the image.
+
+    See Also
+    --------
+    ``pyroots.graph_geometry``, ``pyroots.skeleton_with_distance``
+    """
+    if labels is None:
+        labels = ndimage.label(skeleton_dictionary["objects"])[0]
+
+    if "skeleton" in skeleton_dictionary:  # sparse
+        skeleton = skeleton_dictionary["skeleton"]
+        shape = skeleton_dictionary["objects"].shape
+        rows = skeleton["Row"].values
+        cols = skeleton["Col"].values
+        length = skeleton["Length"].values.astype(np.float64)
+        diameter = skeleton["Diameter"].values.astype(np.float64)
+    else:
+        length_img = skeleton_dictionary["length"]
+        shape = length_img.shape
+        rows, cols = np.nonzero(length_img)
+        length = length_img[rows, cols]
+        diameter = skeleton_dictionary["diameter"][rows, cols]
+    npix = len(rows)
+    objects = labels[rows, cols]
+
+    # Neighboring pixels, within the same object only. Objects are
+    # 4-connected, so skeletons of separate objects can touch diagonally.
+    first, second = _skeleton_edges(rows, cols, shape)
+    same = objects[first] == objects[second]
+    first = first[same]
+    second = second[same]
+
+    degree = np.bincount(first, minlength=npix) + np.bincount(second, minlength=npix)
+    chain = degree == 2
+
+    #### Nodes: merge touching junction pixels ####
+    both_junction = (degree[first] > 2) & (degree[second] > 2)
+    graph = coo_matrix((np.ones(both_junction.sum()),
+                        (first[both_junction], second[both_junction])),
+                       shape=(npix, npix))
+    pixel_node = connected_components(graph, directed=False)[1]
+    pixel_node[chain] = -1
+    is_node = ~chain
+    node_ids, pixel_node[is_node] = np.unique(pixel_node[is_node], return_inverse=True)
+    nnodes = len(node_ids)
+
+    #### Branches: runs of two-neighbor pixels ####
+    both_chain = chain[first] & chain[second]
+    graph = coo_matrix((np.ones(both_chain.sum()),
+                        (first[both_chain], second[both_chain])),
+                       shape=(npix, npix))
+    pixel_chain = connected_components(graph, directed=False)[1]
+    pixel_chain[~chain] = -1
+    chain_ids, pixel_chain[chain] = np.unique(pixel_chain[chain], return_inverse=True)
+    nchains = len(chain_ids)
+
+    # Each run touches two nodes (or none, for closed loops)
+    link = chain[first] ^ chain[second]
+    link_chain = np.where(chain[first[link]], pixel_chain[first[link]], pixel_chain[second[link]])
+    link_node = np.where(chain[first[link]], pixel_node[second[link]], pixel_node[first[link]])
+    order = np.argsort(link_chain, kind='mergesort')
+    link_chain = link_chain[order]
+    link_node = link_node[order]
+    chain_nodes = np.full((nchains, 2), -1, dtype=np.int64)
+    starts = np.searchsorted(link_chain, np.arange(nchains))
+    counts = np.bincount(link_chain, minlength=nchains)
+    has_1 = counts > 0
+    chain_nodes[has_1, 0] = link_node[starts[has_1]]
+    has_2 = counts > 1
+    chain_nodes[has_2, 1] = link_node[starts[has_2] + 1]
+
+    # Neighboring nodes are joined directly by branches with no pixels
+    direct = is_node[first] & is_node[second]
+    pairs = np.sort(np.column_stack([pixel_node[first[direct]], pixel_node[second[direct]]]), axis=1)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    pairs = np.unique(pairs, axis=0).reshape(-1, 2)
+
+    branch_nodes = np.concatenate([chain_nodes, pairs]).astype(np.int64)
+    nbranches = len(branch_nodes)
+
+    #### Node table ####
+    node_pixels = np.bincount(pixel_node[is_node], minlength=nnodes)
+    node_length = np.bincount(pixel_node[is_node], weights=length[is_node], minlength=nnodes)
+    node_diameter = np.bincount(pixel_node[is_node], weights=diameter[is_node], minlength=nnodes) / np.maximum(node_pixels, 1)
+    node_row = np.bincount(pixel_node[is_node], weights=rows[is_node], minlength=nnodes) / np.maximum(node_pixels, 1)
+    node_col = np.bincount(pixel_node[is_node], weights=cols[is_node], minlength=nnodes) / np.maximum(node_pixels, 1)
+    node_object = np.zeros(nnodes, dtype=labels.dtype)
+    node_object[pixel_node[is_node]] = objects[is_node]
+
+    ends = branch_nodes[branch_nodes >= 0]
+    node_degree = np.bincount(ends, minlength=nnodes)
+    max_pixel_degree = np.zeros(nnodes, dtype=np.int64)
+    np.maximum.at(max_pixel_degree, pixel_node[is_node], degree[is_node])
+    node_type = np.where(max_pixel_degree > 2, "junction",
+                         np.where(max_pixel_degree == 1, "endpoint", "isolated"))
+
+    #### Branch table ####
+    # sort branch pixels so each branch is a contiguous range
+    branch_pixel = np.nonzero(chain)[0]
+    branch_pixel = branch_pixel[np.argsort(pixel_chain[branch_pixel], kind='mergesort')]
+    pixel_branch = pixel_chain[branch_pixel]
+    branch_npix = np.bincount(pixel_branch, minlength=nbranches)
+    branch_start = np.concatenate([[0], np.cumsum(branch_npix)[:-1]]).astype(np.int64)
+    branch_stop = branch_start + branch_npix
+
+    share = node_length / np.maximum(node_degree, 1)
+    branch_length = np.bincount(pixel_branch, weights=length[branch_pixel], minlength=nbranches)
+    for k in range(2):
+        has_node = branch_nodes[:, k] >= 0
+        branch_length[has_node] += share[branch_nodes[has_node, k]]
+
+    # diameter of the branch pixels, or of the nodes for branches with no pixels
+    diam_sum = np.bincount(pixel_branch, weights=diameter[branch_pixel], minlength=nbranches)
+    branch_min = np.full(nbranches, np.inf)
+    branch_max = np.full(nbranches, -np.inf)
+    np.minimum.at(branch_min, pixel_branch, diameter[branch_pixel])
+    np.maximum.at(branch_max, pixel_branch, diameter[branch_pixel])
+    no_pixels = branch_npix == 0
+    if no_pixels.any():
+        end_diam = node_diameter[branch_nodes[no_pixels]]
+        diam_sum[no_pixels] = end_diam.mean(axis=1)
+        branch_min[no_pixels] = end_diam.min(axis=1)
+        branch_max[no_pixels] = end_diam.max(axis=1)
+    branch_diameter = diam_sum / np.maximum(branch_npix, 1)
+
+    branch_object = np.zeros(nbranches, dtype=labels.dtype)
+    branch_object[pixel_branch] = objects[branch_pixel]
+    branch_object[no_pixels] = node_object[branch_nodes[no_pixels, 0]]
+
+    nodes = pd.DataFrame({"Node" : np.arange(nnodes),
+                          "Object" : node_object,
+                          "Row" : node_row,
+                          "Col" : node_col,
+                          "Pixels" : node_pixels,
+                          "Degree" : node_degree,
+                          "Type" : node_type,
+                          "Length" : node_length,
+                          "Diameter" : node_diameter})
+
+    branches = pd.DataFrame({"Branch" : np.arange(nbranches),
+                             "Object" : branch_object,
+                             "Node1" : branch_nodes[:, 0],
+                             "Node2" : branch_nodes[:, 1],
+                             "Start" : branch_start,
+                             "Stop" : branch_stop,
+                             "Pixels" : branch_npix,
+                             "Length" : branch_length,
+                             "Diameter" : branch_diameter,
+                             "MinDiameter" : branch_min,
+                             "MaxDiameter" : branch_max})
+
+    pixels = pd.DataFrame({"Row" : rows[branch_pixel],
+                           "Col" : cols[branch_pixel],
+                           "Length" : length[branch_pixel],
+                           "Diameter" : diameter[branch_pixel]})
+
+    out = {"nodes" : nodes,
+           "branches" : branches,
+           "pixels" : pixels,
+           "shape" : shape}
+
+    return(out)
+
+
+def graph_geometry(graph, n_objects=None):
+    """
+    Total length and mean diameter of each object from a skeleton graph.
+    Equivalent to the "geometry" ``DataFrame`` of ``pyroots.skeleton_with_distance``,
+    but computed from the branch and node tables only.
+
+    Parameters
+    ----------
+    graph : dict
+        Output of ``pyroots.skeleton_graph``.
+    n_objects : int
+        Number of objects in the image. Default = ``None``, which uses the
+        largest object number in the graph.
+
+    Returns
+    -------
+    A ``pandas.DataFrame`` with columns Length and Diameter, indexed by object
+    (0 is the background).
+    """
+    nodes = graph["nodes"]
+    branches = graph["branches"]
+    if n_objects is None:
+        n_objects = max(nodes["Object"].max() if len(nodes) else 0,
+                        branches["Object"].max() if len(branches) else 0)
+    size = n_objects + 1
+
+    # nodes that no branch touches keep their own length
+    lone = nodes["Degree"].values == 0
+    length = np.bincount(branches["Object"].values, weights=branches["Length"].values, minlength=size)
+    length += np.bincount(nodes["Object"].values[lone], weights=nodes["Length"].values[lone], minlength=size)
+
+    # mean diameter over all skeleton pixels
+    diam_sum = np.bincount(branches["Object"].values,
+                           weights=branches["Diameter"].values * branches["Pixels"].values,
+                           minlength=size)
+    diam_sum += np.bincount(nodes["Object"].values,
+                            weights=nodes["Diameter"].values * nodes["Pixels"].values,
+                            minlength=size)
+    npix = np.bincount(branches["Object"].values, weights=branches["Pixels"].values, minlength=size)
+    npix += np.bincount(nodes["Object"].values, weights=nodes["Pixels"].values, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        diameter = diam_sum / npix
+    diameter[0] = 0
+
+    out = pd.DataFrame({"Length" : length,
+                        "Diameter" : diameter})
+    return(out)
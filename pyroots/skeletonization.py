@@ -6,12 +6,20 @@ Created on Thu Aug 11 19:10:25 2016
 
 Contents:
 - _axis_length
+- _pixel_weights
+- _skeleton_codes
+- SKELETON_BACKENDS
+- _skeletonize
+- _skeleton_and_distance
 - skeletonize_with_distance
+- skeleton_to_dense
+- skeleton_to_sparse
 
 """
 
 import pandas as pd
 import numpy as np
+import cv2
 from scipy import ndimage
 from skimage import morphology
 
@@ -65,8 +73,46 @@ def _axis_length(image, labels=None, random=True, m=0.5):
     
     """
         
-    image = image.astype(np.uint8)
+    rows, cols = np.nonzero(image)
 
+    pixel_weight = _pixel_weights(random, m)
+
+    #Connectivity code of each skeleton pixel. Same values as convolving the
+    #skeleton with [[10, 2, 10], [2, 1, 2], [10, 2, 10]], but only evaluated
+    #at the skeleton pixels.
+    codes = _skeleton_codes(rows, cols, image.shape)
+            
+    if labels is None: 
+        
+        # From original code - skimage.morphology.perimeter():
+        # "You can also write
+        # return perimeter_weights[perimeter_image].sum()
+        # but that was measured as taking much longer than bincount + np.dot 
+        # (5x as much time)"
+        # Note that only skeleton pixels are counted. Background pixels have
+        # even codes, which carry no weight.
+        weight_bins = np.bincount(codes, minlength=50)
+        length_out = np.dot(weight_bins, pixel_weight)
+        return(weight_bins, 
+               length_out)
+    else:
+        weights = pixel_weight[codes]
+        pixel_length = np.zeros(image.shape)    #most should stay zeros
+        pixel_length[rows, cols] = weights
+        length_out = np.bincount(labels[rows, cols],
+                                 weights=weights,
+                                 minlength=labels.max() + 1)[1:]
+                                 #ignore index 0 (background)
+        return(pixel_length,
+               length_out)
+               
+               
+def _pixel_weights(random=True, m=0.5):
+    """
+    Length weight of a skeleton pixel for each connectivity code. See
+    ``pyroots._axis_length`` and ``pyroots._skeleton_codes``. Returns an
+    array of 50 floats, indexed by code.
+    """
     #Define the connectivity list
     if random is True:
         pixel_weight = np.array( 
@@ -112,58 +158,125 @@ def _axis_length(image, labels=None, random=True, m=0.5):
             pixel_weight[np.arange(0, 50, 2)] = 0  #Only odd numbers are on skeleton
             pixel_weight[1] = 0.5                  #Account for lone pixels
 
-    #Run the connectivity kernel    
-    kernel = np.array([[10, 2, 10],
-                       [ 2, 1,  2],
-                       [10, 2, 10]])
-
-    kernel_out = ndimage.convolve(image, kernel,
-                                  mode='constant', cval=0
-                                  )
-    
-    #convert kernel_out to pixel length, for diagnostics
-    dims = kernel_out.shape
-    pixel_length = np.ones(dims)    #most should become zeros
-    for i in range(dims[0]):        #x dimension
-        for j in range(dims[1]):    #y dimension
-            pixel_length[i,j] = pixel_weight[kernel_out[i,j]] 
-                #match the value to that in the pixel_weight list
-            
-    if labels is None: 
+    return(pixel_weight)
+
+
+def _skeleton_codes(rows, cols, shape):
+    """
+    Connectivity code of each pixel in a skeleton, given only the coordinates
+    of the skeleton pixels. Each pixel scores 1, plus 2 for each horizontal or
+    vertical neighbor and 10 for each diagonal neighbor. This is the same as
+    ``ndimage.convolve`` with the kernel in ``pyroots._axis_length``, but never
+    touches background pixels.
+    
+    Parameters
+    ----------
+    rows, cols : array
+        Coordinates of skeleton pixels, for example from ``np.nonzero``.
+    shape : tuple
+        Shape of the image.
         
-        # From original code - skimage.morphology.perimeter():
-        # "You can also write
-        # return perimeter_weights[perimeter_image].sum()
-        # but that was measured as taking much longer than bincount + np.dot 
-        # (5x as much time)"
-        weight_bins = np.bincount(kernel_out.ravel(), minlength=50)
-        length_out = np.dot(weight_bins, pixel_weight)
-        return(weight_bins, 
-               length_out)
+    Returns
+    -------
+    An array of ``uint8`` codes in [1, 49], in the same order as ``rows``.
+    
+    """
+    # Index pixels in an image padded by one pixel, so that neighbors never
+    # wrap around to the next row
+    width = shape[1] + 2
+    index = (np.asarray(rows, dtype=np.int64) + 1) * width + np.asarray(cols) + 1
+    
+    order = None
+    if len(index) > 1 and np.any(index[1:] <= index[:-1]):
+        order = np.argsort(index, kind='mergesort')  # np.nonzero is already sorted
+        index = index[order]
+    
+    codes = np.ones(len(index), dtype=np.uint8)
+    if len(index) == 0:
+        return(codes)
+    
+    # horizontal neighbors are adjacent in the sorted index
+    horiz = ((index[1:] - index[:-1]) == 1).astype(np.uint8)
+    codes[1:] += 2 * horiz
+    codes[:-1] += 2 * horiz
+    
+    # neighbors in the rows above and below. The three candidates are
+    # consecutive in the sorted index, so walk forward after a single search.
+    last = len(index) - 1
+    for step in (-width, width):
+        pos = np.searchsorted(index, index + step - 1)
+        for offset, weight in ((-1, 10), (0, 2), (1, 10)):
+            found = index[np.minimum(pos, last)] == (index + step + offset)
+            codes += weight * found.astype(np.uint8)
+            pos += found
+    
+    if order is not None:
+        out = np.empty_like(codes)
+        out[order] = codes
+        codes = out
+    
+    return(codes)
+
+
+# Ways to find the axis of each object and its distance to the edge. See
+# ``pyroots.benchmark_skeleton`` for how their lengths and diameters compare.
+SKELETON_BACKENDS = ['medial_axis', 'zhang', 'lee', 'opencv']
+
+
+def _skeletonize(img, backend='zhang'):
+    """
+    One pixel wide skeleton of a binary image, by one of ``SKELETON_BACKENDS``:
+    
+    * 'medial_axis' : ``morphology.medial_axis``
+    * 'zhang' : ``morphology.skeletonize`` (Zhang and Suen thinning)
+    * 'lee' : Lee et al. thinning, ``morphology.skeletonize(method='lee')``
+    * 'opencv' : ``cv2.ximgproc.thinning`` (Zhang and Suen), if opencv-contrib
+      is installed. Otherwise 'zhang'.
+    """
+    if backend == 'medial_axis':
+        return(morphology.medial_axis(img))
+    elif backend == 'zhang':
+        return(morphology.skeletonize(img))
+    elif backend == 'lee':
+        try:
+            return(morphology.skeletonize(img, method='lee') > 0)
+        except TypeError:  # skimage < 0.16
+            return(morphology.skeletonize_3d(img) > 0)
+    elif backend == 'opencv':
+        if hasattr(cv2, 'ximgproc'):
+            temp = np.asarray(img, dtype=np.uint8) * 255
+            return(cv2.ximgproc.thinning(temp, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN) > 0)
+        return(morphology.skeletonize(img))
+    raise ValueError("Didn't recognize skeleton backend '{}'. Options are {}.".format(backend, SKELETON_BACKENDS))
+
+
+def _skeleton_and_distance(img, backend='medial_axis'):
+    """
+    Skeleton of a binary image and the Euclidean distance from each pixel to the
+    background, by one of ``SKELETON_BACKENDS``. 'medial_axis' returns both from
+    ``morphology.medial_axis``. 'zhang' and 'lee' thin the objects and use
+    ``ndimage.distance_transform_edt``. 'opencv' uses ``cv2.distanceTransform``,
+    also exact, in float32. Only distances at skeleton pixels are used.
+    """
+    if backend == 'medial_axis':
+        return(morphology.medial_axis(img, return_distance=True))
+    skel = _skeletonize(img, backend)
+    if backend == 'opencv':
+        dist = cv2.distanceTransform(np.asarray(img, dtype=np.uint8), cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
     else:
-        dims = kernel_out.shape
-        pixel_length = np.zeros(dims)    #most should stay zeros
-        for i in range(dims[0]):        #x dimension iterate
-            for j in range(dims[1]):    #y dimension iterate
-                pixel_length[i,j] = pixel_weight[kernel_out[i,j]] 
-        length_out = ndimage.sum(pixel_length, 
-                                 labels=labels, 
-                                 index=range(labels.max() + 1)[1:]
-                                 #might want to ignore index 0 
-                                 #for large images.
-                                 )
-        return(pixel_length,
-               length_out)
-               
-               
-def skeleton_with_distance(img, random=True, m=0.5):
+        dist = ndimage.distance_transform_edt(img)
+    return(skel, dist)
+
+
+def skeleton_with_distance(img, random=True, m=0.5, graph=False, sparse=False, stats=None,
+                           backend='medial_axis'):
     """
     Created on Thu 21 Jul 2016 03:27:52 PM CDT 
     
     @author: pme
 
-    Calls ``morphology.medial_axis``, then calculates the length of each axis
-    using ``pyroots._axis_length``
+    Calls ``morphology.medial_axis`` (or another skeleton, see ``backend``), then
+    calculates the length of each axis using ``pyroots._axis_length``
 
     Parameters
     --------
@@ -175,6 +288,28 @@ def skeleton_with_distance(img, random=True, m=0.5):
     m: float
         range [0,1]. Feeds ``pyroots._axis_length``. Default = 0.5. Change only
         if ``random=False``.
+    graph: boolean
+        Also build a graph of nodes and branches of the medial axis? See
+        ``pyroots.skeleton_graph``. Default=``False``.
+    sparse: boolean
+        Return the medial axis as a table of pixel coordinates and values
+        instead of full-size "length" and "diameter" images? Uses a small
+        fraction of the memory. Default=``False``.
+    stats: dict
+        Output of ``pyroots.component_stats(img)``. Reuses its labels instead
+        of labelling ``img`` again. Default=``None``.
+    backend: str
+        How to find the axis and diameters. One of
+        ``pyroots.skeletonization.SKELETON_BACKENDS``:
+        
+        * 'medial_axis' : ``morphology.medial_axis``. Default.
+        * 'zhang' or 'lee' : thinning by ``morphology.skeletonize``, with
+          diameters from an exact Euclidean distance transform.
+        * 'opencv' : OpenCV thinning (with opencv-contrib) and distance transform.
+        
+        Thinned axes are usually shorter at the ends of objects, and the
+        diameters are sampled at slightly different pixels. Compare them on
+        your images with ``pyroots.benchmark_skeleton``.
 
     Returns
     --------
@@ -184,26 +319,121 @@ def skeleton_with_distance(img, random=True, m=0.5):
     3. "diameter" : An ndarray of diameter at each pixel
     4. "geometry" : A pandas dataframe listing the mean length and mean diameter
     for each object (including the open space)
+    5. "graph" : Only if ``graph=True``. The output of ``pyroots.skeleton_graph``.
+    
+    If ``sparse=True``, "length" and "diameter" are replaced by:
+    2. "skeleton" : A pandas dataframe with one row per medial axis pixel and
+    columns "Row", "Col" (``int32``), "Length" and "Diameter" (``float32``).
+    See ``pyroots.skeleton_to_dense``.
         
     """
     
-    labels, labels_ls = ndimage.label(img)
-    skel, dist = morphology.medial_axis(img, return_distance=True)
-    dist_img = skel*2*dist #2x because medial axis distance is radius
-    label_skel = skel*labels
+    if stats is None:
+        labels, labels_ls = ndimage.label(img)
+    else:
+        labels, labels_ls = stats["labels"], stats["count"]
+    skel, dist = _skeleton_and_distance(img, backend)
+    
+    if sparse is True:
+        rows, cols = np.nonzero(skel)
+        diameter = 2*dist[rows, cols] #2x because medial axis distance is radius
+        label_skel = labels[rows, cols]
+        length = _pixel_weights(random, m)[_skeleton_codes(rows, cols, skel.shape)]
+        length_list = np.bincount(label_skel, weights=length, minlength=labels_ls+1)[1:]
+    else:
+        diameter = skel*2*dist #2x because medial axis distance is radius
+        label_skel = skel*labels
+        length, length_list = _axis_length(skel, labels, random=random, m=m)
     
-    width_list = ndimage.mean(dist_img, 
+    width_list = ndimage.mean(diameter, 
                               label_skel, 
                               index=range(labels_ls+1)[1:]) #ignore empty space
     
-    length_img, length_list = _axis_length(skel, labels, random=random, m=m)
     geom_df = pd.DataFrame({"Length" : np.insert(length_list, 0, 0), #to re-add the label index, 0
                             "Diameter" : np.insert(width_list, 0, 0)
                             }) 
     
-    out = {"objects"  : img,
-           "length"   : length_img,
-           "diameter" : dist_img,
-           "geometry" : geom_df}
+    if sparse is True:
+        skeleton = pd.DataFrame({"Row" : rows.astype(np.int32),
+                                 "Col" : cols.astype(np.int32),
+                                 "Length" : length.astype(np.float32),
+                                 "Diameter" : diameter.astype(np.float32)})
+        out = {"objects"  : img,
+               "skeleton" : skeleton,
+               "geometry" : geom_df}
+    else:
+        out = {"objects"  : img,
+               "length"   : length,
+               "diameter" : diameter,
+               "geometry" : geom_df}
+
+    if graph is True:
+        from pyroots.skeleton_graph import skeleton_graph
+        out["graph"] = skeleton_graph(out, labels=labels)
+
+    return(out)
+
+
+def skeleton_to_dense(skeleton_dictionary):
+    """
+    Convert a sparse skeleton dictionary (see ``pyroots.skeleton_with_distance``)
+    to full-size "length" and "diameter" images, for saving or plotting. 
+    Dictionaries that are already dense are returned unchanged.
+
+    Parameters
+    ----------
+    skeleton_dictionary : dict
+        Dictionary with "objects" and "skeleton".
+
+    Returns
+    -------
+    A copy of ``skeleton_dictionary`` with "skeleton" replaced by "length" and
+    "diameter" ndarrays (``float64``).
+    """
+    if "skeleton" not in skeleton_dictionary:
+        return(skeleton_dictionary)
+    
+    out = skeleton_dictionary.copy()
+    skeleton = out.pop("skeleton")
+    shape = out["objects"].shape[:2]
+    rows = skeleton["Row"].values
+    cols = skeleton["Col"].values
+    
+    for key in ["length", "diameter"]:
+        temp = np.zeros(shape)
+        temp[rows, cols] = skeleton[key.capitalize()].values
+        out[key] = temp
+    
+    return(out)
+
+
+def skeleton_to_sparse(skeleton_dictionary):
+    """
+    Convert a dense skeleton dictionary (see ``pyroots.skeleton_with_distance``)
+    to a table of medial axis pixels. Dictionaries that are already sparse are
+    returned unchanged.
+
+    Parameters
+    ----------
+    skeleton_dictionary : dict
+        Dictionary with "objects", "length" and "diameter".
 
+    Returns
+    -------
+    A copy of ``skeleton_dictionary`` with "length" and "diameter" replaced by
+    "skeleton", a ``pandas.DataFrame`` with columns "Row", "Col", "Length" and
+    "Diameter".
+    """
+    if "skeleton" in skeleton_dictionary:
+        return(skeleton_dictionary)
+    
+    out = skeleton_dictionary.copy()
+    length = out.pop("length")
+    diameter = out.pop("diameter")
+    rows, cols = np.nonzero(length)
+    out["skeleton"] = pd.DataFrame({"Row" : rows.astype(np.int32),
+                                    "Col" : cols.astype(np.int32),
+                                    "Length" : length[rows, cols].astype(np.float32),
+                                    "Diameter" : diameter[rows, cols].astype(np.float32)})
+    
     return(out)
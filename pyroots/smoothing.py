@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: pme
+
+Gaussian smoothing at large sigmas. ``equalize_exposure`` blurs with a sigma of
+a tenth of the image, hundreds of pixels, and the brightfield and low contrast
+checks of preprocessing blur with sigmas of 10-15. A spatial convolution costs
+``8 * sigma + 1`` multiplications per pixel and axis, so at those sizes most of
+the time goes into the kernel. The methods here cost about the same at any
+sigma:
+
+- ``'fft'``: the same truncated kernel as ``scipy.ndimage.gaussian_filter``,
+  applied along each axis by FFT. Equal to ``'direct'`` up to rounding.
+- ``'box'``: three running box filters per axis (see
+  ``pyroots.local_threshold._box_sizes``). Within about 2% of the range.
+- ``'pyramid'``: blurred at lower resolution and interpolated back (see
+  ``pyroots.local_threshold._downsampled_surface``). Within about 2% of the
+  range, and several times faster than ``'fft'`` at large sigmas.
+
+By default, sigmas of 8 or more go by FFT, so results don't change.
+
+Compare them on your own images with ``pyroots.benchmark_smoothing``.
+
+Contents:
+- GAUSSIAN_METHODS
+- _PAD_MODES
+- _fft_gaussian1d
+- _pick_method
+- gaussian
+"""
+
+import numpy as np
+from scipy import ndimage, fft
+from skimage import img_as_float
+from pyroots.vesselness import _gaussian_kernel
+from pyroots.local_threshold import _box_sizes, _downsampled_surface
+
+
+GAUSSIAN_METHODS = ['auto', 'direct', 'fft', 'box', 'pyramid']
+
+_PAD_MODES = {'nearest' : 'edge',  # scipy.ndimage mode : np.pad mode
+              'reflect' : 'symmetric',
+              'mirror' : 'reflect',
+              'wrap' : 'wrap',
+              'constant' : 'constant'}
+
+
+def _fft_gaussian1d(image, sigma, axis, mode, cval):
+    """
+    Gaussian along one axis by FFT, with the kernel of
+    ``scipy.ndimage.gaussian_filter1d``. The axis is padded by the kernel radius
+    as ``mode`` pads it, so the circular convolution never wraps into the image.
+    """
+    kernel = _gaussian_kernel(sigma, np.float64)
+    radius = kernel.size // 2
+    pad = [(0, 0)] * image.ndim
+    pad[axis] = (radius, radius)
+    if mode == 'constant':
+        padded = np.pad(image, pad, mode='constant', constant_values=cval)
+    else:
+        padded = np.pad(image, pad, mode=_PAD_MODES[mode])
+
+    n = fft.next_fast_len(padded.shape[axis], real=True)
+    centered = np.zeros(n)
+    centered[:radius + 1] = kernel[radius:]  # kernel centered at 0, wrapped
+    centered[n - radius:] = kernel[:radius]
+    shape = [1] * image.ndim
+    shape[axis] = -1
+    transfer = fft.rfft(centered).real.reshape(shape)  # symmetric kernel
+
+    out = fft.irfft(fft.rfft(padded, n, axis=axis) * transfer, n, axis=axis)
+    index = [slice(None)] * image.ndim
+    index[axis] = slice(radius, radius + image.shape[axis])
+    return(out[tuple(index)].astype(image.dtype, copy=False))
+
+
+def _pick_method(sigma):
+    """
+    Method for ``method='auto'``: spatial convolution below a sigma of 8
+    pixels, where it's faster, and FFT from there on.
+    """
+    if max(sigma) < 8:
+        return('direct')
+    return('fft')
+
+
+def gaussian(image, sigma, mode='nearest', cval=0, multichannel=False, preserve_range=False,
+             method='auto'):
+    """
+    Gaussian blur, as ``skimage.filters.gaussian``, at a cost that doesn't grow
+    with sigma.
+
+    Parameters
+    ----------
+    image : ndarray
+        Image to blur. Integer images are scaled to [0, 1] first, unless
+        `preserve_range`.
+    sigma : float or list of float
+        Standard deviation, in pixels, for all axes or for each.
+    mode : str
+        How to extend the image past its edges, as in ``scipy.ndimage``:
+        ``'nearest'`` (default), ``'reflect'``, ``'mirror'``, ``'wrap'`` or
+        ``'constant'``.
+    cval : float
+        Value past the edges if ``mode='constant'``.
+    multichannel : bool
+        Is the last axis color? If so, it isn't blurred. Default = ``False``.
+    preserve_range : bool
+        Keep integer values as they are, instead of scaling them to [0, 1]?
+        Default = ``False``.
+    method : str
+        - ``'auto'`` (default): ``'direct'`` below a sigma of 8, ``'fft'``
+          from there on.
+        - ``'direct'``: spatial convolution, ``scipy.ndimage.gaussian_filter``.
+        - ``'fft'``: the same kernel, by FFT. Equal up to rounding.
+        - ``'box'``: three box filters per axis, by running sums.
+        - ``'pyramid'``: blurred at lower resolution and interpolated back.
+
+    Returns
+    -------
+    A float ndarray of the shape of `image`.
+
+    See Also
+    --------
+    ``skimage.filters.gaussian``, ``pyroots.benchmark_smoothing``
+    """
+    if method not in GAUSSIAN_METHODS:
+        raise ValueError("Didn't recognize method '{}'. Choose from {}.".format(method, GAUSSIAN_METHODS))
+    if mode not in _PAD_MODES:
+        raise ValueError("Didn't recognize mode '{}'.".format(mode))
+
+    if preserve_range:
+        image = image.astype(np.float64) if image.dtype.kind in 'biu' else image
+    else:
+        image = img_as_float(image)
+
+    spatial = image.ndim - 1 if multichannel else image.ndim
+    sigma = [float(s) for s in np.broadcast_to(sigma, (spatial,))]
+    if method == 'auto':
+        method = _pick_method(sigma)
+
+    if multichannel and method in ('box', 'pyramid'):
+        return(np.stack([gaussian(image[..., i], sigma, mode, cval, False, True, method)
+                         for i in range(image.shape[-1])], axis=-1))
+
+    if method == 'direct':
+        return(ndimage.gaussian_filter(image, sigma + [0] * (image.ndim - spatial), mode=mode, cval=cval))
+
+    if method == 'fft':
+        out = image
+        for axis, s in enumerate(sigma):
+            if s > 0:
+                out = _fft_gaussian1d(out, s, axis, mode, cval)
+        return(out if out is not image else image.copy())
+
+    if method == 'box':
+        out = image
+        for axis, s in enumerate(sigma):
+            if s > 0:
+                for size in _box_sizes(s):
+                    out = ndimage.uniform_filter1d(out, size, axis=axis, mode=mode, cval=cval)
+        return(out if out is not image else image.copy())
+
+    if image.ndim != 2:
+        raise ValueError("The 'pyramid' method needs a 2D image, or `multichannel`.")
+    return(_downsampled_surface(image, None, 'gaussian', sigma, mode, cval))
@@ -11,6 +11,7 @@ TODO: Test multi_image_loop
 """
 
 from pyroots import *
+from pyroots import backends
 from skimage import io, color, filters, exposure, img_as_ubyte
 from warnings import warn
 
@@ -26,7 +27,9 @@ def thresholding_segmentation(image,
                               lw_filter_args='skip',
                               diam_filter_args='skip',
                               diameter_bins=None,
-                              verbose=False):
+                              verbose=False,
+                              sparse=False,
+                              skeleton_backend='medial_axis'):
     """
     Full analysis of an image for length of objects based on thresholding.
     Performs the following steps:
@@ -50,8 +53,9 @@ def thresholding_segmentation(image,
     	An RGB or black and white image for analysis
 
     threshold_args : list of dicts
-        Dictionaries contain options for adaptive thresholding. See skimage.filters.threshold_adaptive().
-        At minimum, requires 'block_size', for example, threshold_args = [{'block_size':101}].
+        Dictionaries contain options for adaptive thresholding. See pyroots.threshold_local(), which
+        takes the arguments of skimage.filters.threshold_local() plus an optional 'backend'.
+        At minimum, requires 'block_size', for example, threshold_args = [{'block_size':101, 'backend':'integral'}].
 
     image_name : str
     	What do you want to call your image?
@@ -108,6 +112,13 @@ def thresholding_segmentation(image,
     verbose : bool
         Give feedback showing the step working on?
 
+    sparse : bool
+        Keep the medial axis as a table of pixels rather than full-size 'length' and
+        'diameter' images? Saves memory. See `pyroots.skeleton_with_distance`.
+
+    skeleton_backend : str
+        How to find the medial axis and diameters. See `pyroots.skeleton_with_distance`.
+
     Returns
     -------
     A dictionary containing:
@@ -120,6 +131,8 @@ def thresholding_segmentation(image,
             - the diameter at that pixel (if `diameter_bins` is `None`)
             - the diameter bin to which a pixel belongs (otherwise)
     3) skeleton pixel lengths; 4) skeleton pixel diameters.
+    If `sparse=True`, 3 and 4 are replaced by 'skeleton', a `pandas` dataframe of medial
+    axis pixels. See `pyroots.skeleton_to_dense`.
     
     Notes
     -----
@@ -156,7 +169,7 @@ def thresholding_segmentation(image,
 
     try:
         for i in range(nbands):
-            temp = exposure.equalize_adapthist(working_image[i],
+            temp = backends.equalize_adapthist(working_image[i],
                                                kernel_size = contrast_kernel_size)
             working_image[i] = img_as_ubyte(temp)
         if verbose is True:
@@ -168,8 +181,8 @@ def thresholding_segmentation(image,
 
     ## threshold
     for i in range(nbands):
-        working_image[i] = working_image[i] > filters.threshold_local(working_image[i],
-                                                                      **threshold_args[i])
+        working_image[i] = working_image[i] > threshold_local(working_image[i],
+                                                              **threshold_args[i])
     for i in range(nbands):
         if len(colors) == 3:
             if colors['dark_on_light'][i] is True:
@@ -225,12 +238,14 @@ def thresholding_segmentation(image,
         pass
 
     ## skeleton, length-width, diameter filters
-    skel_dict = skeleton_with_distance(working_image)
+    stats = component_stats(working_image)  # labels shared by the skeleton filters
+    skel_dict = skeleton_with_distance(working_image, sparse=sparse, stats=stats, backend=skeleton_backend)
     if verbose is True:
         print("Skeletonization complete")
 
     try:
-        lw_dict = length_width_filter(skel_dict, **lw_filter_args)
+        lw_dict = length_width_filter(skel_dict, stats=stats, **lw_filter_args)
+        update_component_stats(stats, lw_dict['objects'])
         if verbose is True:
             print("Length:width filtering complete")
     except:
@@ -240,7 +255,7 @@ def thresholding_segmentation(image,
         pass
 
     try:
-        diam_dict = diameter_filter(lw_dict, **diam_filter_args).copy()
+        diam_dict = diameter_filter(lw_dict, stats=stats, **diam_filter_args).copy()
         if verbose is True:
             print("Diameter filter complete")
     except:
@@ -252,6 +267,13 @@ def thresholding_segmentation(image,
     if diameter_bins is None or diameter_bins is 'skip':
         summary_df = summarize_geometry(skel_dict['geometry'], image_name)
 
+    elif sparse is True:
+        diam_out, summary_df = bin_by_diameter(skel_dict['skeleton']['Length'].values,
+                                               skel_dict['skeleton']['Diameter'].values,
+                                               diameter_bins,
+                                               image_name)
+        skel_dict['skeleton'] = skel_dict['skeleton'].assign(Diameter=diam_out)
+
     else:
         diam_out, summary_df = bin_by_diameter(skel_dict['length'],
                                                skel_dict['diameter'],
@@ -259,10 +281,15 @@ def thresholding_segmentation(image,
                                                image_name)
         skel_dict['diameter'] = diam_out
 
-    out = {'geometry' : summary_df,
-           'objects'  : skel_dict['objects'],
-           'length'   : skel_dict['length'],
-           'diameter' : skel_dict['diameter']}
+    if sparse is True:
+        out = {'geometry' : summary_df,
+               'objects'  : skel_dict['objects'],
+               'skeleton' : skel_dict['skeleton']}
+    else:
+        out = {'geometry' : summary_df,
+               'objects'  : skel_dict['objects'],
+               'length'   : skel_dict['length'],
+               'diameter' : skel_dict['diameter']}
 
     if verbose is True:
         print("Done")
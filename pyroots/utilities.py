@@ -10,6 +10,8 @@ multi_image_plot
 random_blobs
 tiff_splitter
 img_rescaler
+_sample_files
+file_subsampler
 """
 
 from matplotlib import pyplot as plt
@@ -315,6 +317,21 @@ def img_rescaler(dir_in, extension_in, threads=1):
 #####################################################
 #####################################################
 
+def _sample_files(N, dir_in, extension_in, exclude=None):
+    """
+    Random sample of `N` files of type `extension_in` in `dir_in` and its subdirectories,
+    skipping paths that contain `exclude`. Returns full paths.
+    """
+    files_in = []
+    for path, folder, filename in os.walk(dir_in):
+        if exclude is None or exclude not in path:
+            for f in filename:
+                if f.endswith(extension_in):
+                    files_in.append(os.path.join(path, f))  # input files
+
+    return(random.sample(files_in, N))
+
+
 def file_subsampler(N,
                     dir_in,
                     extension_in,
@@ -342,17 +359,10 @@ def file_subsampler(N,
     
     # Count files to analyze for status bar, and make lists of directories
     subpaths = []    # directories to make in dir_out
-    files_in = []    # input files
     files_out = []   # output files
     file_names = []  # names of output files, including subpaths
     
-    for path, folder, filename in os.walk(dir_in):
-        if dir_out not in path:
-            for f in filename:
-                if f.endswith(extension_in):
-                    files_in.append(os.path.join(path, f))  # input files
-    
-    files_in = random.sample(files_in, N)
+    files_in = _sample_files(N, dir_in, extension_in, exclude=dir_out)  # input files
 
 
     # identify folders to make in dir_out
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+@author: pme
+
+A float32 version of the Frangi vesselness filter, ``skimage.filters.frangi``
+(``scale_range``, ``scale_step``, ``beta1``, ``beta2``), which is the slowest
+step of ``pyroots.frangi_segmentation``. ``skimage`` computes every scale in
+float64 and keeps all of them in a 3D stack before taking the maximum. Here each
+scale is computed in float32, from Gaussian kernels that are made once per scale
+and shared by all bands and images, and folded into a running maximum, so
+memory doesn't grow with the number of scales. Eigenvalues of the Hessian come
+from the closed form for 2x2 symmetric matrices.
+
+The Hessian at large scales is smooth, so convolving at full resolution is
+mostly wasted. With ``pyramid``, the Hessian of each scale is computed on the
+image averaged down by a factor that grows with sigma, with kernels that sample
+the full-resolution filter, and interpolated back up. The outer two pixels,
+where ``np.gradient`` takes one-sided differences, are computed at full
+resolution from strips along the edges.
+
+Select it with ``'backend' : 'float32'`` in ``frangi_args``. Compare it with
+``skimage`` on your own images with ``pyroots.benchmark_frangi``, which also
+reports time and memory for each scale.
+
+Contents:
+- _KERNELS
+- _gaussian_kernel
+- _hessian
+- _pyramid_factor
+- _downsample
+- _upsample
+- _coarse_kernels
+- _pyramid_hessian
+- frangi
+"""
+
+from time import perf_counter
+import tracemalloc
+import numpy as np
+import cv2
+from skimage import filters, img_as_float
+
+
+_KERNELS = {}  # (sigma, dtype) or (sigma, factor, dtype) : 1D kernels, shared by all calls
+
+
+def _gaussian_kernel(sigma, dtype=np.float32):
+    """
+    1D Gaussian kernel of ``scipy.ndimage.gaussian_filter``: truncated at 4
+    standard deviations and normalized. Made once for each sigma.
+    """
+    key = (float(sigma), np.dtype(dtype).str)
+    if key not in _KERNELS:
+        radius = int(4.0 * sigma + 0.5)
+        x = np.arange(-radius, radius + 1, dtype=np.float64)
+        kernel = np.exp(-0.5 / sigma**2 * x**2)
+        _KERNELS[key] = (kernel / kernel.sum()).astype(dtype)
+    return(_KERNELS[key])
+
+
+def _hessian(image, sigma):
+    """
+    Hessian of ``image`` at scale ``sigma``, as ``skimage.feature.hessian_matrix``
+    (``mode='constant'``, differences by ``np.gradient``), multiplied by
+    ``sigma**2``. Returns Hrr, Hrc and Hcc in the dtype of ``image``.
+    """
+    kernel = _gaussian_kernel(sigma, image.dtype)
+    depth = cv2.CV_32F if image.dtype == np.float32 else cv2.CV_64F
+    smooth = cv2.sepFilter2D(image, depth, kernel, kernel, borderType=cv2.BORDER_CONSTANT)
+
+    grad_r, grad_c = np.gradient(smooth)
+    del smooth
+    scale = image.dtype.type(sigma**2)
+    h_rr = np.gradient(grad_r, axis=0)
+    h_rr *= scale
+    h_rc = np.gradient(grad_c, axis=0)
+    h_rc *= scale
+    del grad_r
+    h_cc = np.gradient(grad_c, axis=1)
+    h_cc *= scale
+    return(h_rr, h_rc, h_cc)
+
+
+def _pyramid_factor(sigma, pyramid):
+    """
+    Downsampling factor for scale ``sigma``: the largest integer that leaves
+    at least ``pyramid`` pixels of sigma, and at least 1.
+    """
+    if pyramid is None:
+        return(1)
+    return(max(1, int(sigma // pyramid)))
+
+
+def _downsample(image, factor):
+    """
+    Mean of ``factor`` x ``factor`` blocks. The image is padded with zeros to a
+    multiple of ``factor``, as ``mode='constant'`` pads it for the Gaussian.
+    """
+    pad_r, pad_c = -image.shape[0] % factor, -image.shape[1] % factor
+    if pad_r or pad_c:
+        image = cv2.copyMakeBorder(image, 0, pad_r, 0, pad_c, cv2.BORDER_CONSTANT, value=0)
+    size = (image.shape[1] // factor, image.shape[0] // factor)
+    return(cv2.resize(image, size, interpolation=cv2.INTER_AREA))  # block means at integer factors
+
+
+def _upsample(small, factor, shape):
+    """
+    Bilinear interpolation of ``small`` back to ``shape``, with each pixel of
+    ``small`` at the center of the block it was averaged from.
+    """
+    size = (small.shape[1] * factor, small.shape[0] * factor)
+    large = cv2.resize(small, size, interpolation=cv2.INTER_LINEAR)
+    return(np.ascontiguousarray(large[:shape[0], :shape[1]]))
+
+
+def _coarse_kernels(sigma, factor, dtype=np.float32):
+    """
+    1D kernels for the Hessian at scale ``sigma`` on an image downsampled by
+    ``factor``: the Gaussian, and the Gaussian convolved with the first and
+    second differences of ``np.gradient`` at full resolution, all sampled every
+    ``factor`` pixels. Block means already smooth by a variance of
+    ``(factor**2 - 1) / 12`` pixels, so the Gaussian makes up the rest.
+    Derivatives are per downsampled pixel. Made once for each sigma and factor.
+    """
+    key = (float(sigma), int(factor), np.dtype(dtype).str)
+    if key not in _KERNELS:
+        small_sigma = np.sqrt(sigma**2 - (factor**2 - 1) / 12.0) / factor
+        step = 1.0 / factor  # one full-resolution pixel
+        radius = int(4.0 * small_sigma + 2 * step + 0.5)
+        x = np.arange(-radius, radius + 1, dtype=np.float64)
+        gauss = lambda x: np.exp(-0.5 / small_sigma**2 * x**2)
+        total = gauss(x).sum()
+        # cv2 correlates, so the kernel is the difference stencil reversed
+        kernels = (gauss(x),
+                   (gauss(x - step) - gauss(x + step)) / (2 * step),
+                   (gauss(x - 2 * step) - 2 * gauss(x) + gauss(x + 2 * step)) / (4 * step**2))
+        _KERNELS[key] = tuple((k / total).astype(dtype) for k in kernels)
+    return(_KERNELS[key])
+
+
+def _pyramid_hessian(image, sigma, factor):
+    """
+    Hessian of ``image`` at scale ``sigma``, as ``_hessian``, computed on the
+    image downsampled by ``factor`` and interpolated back to full resolution.
+    The outer two rows and columns are computed at full resolution.
+    """
+    depth = cv2.CV_32F if image.dtype == np.float32 else cv2.CV_64F
+    small = _downsample(image, factor)
+    k0, k1, k2 = _coarse_kernels(sigma, factor, image.dtype)
+    scale = image.dtype.type((sigma / factor)**2)
+    out = []
+    for kx, ky in [(k0, k2), (k1, k1), (k2, k0)]:  # Hrr, Hrc, Hcc
+        h = cv2.sepFilter2D(small, depth, kx, ky, borderType=cv2.BORDER_CONSTANT)
+        h *= scale
+        out.append(_upsample(h, factor, image.shape))
+    del small
+
+    # The edges from strips deep enough that the zeros past their inner side
+    # don't reach the outer two pixels.
+    depth = _gaussian_kernel(sigma).size // 2 + 4
+    for rows, cols in [(slice(None, depth), slice(None)), (slice(-depth, None), slice(None)),
+                       (slice(None), slice(None, depth)), (slice(None), slice(-depth, None))]:
+        strip = np.ascontiguousarray(image[rows, cols])
+        edge = [slice(None, 2) if r.stop == depth else slice(-2, None) if r.start == -depth
+                else slice(None) for r in (rows, cols)]
+        for h, exact in zip(out, _hessian(strip, sigma)):
+            h[rows, cols][tuple(edge)] = exact[tuple(edge)]
+    return(tuple(out))
+
+
+def frangi(image, scale_range=(1, 10), scale_step=2, beta1=0.5, beta2=15, black_ridges=True,
+           backend='skimage', pyramid=None, profile=None):
+    """
+    Frangi vesselness filter, as ``skimage.filters.frangi``, with a faster
+    float32 option.
+
+    Parameters
+    ----------
+    image : ndarray
+        2D grayscale image.
+    scale_range : tuple of float
+        First and last (excluded) scale, as in ``np.arange``.
+    scale_step : float
+        Step between scales.
+    beta1 : float
+        Sensitivity to deviation from a line (blob-ness).
+    beta2 : float
+        Sensitivity to contrast (structure-ness).
+    black_ridges : bool
+        Detect dark ridges on a light background? Default = ``True``.
+    backend : str
+        - ``'skimage'`` (default): ``skimage.filters.frangi``.
+        - ``'float32'``: computed in float32, one scale at a time, with kernels
+          shared between calls. Differs from float64 by rounding, up to about
+          1e-4 of vesselness.
+    pyramid : float or None
+        ``'float32'`` backend only. If given, each scale is computed on the image
+        downsampled by ``sigma // pyramid`` (when that's 2 or more), so that
+        sigma still spans at least ``pyramid`` pixels, and interpolated back to
+        full resolution. Smaller is faster and less accurate; 4 keeps
+        vesselness within about 0.02 on the sample images. Check on your own with
+        ``pyroots.benchmark_frangi_pyramid``. Default = ``None``, full
+        resolution at every scale.
+    profile : list or None
+        If a list, the ``'float32'`` backend appends a dictionary for each
+        scale with its "Scale", "Factor" of downsampling, "Time" (seconds) and
+        "Bytes", the peak memory of its temporary arrays (from ``tracemalloc``,
+        which slows it a little). Default = ``None``.
+
+    Returns
+    -------
+    A float ndarray of vesselness, the maximum over scales: float64 from
+    ``'skimage'``, float32 from ``'float32'``.
+
+    See Also
+    --------
+    ``skimage.filters.frangi``, ``pyroots.benchmark_frangi``
+    """
+    if backend == 'skimage':
+        if pyramid is not None:
+            raise ValueError("`pyramid` needs backend 'float32'.")
+        return(filters.frangi(image, scale_range=scale_range, scale_step=scale_step,
+                              beta1=beta1, beta2=beta2, black_ridges=black_ridges))
+    if backend != 'float32':
+        raise ValueError("Didn't recognize backend '{}'.".format(backend))
+    if len(image.shape) != 2:
+        raise ValueError("`image` must be 2D.")
+
+    sigmas = np.arange(scale_range[0], scale_range[1], scale_step)
+    if np.any(sigmas < 0.0):
+        raise ValueError("Sigma values less than zero are not valid")
+    beta1 = np.float32(2 * beta1**2)
+    beta2 = np.float32(2 * beta2**2)
+
+    image = np.ascontiguousarray(img_as_float(image), dtype=np.float32)
+    out = np.zeros(image.shape, dtype=np.float32)
+    tracing = profile is not None and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    for sigma in sigmas:
+        if profile is not None:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = perf_counter()
+        factor = _pyramid_factor(sigma, pyramid)
+        if factor == 1:
+            h_rr, h_rc, h_cc = _hessian(image, sigma)
+        else:
+            h_rr, h_rc, h_cc = _pyramid_hessian(image, sigma, factor)
+
+        # eigenvalues, largest first: (trace +/- root) / 2
+        root = np.subtract(h_rr, h_cc)
+        root **= 2
+        h_rc **= 2
+        h_rc *= 4
+        root += h_rc
+        np.sqrt(root, out=root)
+        trace = h_rr
+        trace += h_cc
+        del h_rc, h_cc
+        lambda1 = np.add(trace, root)
+        lambda1 *= 0.5
+        lambda2 = trace
+        lambda2 -= root
+        lambda2 *= 0.5
+        del root
+        lambda1[lambda1 == 0] = 1e-10
+
+        # exp(-rb / beta1) * (1 - exp(-s2 / beta2))
+        rb = np.divide(lambda2, lambda1)
+        rb **= 2
+        rb /= -beta1
+        np.exp(rb, out=rb)
+        lambda2 **= 2
+        s2 = lambda2
+        s2 += lambda1**2
+        s2 /= -beta2
+        np.exp(s2, out=s2)
+        np.subtract(1, s2, out=s2)
+        rb *= s2
+        filtered = rb
+        if black_ridges:
+            filtered[lambda1 < 0] = 0
+        else:
+            filtered[lambda1 > 0] = 0
+        np.maximum(out, filtered, out=out)
+
+        if profile is not None:
+            profile.append({"Scale" : sigma,
+                            "Factor" : factor,
+                            "Time" : perf_counter() - start,
+                            "Bytes" : tracemalloc.get_traced_memory()[1] - base})
+        del lambda1, lambda2, rb, s2, filtered
+
+    if tracing:
+        tracemalloc.stop()
+    return(out)